@@ -0,0 +1,439 @@
+#!/usr/bin/env python3
+"""
+Benchmarks for the render -> pack -> transfer pipeline.
+
+Every benchmark runs against the mock GPIO/SPI backends in tests/, so the
+suite works on any machine. Timings on a desktop are not comparable with a
+Pi, which is why baselines are recorded per machine rather than committed.
+"""
+import os
+import sys
+import json
+import time
+import platform
+import statistics
+from datetime import datetime
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TESTS_DIR = os.path.join(ROOT_DIR, 'tests')
+CORPORA_DIR = os.path.join(ROOT_DIR, 'benchmarks', 'corpora')
+SCALING_SIZES = (10000, 100000, 1000000)
+
+BENCHMARKS = []
+
+
+def benchmark(name, iterations=20, warmup=1):
+    """Register `func(context, index)` as one iteration of benchmark `name`"""
+    def register(func):
+        BENCHMARKS.append((name, func, iterations, warmup))
+        return func
+    return register
+
+
+def use_mock_hardware():
+    """Make `import spidev` and RPi.GPIO resolve to the mocks in tests/, and epdconfig simulate a board"""
+    os.environ.setdefault('USE_MOCKS', '1')
+    os.environ.setdefault('EPD_PLATFORM', 'simulator')
+    for path in (ROOT_DIR, TESTS_DIR):
+        if path not in sys.path:
+            sys.path.append(path)
+
+
+def sample_minutes(quotes, count):
+    """
+    Pick a deterministic, representative set of corpus minutes.
+
+    Minutes are spread evenly over the sorted time keys, and the minutes
+    with the shortest and longest quotes are always included so both ends
+    of the layout cost are covered.
+    """
+    keys = sorted(quotes)
+    if not keys:
+        return []
+    if len(keys) <= count:
+        return keys
+    step = len(keys) / count
+    sample = {keys[int(i * step)] for i in range(count)}
+    by_length = sorted(keys, key=lambda key: len(quotes[key].get('quote', '')))
+    sample.update((by_length[0], by_length[-1]))
+    return sorted(sample)
+
+
+def summarize(samples):
+    """Reduce a list of per-iteration durations (seconds) to summary statistics"""
+    ordered = sorted(samples)
+    p95_index = min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))
+    return {
+        'iterations': len(ordered),
+        'mean': statistics.mean(ordered),
+        'median': statistics.median(ordered),
+        'p95': ordered[p95_index],
+        'min': ordered[0],
+        'max': ordered[-1],
+    }
+
+
+class BenchmarkContext:
+    """Objects shared by the benchmarks, built on first use"""
+
+    def __init__(self, sample_size=24):
+        self.sample_size = sample_size
+        self._quote_generator = None
+        self._display_manager = None
+        self._e_ink_display_manager = None
+        self._backends = {}
+        self._client = None
+        self._minutes = None
+        self._images = None
+        self._frames = None
+
+    @property
+    def quote_generator(self):
+        if self._quote_generator is None:
+            from quote_generator import QuoteGenerator
+            self._quote_generator = QuoteGenerator()
+        return self._quote_generator
+
+    @property
+    def display_manager(self):
+        if self._display_manager is None:
+            from display_manager import DisplayManager
+            self._display_manager = DisplayManager()
+            self._display_manager.init()
+        return self._display_manager
+
+    @property
+    def e_ink_display_manager(self):
+        if self._e_ink_display_manager is None:
+            from e_ink_display_manager import DisplayManager as EInkDisplayManager
+            self._e_ink_display_manager = EInkDisplayManager(use_mocks=True)
+        return self._e_ink_display_manager
+
+    def backend(self, name):
+        """The display backend called `name`, initialized once"""
+        if name not in self._backends:
+            from display_backend import create_backend
+            self._backends[name] = create_backend(name)
+            self._backends[name].init()
+        return self._backends[name]
+
+    @property
+    def client(self):
+        if self._client is None:
+            import web_server
+            self._client = web_server.app.test_client()
+        return self._client
+
+    @property
+    def minutes(self):
+        if self._minutes is None:
+            self._minutes = sample_minutes(self.quote_generator.quotes, self.sample_size)
+        return self._minutes
+
+    def when(self, index):
+        """Return the datetime of the `index`-th sampled minute"""
+        hour, minute = self.minutes[index % len(self.minutes)].split(':')
+        return datetime.now().replace(hour=int(hour), minute=int(minute), second=0, microsecond=0)
+
+    def image(self, index):
+        """Rendered frame for the `index`-th sampled minute, rendered once and reused"""
+        if self._images is None:
+            self._images = [self.quote_generator.create_image(self.when(i)) for i in range(len(self.minutes))]
+        return self._images[index % len(self._images)]
+
+    def frame(self, index):
+        """Packed black and red planes for the `index`-th sampled minute"""
+        if self._frames is None:
+            self._frames = {}
+        key = index % len(self.minutes)
+        if key not in self._frames:
+            self._frames[key] = self.display_manager.convert_image_to_planes(self.image(key))
+        return self._frames[key]
+
+
+@benchmark('corpus_load', iterations=10)
+def bench_corpus_load(context, index):
+    context.quote_generator.load_quotes()
+
+
+@benchmark('quote_lookup', iterations=200)
+def bench_quote_lookup(context, index):
+    context.quote_generator.get_current_quote(context.when(index))
+
+
+@benchmark('wrap')
+def bench_wrap(context, index):
+    from layout import wrap_text
+    generator = context.quote_generator
+    font = generator.load_fonts()['quote']
+    quote = generator.get_current_quote(context.when(index))['quote']
+    wrap_text(quote, font, generator.width - 100)
+
+
+@benchmark('layout')
+def bench_layout(context, index):
+    from layout import compute_layout
+    generator = context.quote_generator
+    fonts = generator.load_fonts()
+    quote_data = generator.get_current_quote(context.when(index))
+    compute_layout(quote_data, fonts, generator.width, generator.height, generator.font_size)
+
+
+def draw_frame(context, index, renderer=None):
+    """Replay the layout of the `index`-th sampled minute onto a blank frame"""
+    from PIL import Image, ImageDraw
+    generator = context.quote_generator
+    fonts = generator.load_fonts()
+    layout = generator.get_layout(generator.get_current_quote(context.when(index)), fonts)
+    image = Image.new('RGB', (generator.width, generator.height), generator.background_color)
+    if renderer is None:
+        layout.draw(ImageDraw.Draw(image), fonts, generator.text_color)
+    else:
+        renderer.draw_layout(image, layout, fonts, generator.text_color)
+
+
+@benchmark('draw')
+def bench_draw(context, index):
+    draw_frame(context, index)
+
+
+@benchmark('draw_atlas')
+def bench_draw_atlas(context, index):
+    draw_frame(context, index, context.quote_generator.glyph_atlases())
+
+
+@benchmark('create_image')
+def bench_create_image(context, index):
+    context.quote_generator.create_image(context.when(index))
+
+
+@benchmark('convert_image_to_bytes', iterations=5)
+def bench_convert_image_to_bytes(context, index):
+    context.display_manager.convert_image_to_bytes(context.image(index))
+
+
+@benchmark('convert_image_to_bytes_atkinson', iterations=5)
+def bench_convert_image_to_bytes_atkinson(context, index):
+    context.display_manager.convert_image_to_bytes(context.image(index), 'atkinson')
+
+
+@benchmark('getbuffer_4gray_floyd_steinberg', iterations=3)
+def bench_getbuffer_4gray_floyd_steinberg(context, index):
+    context.e_ink_display_manager.getbuffer_4gray(context.image(index), 'floyd-steinberg')
+
+
+@benchmark('getbuffer_4gray', iterations=3)
+def bench_getbuffer_4gray(context, index):
+    context.e_ink_display_manager.getbuffer_4gray(context.image(index))
+
+
+@benchmark('convert_image_to_planes', iterations=5)
+def bench_convert_image_to_planes(context, index):
+    context.display_manager.convert_image_to_planes(context.image(index))
+
+
+@benchmark('display_transfer', iterations=3)
+def bench_display_transfer(context, index):
+    context.display_manager.display(*context.frame(index))
+    # The mock SPI device keeps everything written; drop it between frames
+    context.display_manager.spi._buffer = []
+
+
+def bench_backend(name):
+    """Pack and show a frame through backend `name`, the same way for every backend"""
+    def run(context, index):
+        backend = context.backend(name)
+        backend.display(*backend.convert_image_to_planes(context.image(index)))
+        spi = getattr(backend, 'spi', None)
+        if hasattr(spi, '_buffer'):
+            spi._buffer = []  # The mock SPI device keeps everything written
+    return run
+
+
+for _name in ('uc8159', 'ssd', 'epd13in3b', 'simulator'):
+    benchmark(f'backend_{_name}', iterations=3)(bench_backend(_name))
+
+
+@benchmark('api_config', iterations=50)
+def bench_api_config(context, index):
+    context.client.get('/api/config')
+
+
+@benchmark('api_quotes', iterations=10)
+def bench_api_quotes(context, index):
+    context.client.get('/api/quotes')
+
+
+@benchmark('api_display_status', iterations=50)
+def bench_api_display_status(context, index):
+    context.client.get('/api/display/status')
+
+
+@benchmark('api_current_image', iterations=20)
+def bench_api_current_image(context, index):
+    context.client.get('/api/display/current-image')
+
+
+def measure(func, context, iterations, warmup=1):
+    """Time `iterations` calls of `func(context, index)` after `warmup` untimed calls"""
+    for index in range(warmup):
+        func(context, index)
+    samples = []
+    for index in range(max(1, iterations)):
+        start = time.perf_counter()
+        func(context, index)
+        samples.append(time.perf_counter() - start)
+    return summarize(samples)
+
+
+def log_result(name, stats, log=print):
+    log(f"{name:<32} median {stats['median'] * 1000:9.2f} ms  "
+        f"p95 {stats['p95'] * 1000:9.2f} ms  ({stats['iterations']} runs)")
+
+
+def results_document(results, **meta):
+    return {
+        'meta': dict({
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'machine': platform.machine(),
+        }, **meta),
+        'benchmarks': results,
+    }
+
+
+def run(names=None, sample_size=24, scale=1.0, log=print):
+    """
+    Run the registered benchmarks and return the results document.
+
+    `names` restricts the run to the given benchmarks; `scale` multiplies
+    every benchmark's iteration count (at least one iteration each).
+    """
+    use_mock_hardware()
+    context = BenchmarkContext(sample_size)
+    results = {}
+    for name, func, iterations, warmup in BENCHMARKS:
+        if names and name not in names:
+            continue
+        results[name] = measure(func, context, int(iterations * scale), warmup)
+        log_result(name, results[name], log)
+
+    return results_document(
+        results,
+        corpus_size=len(context._quote_generator.quotes) if context._quote_generator else None,
+        sampled_minutes=context._minutes or [])
+
+
+def synthetic_corpus_path(rows, seed=0):
+    """Return the cached synthetic corpus with `rows` rows, generating it on first use"""
+    from benchmarks.synthetic_corpus import SyntheticCorpus
+    os.makedirs(CORPORA_DIR, exist_ok=True)
+    path = os.path.join(CORPORA_DIR, f'synthetic_{rows}_{seed}.csv')
+    if not os.path.exists(path):
+        tmp_path = path + '.tmp'
+        SyntheticCorpus(rows, seed=seed, unicode_mix=0.1).write(tmp_path)
+        os.replace(tmp_path, path)
+    return path
+
+
+def size_label(rows):
+    if rows >= 1000000 and rows % 1000000 == 0:
+        return f'{rows // 1000000}M'
+    if rows >= 1000 and rows % 1000 == 0:
+        return f'{rows // 1000}k'
+    return str(rows)
+
+
+def run_scaling(sizes=SCALING_SIZES, sample_size=24, scale=1.0, log=print):
+    """
+    Benchmark ingest, lookup and rendering against synthetic corpora of each size.
+
+    Corpora are generated once and cached under benchmarks/corpora/. Ingest
+    is timed as a full import into an empty data directory and as a
+    re-import of the unchanged file, which only hashes it.
+    """
+    import tempfile
+    from pathlib import Path
+    from quote_import import MANIFEST_NAME, parse_quotes_csv, sync_corpus
+    from quote_generator import QuoteGenerator
+
+    use_mock_hardware()
+    results = {}
+    for rows in sizes:
+        label = size_label(rows)
+        log(f"Preparing {rows} row corpus")
+        csv_path = synthetic_corpus_path(rows)
+        ingest_iterations = int((3 if rows <= 100000 else 1) * scale)
+
+        with tempfile.TemporaryDirectory() as data_dir:
+            data_dir = Path(data_dir)
+            json_path = data_dir / 'quotes.json'
+            manifest_path = data_dir / MANIFEST_NAME
+
+            def full_import(context, index):
+                for path in (json_path, manifest_path):
+                    if path.exists():
+                        path.unlink()
+                sync_corpus(csv_path, json_path, manifest_path)
+
+            cases = [
+                ('parse', lambda context, index: parse_quotes_csv(csv_path), ingest_iterations, 0),
+                ('ingest', full_import, ingest_iterations, 0),
+                ('reimport_unchanged', lambda context, index: sync_corpus(csv_path, json_path, manifest_path),
+                 ingest_iterations, 0),
+            ]
+            for case, func, iterations, warmup in cases:
+                name = f'scale_{label}/{case}'
+                results[name] = measure(func, None, iterations, warmup)
+                log_result(name, results[name], log)
+
+            generator = QuoteGenerator()
+            generator.data_dir = data_dir
+            generator.load_config()
+            generator.load_quotes()
+            context = BenchmarkContext(sample_size)
+            context._quote_generator = generator
+
+            # The content filter is applied once, when the selection index is built
+            cases = [
+                ('quote_lookup', bench_quote_lookup, 200, 1, 'all'),
+                ('quote_lookup_sfw', bench_quote_lookup, 50, 1, 'sfw'),
+                ('create_image', bench_create_image, 20, 1, 'all'),
+            ]
+            for case, func, iterations, warmup, content_filter in cases:
+                generator.set_config(dict(generator.config, content_filter=content_filter))
+                name = f'scale_{label}/{case}'
+                results[name] = measure(func, context, int(iterations * scale), warmup)
+                log_result(name, results[name], log)
+
+    return results_document(results, corpus_sizes=list(sizes))
+
+
+def compare(results, baseline, threshold=0.25, metric='median'):
+    """
+    Compare a results document against a baseline.
+
+    Returns a list of (name, baseline, current, ratio) for every benchmark
+    whose `metric` grew by more than `threshold` (0.25 = 25% slower).
+    """
+    regressions = []
+    for name, current in results['benchmarks'].items():
+        previous = baseline.get('benchmarks', {}).get(name)
+        if not previous or not previous.get(metric):
+            continue
+        ratio = current[metric] / previous[metric]
+        if ratio > 1 + threshold:
+            regressions.append((name, previous[metric], current[metric], ratio))
+    return regressions
+
+
+def load_results(path):
+    with open(path, 'r') as f:
+        return json.load(f)
+
+
+def save_results(results, path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, 'w') as f:
+        json.dump(results, f, indent=4)
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""
+Deterministic generator for synthetic quote corpora.
+
+Emits the same pipe-delimited format as data/litclock_annotated.csv
+(HH:MM|display time|quote|book|author|rating) at any size, so ingest,
+lookup and rendering can be exercised far beyond the shipped corpus.
+The same seed and options always produce byte-identical output.
+
+    python -m benchmarks.synthetic_corpus 100000 -o /tmp/corpus.csv --unicode-mix 0.3
+"""
+import math
+import random
+import argparse
+
+ENGLISH_WORDS = (
+    'the of and to in was he it that his with had as for her she at on by not but '
+    'which from be they all this were an my so have one there would said me what '
+    'could been into then no more time night clock hour morning evening light door '
+    'window street house room long little old great still again before after '
+    'looked thought knew heard came went stood turned waited watched began felt '
+    'face hand eyes voice silence train letter river city rain snow garden table'
+).split()
+
+UNICODE_WORDS = {
+    'latin': 'café naïve façade über straße élan garçon señor déjà Zürich mañana crème'.split(),
+    'greek': 'χρόνος ώρα νύχτα πρωί φως σιωπή βιβλίο δρόμος'.split(),
+    'cyrillic': 'время час ночь утро свет тишина книга улица'.split(),
+    'cjk': '時間 夜 朝 光 静か 本 道 時計 東京'.split(),
+    'arabic': 'الوقت الساعة الليل الصباح ضوء'.split(),
+    'emoji': '⏰ 🕰 🌙 ☀ ✨ 📖'.split(),
+}
+
+NUMBER_WORDS = ('zero one two three four five six seven eight nine ten eleven twelve thirteen '
+                'fourteen fifteen sixteen seventeen eighteen nineteen').split()
+TENS_WORDS = {2: 'twenty', 3: 'thirty', 4: 'forty', 5: 'fifty'}
+
+TITLE_WORDS = 'The Night Clock Hour Station Garden River Letters Winter Summer House City Last Long'.split()
+FIRST_NAMES = 'Anna Marcel Virginia James Agatha Leo Edith Haruki Zadie Italo Olga Jorge'.split()
+LAST_NAMES = 'Woolf Proust Joyce Christie Tolstoy Wharton Murakami Smith Calvino Borges Tokarczuk'.split()
+
+
+def number_words(n):
+    """Spell out 0-59 in English"""
+    if n < 20:
+        return NUMBER_WORDS[n]
+    tens, ones = divmod(n, 10)
+    return TENS_WORDS[tens] + ('-' + NUMBER_WORDS[ones] if ones else '')
+
+
+def time_phrase(hour, minute, rng):
+    """Return a display-time phrase for the minute in one of the corpus's styles"""
+    hour12 = hour % 12 or 12
+    style = rng.randrange(4)
+    if minute == 0 and hour in (0, 12) and style < 2:
+        return 'midnight' if hour == 0 else 'noon'
+    if style == 0:
+        return f"{hour12}:{minute:02d} {'A.M.' if hour < 12 else 'P.M.'}"
+    if style == 1:
+        return f"{hour:02d}:{minute:02d}"
+    if minute == 0:
+        return f"{number_words(hour12)} o'clock"
+    if minute == 30:
+        return f"half past {number_words(hour12)}"
+    if minute <= 30:
+        return f"{number_words(minute)} minutes past {number_words(hour12)}"
+    return f"{number_words(60 - minute)} minutes to {number_words(hour12 % 12 + 1)}"
+
+
+def parse_length_distribution(spec):
+    """
+    Parse a quote length spec into a sampler of word counts.
+
+    Supported specs are `fixed:N`, `uniform:LOW:HIGH` and
+    `lognormal:MEDIAN:SIGMA` (the shipped corpus is roughly lognormal:55:0.7).
+    """
+    kind, _, params = spec.partition(':')
+    values = [float(value) for value in params.split(':') if value]
+    if kind == 'fixed' and len(values) == 1:
+        return lambda rng: max(1, int(values[0]))
+    if kind == 'uniform' and len(values) == 2:
+        return lambda rng: rng.randint(max(1, int(values[0])), max(1, int(values[1])))
+    if kind == 'lognormal' and len(values) == 2:
+        mu = math.log(values[0])
+        return lambda rng: max(3, min(2000, int(rng.lognormvariate(mu, values[1]))))
+    raise ValueError(f"Invalid quote length distribution: {spec!r}")
+
+
+def parse_rating_mix(spec):
+    """Parse `sfw=0.9,nsfw=0.08,unknown=0.02` into (ratings, weights); unknown is written as an empty field"""
+    ratings, weights = [], []
+    for part in spec.split(','):
+        name, _, weight = part.partition('=')
+        name = name.strip().lower()
+        if name not in ('sfw', 'nsfw', 'unknown') or not weight:
+            raise ValueError(f"Invalid rating mix: {spec!r}")
+        ratings.append('' if name == 'unknown' else name)
+        weights.append(float(weight))
+    return ratings, weights
+
+
+class SyntheticCorpus:
+    """
+    Generator for synthetic corpus rows.
+
+    Args:
+        rows (int): Number of rows to emit.
+        seed (int): Random seed; equal seeds give identical corpora.
+        length_distribution (str): Quote length in words, see parse_length_distribution().
+        unicode_mix (float): Fraction of words drawn from non-ASCII scripts.
+        br_rate (float): Fraction of quotes containing `<br/>` line breaks.
+        rating_mix (str): Rating weights, see parse_rating_mix().
+        duplicate_density (float): Probability that a row reuses a minute that
+            already has a quote instead of taking a new one. Once every
+            covered minute is used all further rows are duplicates.
+        minute_coverage (float): Fraction of the 1440 minutes of the day that
+            get any quote at all.
+    """
+
+    def __init__(self, rows, seed=0, length_distribution='lognormal:55:0.7', unicode_mix=0.0,
+                 br_rate=0.15, rating_mix='sfw=0.9,nsfw=0.08,unknown=0.02',
+                 duplicate_density=0.6, minute_coverage=1.0):
+        self.rows = rows
+        self.seed = seed
+        self.quote_words = parse_length_distribution(length_distribution)
+        self.unicode_mix = unicode_mix
+        self.br_rate = br_rate
+        self.ratings, self.rating_weights = parse_rating_mix(rating_mix)
+        self.duplicate_density = duplicate_density
+        self.minute_coverage = minute_coverage
+        self.unicode_words = [word for words in UNICODE_WORDS.values() for word in words]
+
+    def word(self, rng):
+        if self.unicode_mix and rng.random() < self.unicode_mix:
+            return rng.choice(self.unicode_words)
+        return rng.choice(ENGLISH_WORDS)
+
+    def quote(self, rng, phrase):
+        words = [self.word(rng) for _ in range(self.quote_words(rng))]
+        # Every quote mentions its time, as in the real corpus
+        words.insert(rng.randrange(len(words) + 1), phrase)
+        if rng.random() < self.br_rate and len(words) > 1:
+            for index in rng.sample(range(1, len(words)), min(rng.randint(1, 3), len(words) - 1)):
+                words[index] = '<br/>' + words[index]
+        text = ' '.join(words).replace(' <br/>', '<br/>')
+        return text[0].upper() + text[1:] + '.'
+
+    def __iter__(self):
+        """Yield (time_key, display_time, quote, book, author, rating) tuples"""
+        rng = random.Random(self.seed)
+        minutes = list(range(24 * 60))
+        rng.shuffle(minutes)
+        pool = minutes[:max(1, int(round(len(minutes) * self.minute_coverage)))]
+        unused = list(pool)
+        used = []
+
+        for _ in range(self.rows):
+            if unused and not (used and rng.random() < self.duplicate_density):
+                minute_of_day = unused.pop()
+                used.append(minute_of_day)
+            else:
+                minute_of_day = rng.choice(used)
+            hour, minute = divmod(minute_of_day, 60)
+            phrase = time_phrase(hour, minute, rng)
+            book = ' '.join(rng.sample(TITLE_WORDS, rng.randint(1, 3)))
+            author = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+            rating = rng.choices(self.ratings, self.rating_weights)[0]
+            yield (f"{hour:02d}:{minute:02d}", phrase, self.quote(rng, phrase), book, author, rating)
+
+    def write(self, path):
+        """Write the corpus to `path` as pipe-delimited UTF-8 and return the row count"""
+        count = 0
+        with open(path, 'w', encoding='utf-8') as f:
+            for row in self:
+                f.write('|'.join(row) + '\n')
+                count += 1
+        return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Generate a synthetic pipe-delimited quote corpus')
+    parser.add_argument('rows', type=int, help='Number of rows to generate')
+    parser.add_argument('-o', '--output', default='synthetic_quotes.csv', help='Output CSV path')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--length-distribution', default='lognormal:55:0.7',
+                        help='fixed:N, uniform:LOW:HIGH or lognormal:MEDIAN:SIGMA (words)')
+    parser.add_argument('--unicode-mix', type=float, default=0.0, help='Fraction of non-ASCII words')
+    parser.add_argument('--br-rate', type=float, default=0.15, help='Fraction of quotes with <br/> breaks')
+    parser.add_argument('--rating-mix', default='sfw=0.9,nsfw=0.08,unknown=0.02')
+    parser.add_argument('--duplicate-density', type=float, default=0.6,
+                        help='Probability a row reuses a minute that already has a quote')
+    parser.add_argument('--minute-coverage', type=float, default=1.0,
+                        help='Fraction of the day\'s minutes that get a quote')
+    args = parser.parse_args()
+
+    corpus = SyntheticCorpus(args.rows, seed=args.seed, length_distribution=args.length_distribution,
+                             unicode_mix=args.unicode_mix, br_rate=args.br_rate,
+                             rating_mix=args.rating_mix, duplicate_density=args.duplicate_density,
+                             minute_coverage=args.minute_coverage)
+    count = corpus.write(args.output)
+    print(f"Wrote {count} rows to {args.output}")
+
+
+if __name__ == '__main__':
+    main()
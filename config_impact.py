@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Classification of config fields by the work a change to them invalidates.
+
+Saving settings should only redo what the changed fields feed into: a new
+update interval reschedules the next update, a new content filter rebuilds
+the selection index, and font or info changes re-lay out every frame.
+"""
+
+SCHEDULER = 'scheduler'  # When the next update happens
+SELECTION = 'selection'  # Which quote is shown for each minute
+LAYOUT = 'layout'        # How a frame is laid out; every rendered frame is stale
+PREVIEW = 'preview'      # Where the preview image is stored
+PACKING = 'packing'      # How frames are packed for the panel; packed frames are stale
+PROFILER = 'profiler'    # Profiling of upcoming cycles
+
+CONFIG_IMPACT = {
+    'update_interval': {SCHEDULER},
+    'content_filter': {SELECTION},
+    'font_size': {LAYOUT},
+    'show_book_info': {LAYOUT},
+    'show_author': {LAYOUT},
+    'highlight_time': {LAYOUT},
+    'time_color': {LAYOUT},  # Not where text goes, but every frame is drawn differently
+    'display_brightness': set(),  # Not applied by the panel driver
+    'preview_storage': {PREVIEW},
+    'preview_tmpfs_dir': {PREVIEW},
+    'profile_cycles': {PROFILER},
+    'persist_layouts': set(),  # Layouts are keyed by what they depend on
+    'text_renderer': set(),  # Both renderers draw the same pixels
+    'dither_mode': {PACKING},
+    'display_backend': set(),  # Picked when the panel is first used; takes effect on restart
+    'display_daemon': set(),  # Read when the display routes are first used; takes effect on restart
+}
+
+# Fields we know nothing about might affect anything
+UNKNOWN_IMPACT = {SCHEDULER, SELECTION, LAYOUT, PREVIEW, PACKING}
+
+# Values a missing field behaves as, so adding a field at its default is not a change
+FIELD_DEFAULTS = {
+    'update_interval': 300,
+    'font_size': 24,
+    'content_filter': 'all',
+    'show_book_info': True,
+    'show_author': True,
+    'highlight_time': True,
+    'time_color': 'black',
+    'preview_storage': 'disk',
+    'profile_cycles': 0,
+    'persist_layouts': False,
+    'text_renderer': 'freetype',
+    'dither_mode': 'threshold',
+    'display_backend': 'uc8159',
+    'display_daemon': False,
+}
+
+
+class ConfigImpact:
+    """The fields that differ between two configs and what they invalidate"""
+
+    def __init__(self, changed):
+        self.changed = sorted(changed)
+        # Minutes whose selected quote changed; None when every frame is stale
+        self.changed_minutes = set()
+        self.impacts = set()
+        for field in self.changed:
+            self.impacts |= CONFIG_IMPACT.get(field, UNKNOWN_IMPACT)
+
+    def __contains__(self, impact):
+        return impact in self.impacts
+
+    def __bool__(self):
+        return bool(self.changed)
+
+    @property
+    def refresh_preview(self):
+        """Whether the preview image has to be rendered or stored again"""
+        return bool(self.impacts & {SELECTION, LAYOUT, PREVIEW})
+
+    def to_dict(self):
+        return {
+            'changed': self.changed,
+            'impacts': sorted(self.impacts),
+            'refresh_preview': self.refresh_preview,
+        }
+
+
+def analyze_config_change(old, new):
+    """Return the ConfigImpact of replacing config `old` with `new`"""
+    fields = set(old) | set(new)
+    return ConfigImpact(field for field in fields
+                        if old.get(field, FIELD_DEFAULTS.get(field)) != new.get(field, FIELD_DEFAULTS.get(field)))
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""
+Local control socket between the web server and the display daemon.
+
+A Unix stream socket carrying one JSON request per connection, like
+{"command": "update"}, answered with one JSON line. Handlers return a
+dict; an exception in a handler is sent back as an error status.
+"""
+import os
+import json
+import socket
+import threading
+from pathlib import Path
+from storage import DEFAULT_TMPFS_DIR
+
+DEFAULT_CONTROL_SOCKET = DEFAULT_TMPFS_DIR / 'display.sock'
+MAX_MESSAGE = 64 * 1024
+
+
+def read_line(conn):
+    """Read one newline-terminated message from `conn`"""
+    data = b''
+    while not data.endswith(b'\n'):
+        chunk = conn.recv(4096)
+        if not chunk:
+            break
+        data += chunk
+        if len(data) > MAX_MESSAGE:
+            raise ValueError("Control message too long")
+    return data
+
+
+class ControlServer:
+    """Serves `handlers`, a dict of command name to function, on the socket at `path`"""
+
+    def __init__(self, handlers, path=DEFAULT_CONTROL_SOCKET):
+        self.handlers = handlers
+        self.path = Path(path)
+        self.sock = None
+        self.thread = None
+
+    def start(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.unlink(missing_ok=True)  # Left behind by a daemon that did not shut down cleanly
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        self.sock.bind(str(self.path))
+        os.chmod(self.path, 0o660)
+        self.sock.listen(8)
+        self.thread = threading.Thread(target=self.serve, name='control', daemon=True)
+        self.thread.start()
+        return self
+
+    def serve(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return  # Closed by stop()
+            # Updates take seconds; keep answering status requests meanwhile
+            threading.Thread(target=self.handle, args=(conn,), daemon=True).start()
+
+    def handle(self, conn):
+        with conn:
+            try:
+                request = json.loads(read_line(conn))
+                handler = self.handlers.get(request.get('command'))
+                if handler is None:
+                    raise ValueError(f"Unknown command: {request.get('command')}")
+                reply = handler()
+            except Exception as e:
+                reply = {'status': 'error', 'message': str(e)}
+            try:
+                conn.sendall(json.dumps(reply).encode() + b'\n')
+            except OSError:
+                pass  # The client gave up waiting
+
+    def stop(self):
+        if self.sock is not None:
+            try:
+                self.sock.shutdown(socket.SHUT_RDWR)  # Wakes the accept() in serve()
+            except OSError:
+                pass
+            self.sock.close()
+            self.sock = None
+        self.path.unlink(missing_ok=True)
+
+
+def call(command, path=DEFAULT_CONTROL_SOCKET, timeout=60):
+    """Send `command` to the display daemon and return its reply; ConnectionError if it is not running"""
+    try:
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(timeout)
+            sock.connect(str(path))
+            sock.sendall(json.dumps({'command': command}).encode() + b'\n')
+            data = read_line(sock)
+    except (FileNotFoundError, ConnectionRefusedError) as e:
+        raise ConnectionError(f"Display daemon is not running ({path}): {e}") from e
+    if not data:
+        raise ConnectionError("Display daemon closed the connection without replying")
+    return json.loads(data)
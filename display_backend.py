@@ -0,0 +1,215 @@
+#!/usr/bin/env python3
+"""
+Pluggable display backends.
+
+Every panel driver implements the same small interface, so the server, the
+scheduler and the benchmarks drive whichever one `display_backend` in
+config.json names:
+
+    width, height     panel resolution
+    capabilities      frozenset of 'red', 'partial' and '4gray'
+    init()            wake the panel and make it ready for a frame
+    convert_image_to_planes(image, dither_mode=None)
+                      pack a frame into (black, red) in the driver's own
+                      layout; red is None for panels without a red plane
+    display(black, red=None)
+                      upload a packed frame and refresh the panel
+    display_partial(image, x_start, y_start, x_end, y_end)
+                      refresh only a window; backends with 'partial'
+    sleep()           put the panel into deep sleep
+
+The backends:
+
+    uc8159     display_manager.DisplayManager; black and red planes
+    ssd        e_ink_display_manager.DisplayManager; partial and 4-gray
+    epd13in3b  Waveshare's utils/epd13in3b driver on top of epdconfig
+    simulator  no hardware; each refresh is written to a PNG file
+
+Drivers are imported only when their backend is created, so naming one in
+the config never pulls in another's GPIO or SPI modules.
+"""
+import io
+import os
+import sys
+from pathlib import Path
+import numpy as np
+from PIL import Image
+from dither import dither
+from storage import write_file_atomic
+from tracing import TRACER
+
+DEFAULT_BACKEND = 'uc8159'
+SIMULATOR_PATH = Path('images/simulator/panel.png')
+UTILS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'utils')
+
+
+def fit_image(image, mode, width, height):
+    """Return the PIL Image `image` in `mode` at `width` x `height`"""
+    if not isinstance(image, Image.Image):
+        raise TypeError("Input must be a PIL Image")
+    if image.mode != mode:
+        image = image.convert(mode)
+    if image.size != (width, height):
+        image = image.resize((width, height))
+    return image
+
+
+def split_planes(image, width, height, dither_mode='threshold'):
+    """
+    Return (black, red) pixel arrays of `image`: black is 1 where the
+    pixel stays white after dithering with `dither_mode`, red is True for
+    red pixels, which are white in the black plane.
+    """
+    rgb = np.asarray(fit_image(image, 'RGB', width, height))
+    red = (rgb[..., 0] > 128) & (rgb[..., 1] <= 128) & (rgb[..., 2] <= 128)
+    gray = np.asarray(Image.fromarray(rgb).convert('L')).copy()
+    gray[red] = 255
+    return dither(gray, dither_mode, 2), red
+
+
+def pack_rows(pixels):
+    """Pack a 0/1 pixel array row by row, the leftmost pixel in the highest bit"""
+    return np.packbits(pixels, axis=1).ravel()
+
+
+def unpack_rows(data, width, height):
+    """Inverse of pack_rows"""
+    data = np.asarray(data, dtype=np.uint8).reshape(height, -1)
+    return np.unpackbits(data, axis=1, count=width).astype(bool)
+
+
+class Epd13in3bBackend:
+    """Waveshare's 13.3" (B) driver in utils/epd13in3b, behind the backend interface"""
+    capabilities = frozenset({'red', 'partial'})
+    SLEEP_KEEP_RAM = 0x01  # Deep sleep mode 1 keeps the display RAM; the driver's mode 2 (0x03) loses it
+
+    def __init__(self):
+        # The driver imports epdconfig as a top-level module
+        if UTILS_DIR not in sys.path:
+            sys.path.append(UTILS_DIR)
+        import epd13in3b
+        self.epd = epd13in3b.EPD()
+        self.width = self.epd.width
+        self.height = self.epd.height
+        self.dither_mode = 'threshold'  # See dither.DITHER_MODES
+        self.sleep_mode = self.SLEEP_KEEP_RAM
+        self.red_plane = None  # Red plane in the panel's RAM 0x26, while it is known to be there
+
+    def init(self):
+        # Neither the hardware reset nor SWRESET clears the display RAM
+        self.epd.init()
+
+    def convert_image_to_planes(self, image, dither_mode=None):
+        """Pack `image` row-major, a set bit leaving the pixel white in either plane"""
+        black, red = split_planes(image, self.width, self.height, dither_mode or self.dither_mode)
+        return pack_rows(black).tolist(), pack_rows(~red).tolist()
+
+    def display(self, black, red=None):
+        if isinstance(black, Image.Image):
+            black, red = self.convert_image_to_planes(black)
+        if red is not None:
+            red = list(red)
+            if red == self.red_plane:
+                red = None  # Still in the panel's RAM
+            else:
+                self.red_plane = red
+        self.epd.display(list(black), None if red is None else list(red))
+
+    def display_partial(self, image, x_start, y_start, x_end, y_end):
+        black, _ = self.convert_image_to_planes(image)
+        self.epd.display_Partial(black, x_start, y_start, x_end, y_end)
+        self.red_plane = None  # display_Partial writes the black image into RAM 0x26 too
+
+    def sleep(self):
+        """
+        Deep sleep, by default in the mode that keeps the red plane in RAM
+        for the next frame. Unlike the driver's sleep() this leaves the
+        panel powered, as cutting the power loses the RAM as well.
+        """
+        self.epd.send_command(0x10)  # DEEP_SLEEP
+        self.epd.send_data(self.sleep_mode)
+        if self.sleep_mode != self.SLEEP_KEEP_RAM:
+            self.red_plane = None
+
+
+class SimulatorBackend:
+    """
+    A panel that needs no hardware: it keeps its planes in memory like the
+    panel's RAM and writes the composed black/red/white frame to `path` as
+    a PNG on every refresh.
+    """
+    capabilities = frozenset({'red', 'partial'})
+    width = 960
+    height = 680
+
+    def __init__(self, path=SIMULATOR_PATH):
+        self.path = Path(path)
+        self.dither_mode = 'threshold'  # See dither.DITHER_MODES
+        self.black = np.ones((self.height, self.width), dtype=bool)  # True is white
+        self.red = np.zeros((self.height, self.width), dtype=bool)
+        self.refreshes = 0
+
+    def init(self):
+        pass
+
+    def convert_image_to_planes(self, image, dither_mode=None):
+        black, red = split_planes(image, self.width, self.height, dither_mode or self.dither_mode)
+        return pack_rows(black), pack_rows(~red)
+
+    def display(self, black, red=None):
+        if isinstance(black, Image.Image):
+            black, red = self.convert_image_to_planes(black)
+        self.black = unpack_rows(black, self.width, self.height)
+        if red is not None:
+            self.red = ~unpack_rows(red, self.width, self.height)
+        self.refresh()
+
+    def display_partial(self, image, x_start, y_start, x_end, y_end):
+        black, red = split_planes(image, self.width, self.height, self.dither_mode)
+        window = (slice(y_start, y_end), slice(x_start, x_end))
+        self.black[window] = black[window].astype(bool)
+        self.red[window] = red[window]
+        self.refresh()
+
+    def render(self):
+        """Return the panel's current contents as an RGB image"""
+        pixels = np.where(self.black[..., None], np.uint8(255), np.uint8(0)).repeat(3, axis=2)
+        pixels[self.red] = (255, 0, 0)
+        return Image.fromarray(pixels, 'RGB')
+
+    @TRACER.traced('simulator refresh')
+    def refresh(self):
+        buffer = io.BytesIO()
+        self.render().save(buffer, format='PNG')
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        write_file_atomic(self.path, buffer.getvalue(), kind='simulator', sync=False)
+        self.refreshes += 1
+
+    def sleep(self):
+        pass
+
+
+def create_uc8159():
+    from display_manager import DisplayManager
+    return DisplayManager()
+
+
+def create_ssd():
+    from tests.mock_config import USE_MOCKS
+    from e_ink_display_manager import DisplayManager
+    return DisplayManager(use_mocks=USE_MOCKS)
+
+
+BACKENDS = {
+    'uc8159': create_uc8159,
+    'ssd': create_ssd,
+    'epd13in3b': Epd13in3bBackend,
+    'simulator': SimulatorBackend,
+}
+
+
+def create_backend(name=DEFAULT_BACKEND):
+    """Build the display backend called `name`"""
+    if name not in BACKENDS:
+        raise ValueError(f"Unknown display backend {name!r}; expected one of {', '.join(BACKENDS)}")
+    return BACKENDS[name]()
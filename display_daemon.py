@@ -0,0 +1,101 @@
+#!/usr/bin/env python3
+"""
+Display daemon: the display loop in a process of its own.
+
+With display_daemon set in config.json, run this next to web_server.py.
+The daemon is then the only process that touches the panel. Every frame
+it shows is published to the shared-memory framebuffer (framebuffer.py),
+from which the web server serves the preview, and the web server forwards
+its display routes to the daemon over the control socket (control.py).
+Config and corpus changes saved by the web server reach the daemon through
+its own watcher on the data directory.
+
+Control commands: status, start, stop, update and reload.
+"""
+import signal
+import threading
+import sd_daemon
+import web_server
+from control import DEFAULT_CONTROL_SOCKET, ControlServer
+from framebuffer import DEFAULT_FRAMEBUFFER_PATH, FrameBuffer
+from tracing import TRACER
+
+
+class DisplayDaemon:
+    """Runs the web server's display loop and publishes what it shows"""
+
+    def __init__(self, framebuffer_path=DEFAULT_FRAMEBUFFER_PATH, control_path=DEFAULT_CONTROL_SOCKET):
+        self.framebuffer = FrameBuffer(framebuffer_path)
+        self.control = ControlServer({
+            'status': self.status,
+            'start': self.start_updates,
+            'stop': self.stop_updates,
+            'update': self.update,
+            'reload': self.reload,
+        }, control_path)
+
+    def publish(self, time_key, image, data):
+        """Frame listener: publish the packed planes and the preview PNG just saved"""
+        quote_generator = web_server.quote_generator
+        png = quote_generator.frame_store.read(quote_generator.preview_path())
+        black, red = data
+        self.framebuffer.publish(time_key, black, red, png or b'')
+
+    def status(self):
+        status = web_server.display_status()
+        status['frame'] = self.framebuffer.etag()
+        return status
+
+    def start_updates(self):
+        return {'status': 'success' if web_server.start_updates() else 'already running'}
+
+    def stop_updates(self):
+        web_server.stop_updates()
+        return {'status': 'success'}
+
+    def update(self):
+        with web_server.profiler.cycle('force_update'), TRACER.span('force update'):
+            web_server.update_now()
+        return {'status': 'success'}
+
+    def reload(self):
+        """Reload config and corpus now rather than when the watcher notices"""
+        web_server.apply_data_changes(set(web_server.WATCHED_FILES))
+        return {'status': 'success'}
+
+    def start(self, updates=True):
+        self.framebuffer.create()
+        # Ahead of notify_ready, so the frame is published by the time systemd hears READY=1
+        web_server.frame_listeners.insert(0, self.publish)
+        self.control.start()
+        web_server.start_watcher()
+        if updates:
+            web_server.start_updates()
+        return self
+
+    def stop(self):
+        self.control.stop()
+        web_server.stop_updates()
+        if self.publish in web_server.frame_listeners:
+            web_server.frame_listeners.remove(self.publish)
+        self.framebuffer.close()
+
+
+def main():
+    if sd_daemon.notify_socket() is not None:
+        # Ready, and watched by systemd, once the first frame is on the panel
+        web_server.frame_listeners.append(web_server.notify_ready)
+    daemon = DisplayDaemon().start()
+    print(f"Display daemon listening on {daemon.control.path}")
+    stopping = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stopping.set())
+    try:
+        stopping.wait()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        daemon.stop()
+
+
+if __name__ == '__main__':
+    main()
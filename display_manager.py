@@ -4,6 +4,10 @@ import time
 import sys
 from PIL import Image
 import numpy as np
+from metrics import BUSY_WAIT_SECONDS, PACK_SECONDS, SPI_BYTES, SPI_TRANSACTIONS
+from tracing import TRACER
+from dither import dither
+from display_backend import fit_image, split_planes
 
 # Add the tests directory to the Python path
 sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'tests'))
@@ -22,6 +26,9 @@ else:
     import spidev
 
 class DisplayManager:
+    """UC8159-style driver for the 13.3" (B) panel; the `uc8159` display backend"""
+    capabilities = frozenset({'red'})  # See display_backend
+
     # Pin definitions using BOARD numbering (physical pin numbers)
     RST_PIN = 11    # Physical pin 11 (BCM 17)
     DC_PIN = 22     # Physical pin 22 (BCM 25)
@@ -32,6 +39,8 @@ class DisplayManager:
     EPD_WIDTH = 960
     EPD_HEIGHT = 680
 
+    SPI_CHUNK = 4096  # spidev's default bufsiz
+
     def __init__(self):
         self.reset_pin = self.RST_PIN
         self.dc_pin = self.DC_PIN
@@ -40,6 +49,12 @@ class DisplayManager:
         self.width = self.EPD_WIDTH
         self.height = self.EPD_HEIGHT
         self.initialized = False
+        self.powered = False  # Booster on, as after POWER_ON; POWER_OFF keeps the display RAM
+        self.deep_sleep = False  # Deep sleep in sleep(); it loses the display RAM and needs a reset
+        self.dither_mode = 'threshold'  # See dither.DITHER_MODES
+        self.spi_bytes = 0  # Running totals, observed per frame in display()
+        self.spi_transactions = 0
+        self.red_plane = None  # Red plane last uploaded, while the panel RAM still holds it
         
         # Set GPIO mode at initialization
         GPIO.setmode(GPIO.BOARD)  # Use physical pin numbers
@@ -66,12 +81,25 @@ class DisplayManager:
         self.digital_write(self.dc_pin, GPIO.LOW)
         self.digital_write(self.cs_pin, GPIO.LOW)
         self.spi.writebytes([command])
+        self.spi_bytes += 1
+        self.spi_transactions += 1
         self.digital_write(self.cs_pin, GPIO.HIGH)
 
     def send_data(self, data):
         self.digital_write(self.dc_pin, GPIO.HIGH)
         self.digital_write(self.cs_pin, GPIO.LOW)
         self.spi.writebytes([data])
+        self.spi_bytes += 1
+        self.spi_transactions += 1
+        self.digital_write(self.cs_pin, GPIO.HIGH)
+
+    def send_data_bulk(self, data):
+        """Write a whole buffer in one call; spidev splits it into SPI_CHUNK-byte transfers"""
+        self.digital_write(self.dc_pin, GPIO.HIGH)
+        self.digital_write(self.cs_pin, GPIO.LOW)
+        self.spi.writebytes2(data)
+        self.spi_bytes += len(data)
+        self.spi_transactions += -(-len(data) // self.SPI_CHUNK)
         self.digital_write(self.cs_pin, GPIO.HIGH)
 
     def module_exit(self):
@@ -151,14 +179,30 @@ class DisplayManager:
         self.send_data(0x12)  # VCOM = -0.1V
         self.send_command(0x04)  # POWER_ON
         self.wait_until_idle()
+        self.powered = True
         self.send_command(0x10)  # DEEP_SLEEP
         self.send_data(0x00)  # 00H
 
+    def power_on(self):
+        """Turn the booster back on after sleep() powered it off"""
+        if not self.powered:
+            self.send_command(0x04)  # POWER_ON
+            self.wait_until_idle()
+            self.powered = True
+
+    @BUSY_WAIT_SECONDS.timed
+    @TRACER.traced('busy wait')
     def wait_until_idle(self):
         while self.digital_read(self.busy_pin) == 1:
             self.delay_ms(100)
 
+    def observe_transfer(self, start_bytes, start_transactions):
+        """Record the SPI traffic of one display update in the metrics"""
+        SPI_BYTES.observe(self.spi_bytes - start_bytes)
+        SPI_TRANSACTIONS.observe(self.spi_transactions - start_transactions)
+
     def reset(self):
+        self.red_plane = None  # Display RAM is not kept over a hardware reset
         self.digital_write(self.reset_pin, GPIO.HIGH)
         self.delay_ms(200)
         self.digital_write(self.reset_pin, GPIO.LOW)
@@ -166,55 +210,65 @@ class DisplayManager:
         self.digital_write(self.reset_pin, GPIO.HIGH)
         self.delay_ms(200)
 
-    def convert_image_to_bytes(self, image):
-        """Convert a PIL Image to bytes for the e-paper display."""
-        if not isinstance(image, Image.Image):
-            raise TypeError("Input must be a PIL Image")
-        
-        # Convert to grayscale if not already
-        if image.mode != 'L':
-            image = image.convert('L')
-        
-        # Resize to display dimensions if needed
-        if image.size != (self.width, self.height):
-            image = image.resize((self.width, self.height))
-        
-        # Convert to binary (black and white)
-        threshold = 128
-        image = image.point(lambda x: 0 if x > threshold else 1, '1')
-        
-        # Convert to bytes
-        pixels = np.array(image)
-        bytes_array = []
-        
-        for y in range(0, self.height, 8):
-            for x in range(self.width):
-                byte = 0
-                for bit in range(min(8, self.height - y)):
-                    if y + bit < self.height and pixels[y + bit, x] == 0:
-                        byte |= 1 << bit
-                bytes_array.append(byte)
-        
-        return bytes_array
+    def pack_plane(self, pixels):
+        """Pack each column of 8 rows of a 0/1 pixel array into a byte, the top row in the lowest bit"""
+        rows = -(-self.height // 8) * 8
+        bits = np.zeros((rows, self.width), dtype=np.uint8)
+        bits[:self.height] = pixels
+        return np.packbits(bits.reshape(rows // 8, 8, self.width), axis=1, bitorder='little').ravel()
+
+    @PACK_SECONDS.timed
+    @TRACER.traced('pack')
+    def convert_image_to_bytes(self, image, dither_mode=None):
+        """Convert a PIL Image to bytes for the e-paper display, dithered with `dither_mode`."""
+        image = fit_image(image, 'L', self.width, self.height)
+        # Convert to binary (black and white); 1 is white
+        pixels = dither(np.asarray(image), dither_mode or self.dither_mode, 2)
+        return self.pack_plane(pixels).tolist()
+
+    @PACK_SECONDS.timed
+    @TRACER.traced('pack')
+    def convert_image_to_planes(self, image, dither_mode=None):
+        """
+        Split a PIL Image into the panel's black and red planes and pack both.
+
+        Red pixels go to the red plane and are white in the black plane; the
+        rest is dithered with `dither_mode` as in convert_image_to_bytes. In
+        both planes a set bit leaves the pixel white.
+        """
+        black, red = split_planes(image, self.width, self.height, dither_mode or self.dither_mode)
+        return self.pack_plane(black), self.pack_plane(~red)
 
-    def display(self, image):
+    def display(self, image, red=None):
+        """
+        Show `image`, a PIL Image or a packed black plane, with the packed
+        `red` plane (none when omitted). The red plane is only uploaded when
+        it differs from the one already in the panel's RAM.
+        """
         if not self.initialized:
             self.init()
         
         # Convert image to bytes if needed
         if isinstance(image, Image.Image):
-            image_bytes = self.convert_image_to_bytes(image)
-        else:
-            image_bytes = image
+            image, red = self.convert_image_to_planes(image)
+        black = np.asarray(image, dtype=np.uint8)
+        if red is None:
+            red = np.full(self.height * self.width // 8, 0xFF, dtype=np.uint8)
+        red = np.asarray(red, dtype=np.uint8)
         
-        self.send_command(0x10)
-        for i in range(0, self.height * self.width // 8):
-            self.send_data(0xFF)
+        start_bytes, start_transactions = self.spi_bytes, self.spi_transactions
+        if self.red_plane is None or not np.array_equal(red, self.red_plane):
+            with TRACER.span('spi plane 0x10'):
+                self.send_command(0x10)
+                self.send_data_bulk(red)
+            self.red_plane = red
         
-        self.send_command(0x13)
-        for byte in image_bytes:
-            self.send_data(byte)
+        with TRACER.span('spi plane 0x13'):
+            self.send_command(0x13)
+            self.send_data_bulk(black)
         
+        self.observe_transfer(start_bytes, start_transactions)
+        self.power_on()
         self.send_command(0x12)
         self.wait_until_idle()
 
@@ -229,23 +283,37 @@ class DisplayManager:
         self.send_command(0x13)
         for i in range(0, self.height * self.width // 8):
             self.send_data(0xFF)
+        self.red_plane = None
         
+        self.power_on()
         self.send_command(0x12)
         self.wait_until_idle()
 
+    @TRACER.traced('panel sleep')
     def sleep(self):
+        """
+        Power the panel off between frames. The display RAM, and with it the
+        red plane, survives POWER_OFF; with `deep_sleep` set the panel goes
+        into deep sleep as well, and the next init() resets it.
+        """
         if not self.initialized:
             return
         
         self.send_command(0x02)  # POWER_OFF
         self.wait_until_idle()
-        self.send_command(0x07)  # DEEP_SLEEP
-        self.send_data(0xA5)  # check code
+        self.powered = False
+        if self.deep_sleep:
+            self.send_command(0x07)  # DEEP_SLEEP
+            self.send_data(0xA5)  # check code
+            self.red_plane = None  # Display RAM is lost in deep sleep
+            self.spi.close()
+            self.initialized = False  # Only the hardware reset in init() wakes the panel
 
 def main():
     display = DisplayManager()
     display.init()
     display.clear()
+    display.deep_sleep = True
     display.sleep()
 
 if __name__ == "__main__":
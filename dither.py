@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Dithering of grayscale frames down to the panel's 1-bit or 4-gray levels.
+
+Every mode maps an 8-bit grayscale array to level indices, 0 being black and
+`levels - 1` white:
+
+    threshold        fixed cut-offs; the original packing behaviour
+    bayer            ordered dithering with an 8x8 Bayer matrix
+    blue-noise       ordered dithering with a 64x64 void-and-cluster mask
+    floyd-steinberg  error diffusion, full error
+    atkinson         error diffusion, 3/4 of the error, crisper on text
+
+Error diffusion is inherently sequential along a row, so it is run on a
+skewed wavefront instead: with t = x + 2y every pixel a kernel pushes error
+to has a larger t than the pixel it comes from, so all pixels with the same
+t are independent. Shearing the image so each wavefront is one row of an
+array turns the frame into W + 2H vectorized steps rather than W * H
+scalar ones.
+"""
+import io
+from pathlib import Path
+import numpy as np
+from storage import write_file_atomic
+
+DITHER_MODES = ('threshold', 'bayer', 'blue-noise', 'floyd-steinberg', 'atkinson')
+
+# (dx, dy, weight) of the error pushed to each neighbour
+DIFFUSION_KERNELS = {
+    'floyd-steinberg': [(1, 0, 7 / 16), (-1, 1, 3 / 16), (0, 1, 5 / 16), (1, 1, 1 / 16)],
+    'atkinson': [(1, 0, 1 / 8), (2, 0, 1 / 8), (-1, 1, 1 / 8), (0, 1, 1 / 8), (1, 1, 1 / 8), (0, 2, 1 / 8)],
+}
+SKEW = 2  # t = x + SKEW * y; must make dx + SKEW * dy positive for every kernel entry
+BLUE_NOISE_PATH = Path('cache/dither/blue_noise_64.npy')
+
+_blue_noise = None
+
+
+def bayer_matrix(order=3):
+    """Return the 2**order square Bayer index matrix"""
+    matrix = np.zeros((1, 1), dtype=np.int64)
+    for _ in range(order):
+        matrix = np.block([[4 * matrix, 4 * matrix + 2], [4 * matrix + 3, 4 * matrix + 1]])
+    return matrix
+
+
+def blue_noise_matrix(size=64, sigma=1.5, seed=0):
+    """
+    Return a `size` square blue-noise rank matrix built with Ulichney's
+    void-and-cluster method on a torus. Deterministic for a given seed.
+    """
+    cells = size * size
+    # Gaussian energy of a single point at the origin, wrapped around the torus
+    offsets = np.minimum(np.arange(size), size - np.arange(size))
+    kernel = np.exp(-(offsets[:, None] ** 2 + offsets[None, :] ** 2) / (2 * sigma ** 2))
+
+    def splat(energy, index, sign):
+        y, x = divmod(index, size)
+        energy += sign * np.roll(np.roll(kernel, y, axis=0), x, axis=1)
+
+    rng = np.random.default_rng(seed)
+    pattern = np.zeros(cells, dtype=bool)
+    pattern[rng.choice(cells, cells // 10, replace=False)] = True
+    energy = np.zeros((size, size))
+    for index in np.flatnonzero(pattern):
+        splat(energy, index, 1)
+
+    # Move points from the tightest cluster to the largest void until stable
+    while True:
+        cluster = int(np.argmax(np.where(pattern, energy.ravel(), -np.inf)))
+        pattern[cluster] = False
+        splat(energy, cluster, -1)
+        void = int(np.argmin(np.where(pattern, np.inf, energy.ravel())))
+        pattern[void] = True
+        splat(energy, void, 1)
+        if void == cluster:
+            break
+
+    ranks = np.zeros(cells, dtype=np.int64)
+    initial, initial_energy = pattern.copy(), energy.copy()
+    # Rank the initial points by removing the tightest cluster first
+    for rank in range(int(pattern.sum()) - 1, -1, -1):
+        cluster = int(np.argmax(np.where(pattern, energy.ravel(), -np.inf)))
+        pattern[cluster] = False
+        splat(energy, cluster, -1)
+        ranks[cluster] = rank
+    # Rank the rest by filling the largest void first
+    pattern, energy = initial, initial_energy
+    for rank in range(int(pattern.sum()), cells):
+        void = int(np.argmin(np.where(pattern, np.inf, energy.ravel())))
+        pattern[void] = True
+        splat(energy, void, 1)
+        ranks[void] = rank
+    return ranks.reshape(size, size)
+
+
+def load_blue_noise(path=BLUE_NOISE_PATH):
+    """Return the blue-noise matrix, generating it into `path` the first time"""
+    try:
+        return np.load(path)
+    except (OSError, ValueError):
+        pass
+    matrix = blue_noise_matrix()
+    try:
+        Path(path).parent.mkdir(parents=True, exist_ok=True)
+        buffer = io.BytesIO()
+        np.save(buffer, matrix)
+        write_file_atomic(path, buffer.getvalue(), kind='dither', sync=False)
+    except OSError as e:
+        print(f"Could not cache blue-noise matrix: {e}")
+    return matrix
+
+
+def threshold_map(mode, shape):
+    """Return per-pixel thresholds in (0, 1) tiling the mode's matrix over `shape`"""
+    global _blue_noise
+    if mode == 'bayer':
+        matrix = bayer_matrix()
+    else:
+        if _blue_noise is None:
+            _blue_noise = load_blue_noise()
+        matrix = _blue_noise
+    thresholds = (matrix + 0.5) / matrix.size
+    reps = (-(-shape[0] // matrix.shape[0]), -(-shape[1] // matrix.shape[1]))
+    return np.tile(thresholds, reps)[:shape[0], :shape[1]]
+
+
+def diffuse(gray, kernel, levels):
+    """Error-diffuse `gray` with `kernel`, one skewed wavefront at a time"""
+    height, width = gray.shape
+    steps = width + SKEW * (height - 1)
+    reach = max(dx + SKEW * dy for dx, dy, _ in kernel)
+    depth = max(dy for _, dy, _ in kernel)
+    scale = (levels - 1) / 255.0
+
+    # sheared[t, y] = gray[y, t - SKEW * y]; cells off the image are never read
+    sheared = np.zeros((steps + reach, height + depth), dtype=np.float32)
+    for y in range(height):
+        sheared[SKEW * y:SKEW * y + width, y] = gray[y] * scale
+    levels_out = np.zeros((steps, height), dtype=np.uint8)
+    targets = [(dx + SKEW * dy, dy, weight) for dx, dy, weight in kernel]
+
+    for t in range(steps):
+        # Rows whose pixel on this wavefront lies inside the image
+        first = max(0, -(-(t - width + 1) // SKEW))
+        last = min(height, t // SKEW + 1)
+        row = sheared[t, first:last]
+        level = np.clip(np.rint(row), 0, levels - 1)
+        error = row - level
+        for step, dy, weight in targets:
+            sheared[t + step, first + dy:last + dy] += error * weight
+        levels_out[t, first:last] = level
+
+    result = np.empty((height, width), dtype=np.uint8)
+    for y in range(height):
+        result[y] = levels_out[SKEW * y:SKEW * y + width, y]
+    return result
+
+
+def dither(gray, mode='threshold', levels=2):
+    """
+    Return the level (0 = black .. `levels` - 1 = white) of each pixel of
+    the 8-bit grayscale array `gray` dithered with `mode`.
+    """
+    gray = np.asarray(gray, dtype=np.uint8)
+    if levels not in (2, 4):
+        raise ValueError(f"Unsupported number of levels: {levels}")
+    if mode == 'threshold':
+        if levels == 2:
+            return (gray > 128).astype(np.uint8)
+        return gray >> 6  # Bands 0-63, 64-127, 128-191, 192-255
+    if mode in ('bayer', 'blue-noise'):
+        scaled = gray.astype(np.float32) * ((levels - 1) / 255.0)
+        return np.minimum(np.floor(scaled + threshold_map(mode, gray.shape)), levels - 1).astype(np.uint8)
+    if mode in DIFFUSION_KERNELS:
+        return diffuse(gray, DIFFUSION_KERNELS[mode], levels)
+    raise ValueError(f"Unknown dither mode {mode!r}; expected one of {', '.join(DITHER_MODES)}")
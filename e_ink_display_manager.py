@@ -4,12 +4,18 @@ import time
 import sys
 from PIL import Image
 import numpy as np
+from metrics import BUSY_WAIT_SECONDS, PACK_SECONDS, SPI_BYTES, SPI_TRANSACTIONS
+from tracing import TRACER
+from dither import dither
 
 class DisplayManager:
     """
     DisplayManager class for 13.3 inch e-ink display.
     This is a standalone implementation that does not depend on external modules.
+    It is the `ssd` display backend.
     """
+    capabilities = frozenset({'partial', '4gray'})  # See display_backend
+
     # Pin definitions using BOARD numbering (physical pin numbers)
     RST_PIN = 11    # Physical pin 11 (BCM 17)
     DC_PIN = 22     # Physical pin 22 (BCM 25)
@@ -43,6 +49,9 @@ class DisplayManager:
         self.width = self.EPD_WIDTH
         self.height = self.EPD_HEIGHT
         self.initialized = False
+        self.dither_mode = 'threshold'  # See dither.DITHER_MODES
+        self.spi_bytes = 0  # Running totals, observed per frame in display()
+        self.spi_transactions = 0
         
         # Import the appropriate modules based on whether we're using mocks
         if use_mocks:
@@ -186,6 +195,8 @@ class DisplayManager:
         self.digital_write(self.dc_pin, self.GPIO.LOW)
         self.digital_write(self.cs_pin, self.GPIO.LOW)
         self.spi.writebytes([command])
+        self.spi_bytes += 1
+        self.spi_transactions += 1
         self.digital_write(self.cs_pin, self.GPIO.HIGH)
 
     def send_data(self, data):
@@ -193,6 +204,8 @@ class DisplayManager:
         self.digital_write(self.dc_pin, self.GPIO.HIGH)
         self.digital_write(self.cs_pin, self.GPIO.LOW)
         self.spi.writebytes([data])
+        self.spi_bytes += 1
+        self.spi_transactions += 1
         self.digital_write(self.cs_pin, self.GPIO.HIGH)
 
     def send_data2(self, data):
@@ -200,6 +213,8 @@ class DisplayManager:
         self.digital_write(self.dc_pin, self.GPIO.HIGH)
         self.digital_write(self.cs_pin, self.GPIO.LOW)
         self.spi.writebytes2(data)
+        self.spi_bytes += len(data)
+        self.spi_transactions += 1
         self.digital_write(self.cs_pin, self.GPIO.HIGH)
 
     def lut(self, lut_table):
@@ -219,6 +234,8 @@ class DisplayManager:
         self.send_command(0x2C)
         self.send_data(lut_table[109])
 
+    @BUSY_WAIT_SECONDS.timed
+    @TRACER.traced('busy wait')
     def wait_until_idle(self):
         """Wait until the display is idle (not busy)."""
         print("e-Paper busy")
@@ -262,6 +279,11 @@ class DisplayManager:
         self.GPIO.cleanup()
         self.initialized = False
 
+    def observe_transfer(self, start_bytes, start_transactions):
+        """Record the SPI traffic of one display update in the metrics"""
+        SPI_BYTES.observe(self.spi_bytes - start_bytes)
+        SPI_TRANSACTIONS.observe(self.spi_transactions - start_transactions)
+
     def reset(self):
         """Reset the display."""
         self.digital_write(self.reset_pin, self.GPIO.HIGH)
@@ -422,8 +444,10 @@ class DisplayManager:
 
         self.lut(self.LUT_DATA_4Gray)
 
-    def convert_image_to_bytes(self, image):
-        """Convert a PIL Image to bytes for the e-paper display."""
+    @PACK_SECONDS.timed
+    @TRACER.traced('pack')
+    def convert_image_to_bytes(self, image, dither_mode=None):
+        """Convert a PIL Image to bytes for the e-paper display, dithered with `dither_mode`."""
         if not isinstance(image, Image.Image):
             raise TypeError("Input must be a PIL Image")
         
@@ -435,26 +459,23 @@ class DisplayManager:
         if image.size != (self.width, self.height):
             image = image.resize((self.width, self.height))
         
-        # Convert to binary (black and white)
-        threshold = 128
-        image = image.point(lambda x: 0 if x > threshold else 1, '1')
-        
-        # Convert to bytes
-        pixels = np.array(image)
-        bytes_array = []
+        # Convert to binary (black and white); 1 is white
+        pixels = dither(np.asarray(image), dither_mode or self.dither_mode, 2)
         
-        for y in range(0, self.height, 8):
-            for x in range(self.width):
-                byte = 0
-                for bit in range(min(8, self.height - y)):
-                    if y + bit < self.height and pixels[y + bit, x] == 0:
-                        byte |= 1 << bit
-                bytes_array.append(byte)
-        
-        return bytes_array
+        # Pack each column of 8 rows into a byte, the top row in the lowest bit
+        rows = -(-self.height // 8) * 8
+        bits = np.zeros((rows, self.width), dtype=np.uint8)
+        bits[:self.height] = pixels
+        return np.packbits(bits.reshape(rows // 8, 8, self.width), axis=1, bitorder='little').ravel().tolist()
+
+    def convert_image_to_planes(self, image, dither_mode=None):
+        """Pack a PIL Image like convert_image_to_bytes; this panel has no red plane."""
+        return self.convert_image_to_bytes(image, dither_mode), None
 
-    def getbuffer_4gray(self, image):
-        """Convert a PIL Image to bytes for 4 gray levels."""
+    @PACK_SECONDS.timed
+    @TRACER.traced('pack')
+    def getbuffer_4gray(self, image, dither_mode=None):
+        """Convert a PIL Image to bytes for 4 gray levels, dithered with `dither_mode`."""
         if not isinstance(image, Image.Image):
             raise TypeError("Input must be a PIL Image")
         
@@ -466,29 +487,13 @@ class DisplayManager:
         if image.size != (self.width, self.height):
             image = image.resize((self.width, self.height))
         
-        buf_4gray = [0x00] * (int(self.width * self.height // 4))
-        
-        pixels = image.load()
-        for y in range(self.height):
-            for x in range(self.width):
-                # Get the pixel value and map it to one of the 4 gray levels
-                gray = 0
-                if pixels[x, y] >= 192:
-                    gray = 0  # white
-                elif pixels[x, y] >= 128:
-                    gray = 1  # light gray
-                elif pixels[x, y] >= 64:
-                    gray = 2  # dark gray
-                else:
-                    gray = 3  # black
-                
-                # Pack two gray values into one byte
-                newx = y * self.width + x
-                value4 = (gray << ((newx % 4) * 2))
-                
-                buf_4gray[newx//4] |= value4
+        # Gray codes: 0 white, 1 light gray, 2 dark gray, 3 black
+        gray = 3 - dither(np.asarray(image), dither_mode or self.dither_mode, 4)
         
-        return buf_4gray
+        # Pack four pixels into each byte, the first in the lowest bits
+        gray = gray.ravel().reshape(-1, 4)
+        buf_4gray = gray[:, 0] | (gray[:, 1] << 2) | (gray[:, 2] << 4) | (gray[:, 3] << 6)
+        return buf_4gray.tolist()
 
     def clear(self):
         """Clear the display (all white)."""
@@ -506,8 +511,8 @@ class DisplayManager:
         self.send_command(0x12)
         self.wait_until_idle()
 
-    def display(self, image):
-        """Display an image on the e-paper screen."""
+    def display(self, image, red=None):
+        """Display an image on the e-paper screen; `red` is ignored, there is no red plane."""
         if not self.initialized:
             self.init()
         
@@ -517,14 +522,16 @@ class DisplayManager:
         else:
             image_bytes = image
         
-        self.send_command(0x10)
-        for i in range(0, self.height * self.width // 8):
-            self.send_data(0xFF)
+        start_bytes, start_transactions = self.spi_bytes, self.spi_transactions
+        with TRACER.span('spi plane 0x10'):
+            self.send_command(0x10)
+            self.send_data2([0xFF] * (self.height * self.width // 8))
         
-        self.send_command(0x13)
-        for byte in image_bytes:
-            self.send_data(byte)
+        with TRACER.span('spi plane 0x13'):
+            self.send_command(0x13)
+            self.send_data2(image_bytes)
         
+        self.observe_transfer(start_bytes, start_transactions)
         self.send_command(0x12)
         self.wait_until_idle()
 
@@ -539,14 +546,18 @@ class DisplayManager:
         else:
             image_bytes = image
         
-        self.send_command(0x10)
-        for byte in image_bytes:
-            self.send_data(byte)
+        start_bytes, start_transactions = self.spi_bytes, self.spi_transactions
+        with TRACER.span('spi plane 0x10'):
+            self.send_command(0x10)
+            for byte in image_bytes:
+                self.send_data(byte)
             
-        self.send_command(0x13)
-        for i in range(0, self.height * self.width // 8):
-            self.send_data(0xFF)
+        with TRACER.span('spi plane 0x13'):
+            self.send_command(0x13)
+            for i in range(0, self.height * self.width // 8):
+                self.send_data(0xFF)
             
+        self.observe_transfer(start_bytes, start_transactions)
         self.turn_on_display()
 
     def display_partial(self, image, x_start, y_start, x_end, y_end):
@@ -568,6 +579,7 @@ class DisplayManager:
         else:
             image_bytes = image
         
+        start_bytes, start_transactions = self.spi_bytes, self.spi_transactions
         self.send_command(0x44)
         self.send_data(x_start & 0xFF)
         self.send_data((x_start >> 8) & 0xFF)
@@ -588,10 +600,12 @@ class DisplayManager:
         self.send_data(y_start & 0xFF)
         self.send_data((y_start >> 8) & 0xFF)
         
-        self.send_command(0x13)
-        for byte in image_bytes:
-            self.send_data(byte)
+        with TRACER.span('spi plane 0x13'):
+            self.send_command(0x13)
+            for byte in image_bytes:
+                self.send_data(byte)
         
+        self.observe_transfer(start_bytes, start_transactions)
         self.turn_on_display_partial()
 
     def display_4gray(self, image):
@@ -605,30 +619,35 @@ class DisplayManager:
         else:
             image_bytes = image
         
-        self.send_command(0x10)
-        for i in range(0, self.height * self.width // 8):
-            self.send_data(0x00)
+        start_bytes, start_transactions = self.spi_bytes, self.spi_transactions
+        with TRACER.span('spi plane 0x10'):
+            self.send_command(0x10)
+            for i in range(0, self.height * self.width // 8):
+                self.send_data(0x00)
             
-        self.send_command(0x13)
-        for i in range(0, int(self.height * self.width // 4)):
-            temp3 = 0
-            for j in range(4):
-                temp1 = image_bytes[i]
-                temp2 = temp1 & 0x03
-                if j == 0:
-                    temp3 |= (temp2 << 6)
-                elif j == 1:
-                    temp3 |= (temp2 << 4)
-                elif j == 2:
-                    temp3 |= (temp2 << 2)
-                else:
-                    temp3 |= temp2
-                temp1 = (temp1 >> 2)
-                image_bytes[i] = temp1
-            self.send_data(temp3)
+        with TRACER.span('spi plane 0x13'):
+            self.send_command(0x13)
+            for i in range(0, int(self.height * self.width // 4)):
+                temp3 = 0
+                for j in range(4):
+                    temp1 = image_bytes[i]
+                    temp2 = temp1 & 0x03
+                    if j == 0:
+                        temp3 |= (temp2 << 6)
+                    elif j == 1:
+                        temp3 |= (temp2 << 4)
+                    elif j == 2:
+                        temp3 |= (temp2 << 2)
+                    else:
+                        temp3 |= temp2
+                    temp1 = (temp1 >> 2)
+                    image_bytes[i] = temp1
+                self.send_data(temp3)
             
+        self.observe_transfer(start_bytes, start_transactions)
         self.turn_on_display_4gray()
 
+    @TRACER.traced('panel sleep')
     def sleep(self):
         """Put the display to sleep to save power."""
         if not self.initialized:
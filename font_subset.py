@@ -0,0 +1,204 @@
+#!/usr/bin/env python3
+"""
+Build step that subsets the role fonts down to the characters the corpus uses.
+
+The corpus draws a few hundred distinct codepoints, while each DejaVu face
+carries several thousand glyphs. Subsetting each role's own font to the
+characters of the ingested quotes, display times, books and authors (plus
+ASCII, which covers the digits and fixed labels) makes the files the panel
+opens a fraction of the size. The subsets are written to
+cache/fonts/subsets/ with a manifest that QuoteGenerator reads through
+fonts.load_subsets(); each subset is placed ahead of its full font in the
+role's chain, so a character added to the corpus later is still drawn by
+the full font until the subsets are rebuilt.
+
+Requires fontTools (pip install fonttools), which is only needed here:
+
+    python font_subset.py              # build from data/quotes.json
+    python font_subset.py --measure    # build, then compare load time and RSS
+"""
+import io
+import os
+import sys
+import json
+import time
+import hashlib
+import statistics
+import argparse
+import subprocess
+from pathlib import Path
+from fonts import FONT_CHAINS, FONT_SUBSET_DIR, SUBSET_FORMAT, SUBSET_MANIFEST, chain_paths
+from quote_text import quote_tokens
+from storage import write_file_atomic, write_json_atomic
+
+ROOT_DIR = os.path.dirname(os.path.abspath(__file__))
+# Digits, punctuation and the fixed labels ("No quote available", " by ") are all ASCII
+ALWAYS_INCLUDED = ''.join(chr(codepoint) for codepoint in range(0x20, 0x7F))
+
+
+def have_fonttools():
+    try:
+        import fontTools.subset  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+def corpus_text(quotes):
+    """Yield every piece of text the layout can draw for `quotes`"""
+    yield ALWAYS_INCLUDED
+    for time_key, quote_data in quotes.items():
+        yield time_key
+        for field in ('display_time', 'book', 'author'):
+            yield str(quote_data.get(field, ''))
+        for token in quote_tokens(quote_data):
+            if isinstance(token, str):
+                yield token
+            else:
+                for piece, _ in token:
+                    yield piece
+
+
+def corpus_codepoints(quotes):
+    """Return the sorted codepoints used by `quotes`, including ASCII"""
+    codepoints = set()
+    for text in corpus_text(quotes):
+        codepoints.update(ord(char) for char in text if not char.isspace() or char == ' ')
+    return sorted(codepoints)
+
+
+def subset_fonts():
+    """Return the installed font of each role, i.e. the fonts worth subsetting"""
+    paths = []
+    for role in FONT_CHAINS:
+        role_paths = chain_paths(role)
+        if role_paths and role_paths[0] not in paths:
+            paths.append(role_paths[0])
+    return paths
+
+
+def subset_font(source, codepoints):
+    """Return the bytes of `source` cut down to `codepoints`, with glyph shapes, hinting and kerning unchanged"""
+    from fontTools import subset  # Optional dependency, only needed for this build step
+    options = subset.Options()
+    options.layout_features = ['*']  # Keep kerning and ligatures so lines measure the same
+    options.legacy_kern = True  # PIL's basic layout kerns from the old 'kern' table
+    options.hinting = True
+    options.notdef_outline = True
+    options.name_IDs = ['*']
+    options.name_languages = ['*']
+    options.glyph_names = False
+    font = subset.load_font(source, options)
+    try:
+        subsetter = subset.Subsetter(options)
+        subsetter.populate(unicodes=codepoints)
+        subsetter.subset(font)
+        buffer = io.BytesIO()
+        subset.save_font(font, buffer, options)
+    finally:
+        font.close()
+    return buffer.getvalue()
+
+
+def build_subsets(quotes, subset_dir=None, log=print):
+    """
+    Subset each role font to the codepoints of `quotes` and write the
+    manifest. Returns the manifest, or None when fontTools is not installed.
+    """
+    if not have_fonttools():
+        log("fontTools is not installed; skipping font subsetting (pip install fonttools)")
+        return None
+    subset_dir = Path(subset_dir or FONT_SUBSET_DIR)
+    subset_dir.mkdir(parents=True, exist_ok=True)
+    codepoints = corpus_codepoints(quotes)
+    digest = hashlib.sha1(json.dumps(codepoints).encode()).hexdigest()
+    manifest = {'format': SUBSET_FORMAT, 'codepoints': len(codepoints), 'digest': digest, 'fonts': {}}
+
+    for source in subset_fonts():
+        if Path(source).suffix.lower() == '.ttc':
+            log(f"Not subsetting font collection {source}")
+            continue
+        start = time.perf_counter()
+        data = subset_font(source, codepoints)
+        name = f'{Path(source).stem}-{digest[:12]}{Path(source).suffix}'
+        write_file_atomic(subset_dir / name, data, kind='font_subset', sync=False)
+        stat = Path(source).stat()
+        manifest['fonts'][source] = {
+            'subset': name,
+            'source_stat': [stat.st_size, stat.st_mtime_ns],
+            'bytes': len(data),
+        }
+        log(f"Subset {Path(source).name}: {stat.st_size} -> {len(data)} bytes "
+            f"({len(codepoints)} codepoints, {time.perf_counter() - start:.2f}s)")
+
+    # Remove subsets of earlier corpora
+    keep = {entry['subset'] for entry in manifest['fonts'].values()} | {SUBSET_MANIFEST}
+    for path in subset_dir.iterdir():
+        if path.name not in keep and path.suffix.lower() in ('.ttf', '.otf'):
+            path.unlink()
+    write_json_atomic(subset_dir / SUBSET_MANIFEST, manifest, kind='font_subset')
+    return manifest
+
+
+def probe(font_size, subset_dir=None):
+    """Load and use every role font in this process; return (seconds, RSS growth in bytes)"""
+    from fonts import load_font_set, load_subsets
+    from metrics import process_rss_bytes
+    rss = process_rss_bytes()
+    start = time.perf_counter()
+    subsets = load_subsets(subset_dir) if subset_dir else None
+    fonts = load_font_set(font_size, subsets=subsets)
+    for role in FONT_CHAINS:
+        fonts[role].getmask(ALWAYS_INCLUDED)
+    return time.perf_counter() - start, process_rss_bytes() - rss
+
+
+def measure(font_size=24, subset_dir=None, runs=5):
+    """
+    Compare loading the full fonts with loading the subsets, each in fresh
+    interpreters so neither sees the other's caches. Returns
+    {'full': {...}, 'subset': {...}} with median seconds and RSS growth.
+    """
+    subset_dir = os.path.abspath(subset_dir or FONT_SUBSET_DIR)
+    results = {}
+    for label, args in (('full', []), ('subset', ['--subset-dir', subset_dir])):
+        samples = []
+        for _ in range(runs):
+            output = subprocess.run(
+                [sys.executable, os.path.abspath(__file__), '--probe', '--font-size', str(font_size)] + args,
+                cwd=ROOT_DIR, check=True, capture_output=True, text=True).stdout
+            samples.append(json.loads(output.splitlines()[-1]))
+        results[label] = {
+            'seconds': statistics.median(sample['seconds'] for sample in samples),
+            'rss_bytes': statistics.median(sample['rss_bytes'] for sample in samples),
+        }
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Subset the role fonts to the characters used by the corpus")
+    parser.add_argument('--quotes', default=os.path.join('data', 'quotes.json'), help="ingested corpus")
+    parser.add_argument('--subset-dir', default=None, help=f"output directory (default {FONT_SUBSET_DIR})")
+    parser.add_argument('--font-size', type=int, default=24)
+    parser.add_argument('--measure', action='store_true', help="compare font load time and RSS after building")
+    parser.add_argument('--probe', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args(argv)
+
+    if args.probe:
+        seconds, rss_bytes = probe(args.font_size, args.subset_dir)
+        print(json.dumps({'seconds': seconds, 'rss_bytes': rss_bytes}))
+        return 0
+
+    with open(args.quotes, 'r', encoding='utf-8') as f:
+        quotes = json.load(f)
+    if build_subsets(quotes, args.subset_dir) is None:
+        return 1
+    if args.measure:
+        results = measure(args.font_size, args.subset_dir)
+        for label, result in results.items():
+            print(f"{label:<7} load {result['seconds'] * 1000:8.2f} ms  RSS +{result['rss_bytes'] / 1024:8.0f} KiB")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
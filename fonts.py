@@ -0,0 +1,334 @@
+#!/usr/bin/env python3
+"""
+Font discovery, per-font codepoint coverage and fallback chains.
+
+Each layout role has a chain of font files: the first one installed is the
+role's font and the rest, followed by the shared fallbacks, are tried for
+characters it has no glyph for. Coverage comes from the font's cmap table,
+read once into a bitmap of every Unicode codepoint and cached on disk, so
+choosing the font for a character is a bit test rather than a trial render.
+
+When font_subset.py has cut a role's font down to the corpus's characters,
+the subset goes first in the chain and the full font right after it, so the
+full font is only opened for characters the subset lacks.
+"""
+import json
+import zlib
+import struct
+import hashlib
+from pathlib import Path
+from PIL import ImageFont
+from storage import write_file_atomic
+
+FONT_SEARCH_PATH = [Path('/usr/share/fonts'), Path('/usr/local/share/fonts'), Path.home() / '.fonts']
+FONT_CACHE_DIR = Path('cache/fonts')
+FONT_SUBSET_DIR = FONT_CACHE_DIR / 'subsets'
+SUBSET_MANIFEST = 'manifest.json'
+SUBSET_FORMAT = 1
+# Font files for each layout role in order of preference, with the size relative to font_size
+FONT_CHAINS = {
+    'time': (['DejaVuSans-Bold.ttf'], 2, 0),
+    'quote': (['DejaVuSans.ttf'], 1, 0),
+    'quote_bold': (['DejaVuSans-Bold.ttf'], 1, 0),
+    'quote_em': (['DejaVuSans-Oblique.ttf', 'DejaVuSerif-Italic.ttf', 'DejaVuSans.ttf'], 1, 0),
+    'info': (['DejaVuSans-Oblique.ttf', 'DejaVuSerif-Italic.ttf', 'DejaVuSans.ttf'], 1, -4),
+}
+# Tried for characters a role's own fonts cannot draw
+FALLBACK_FONTS = [
+    'DejaVuSans.ttf',
+    'DejaVuSerif.ttf',
+    'FreeSerif.ttf',
+    'NotoSans-Regular.ttf',
+    'NotoSansMath-Regular.ttf',
+    'NotoSansSymbols2-Regular.ttf',
+    'NotoSansCJK-Regular.ttc',
+    'DroidSansFallbackFull.ttf',
+]
+CODEPOINTS = 0x110000
+COVERAGE_FORMAT = 1
+
+_font_paths = None
+_coverage = {}
+
+
+def find_font(filename):
+    """Return the installed path of a font file name, or None"""
+    global _font_paths
+    if _font_paths is None:
+        _font_paths = {}
+        for directory in FONT_SEARCH_PATH:
+            if directory.is_dir():
+                for path in sorted(directory.rglob('*')):
+                    if path.suffix.lower() in ('.ttf', '.otf', '.ttc'):
+                        _font_paths.setdefault(path.name, str(path))
+    return _font_paths.get(filename)
+
+
+def _read_cmap(data, offset=0):
+    """Yield the codepoints mapped to a glyph by the best cmap subtable of the font at `offset`"""
+    if data[offset:offset + 4] == b'ttcf':
+        offset = struct.unpack_from('>I', data, offset + 12)[0]  # First font of a collection
+    num_tables = struct.unpack_from('>H', data, offset + 4)[0]
+    cmap = None
+    for index in range(num_tables):
+        tag, _, table_offset, _ = struct.unpack_from('>4sIII', data, offset + 12 + 16 * index)
+        if tag == b'cmap':
+            cmap = table_offset
+    if cmap is None:
+        raise ValueError("Font has no cmap table")
+
+    subtables = {}
+    for index in range(struct.unpack_from('>H', data, cmap + 2)[0]):
+        platform, encoding, subtable = struct.unpack_from('>HHI', data, cmap + 4 + 8 * index)
+        subtables[(platform, encoding)] = cmap + subtable
+    for key in ((3, 10), (0, 6), (0, 4), (3, 1), (0, 3), (0, 2), (0, 1), (0, 0)):
+        if key in subtables:
+            subtable = subtables[key]
+            table_format = struct.unpack_from('>H', data, subtable)[0]
+            if table_format == 12:
+                return _read_format_12(data, subtable)
+            if table_format == 4:
+                return _read_format_4(data, subtable)
+    raise ValueError("Font has no Unicode cmap subtable")
+
+
+def _read_format_4(data, subtable):
+    segments = struct.unpack_from('>H', data, subtable + 6)[0] // 2
+    ends = struct.unpack_from(f'>{segments}H', data, subtable + 14)
+    starts = struct.unpack_from(f'>{segments}H', data, subtable + 16 + 2 * segments)
+    deltas = struct.unpack_from(f'>{segments}h', data, subtable + 16 + 4 * segments)
+    range_offsets_at = subtable + 16 + 6 * segments
+    range_offsets = struct.unpack_from(f'>{segments}H', data, range_offsets_at)
+    for index in range(segments):
+        for codepoint in range(starts[index], ends[index] + 1):
+            if codepoint == 0xFFFF:
+                continue
+            if range_offsets[index] == 0:
+                glyph = (codepoint + deltas[index]) & 0xFFFF
+            else:
+                glyph_at = (range_offsets_at + 2 * index + range_offsets[index]
+                            + 2 * (codepoint - starts[index]))
+                glyph = struct.unpack_from('>H', data, glyph_at)[0]
+                if glyph:
+                    glyph = (glyph + deltas[index]) & 0xFFFF
+            if glyph:
+                yield codepoint
+
+
+def _read_format_12(data, subtable):
+    groups = struct.unpack_from('>I', data, subtable + 12)[0]
+    for index in range(groups):
+        start, end, glyph = struct.unpack_from('>III', data, subtable + 16 + 12 * index)
+        for codepoint in range(start, min(end, CODEPOINTS - 1) + 1):
+            if glyph + codepoint - start:
+                yield codepoint
+
+
+class FontCoverage:
+    """Bitmap of the codepoints a font file has glyphs for"""
+
+    def __init__(self, path, bitmap):
+        self.path = path
+        self.bitmap = bitmap
+
+    def covers(self, char):
+        codepoint = ord(char)
+        return bool(self.bitmap[codepoint >> 3] & (1 << (codepoint & 7)))
+
+    def __len__(self):
+        return sum(bin(byte).count('1') for byte in self.bitmap)
+
+    @classmethod
+    def build(cls, path):
+        with open(path, 'rb') as f:
+            data = f.read()
+        bitmap = bytearray(CODEPOINTS >> 3)
+        for codepoint in _read_cmap(data):
+            bitmap[codepoint >> 3] |= 1 << (codepoint & 7)
+        return cls(path, bitmap)
+
+    @classmethod
+    def load(cls, path, cache_dir=None):
+        """Return the coverage of `path`, from the on-disk cache when the font is unchanged"""
+        cache_dir = Path(cache_dir or FONT_CACHE_DIR)
+        stat = Path(path).stat()
+        key = hashlib.sha1(f'{COVERAGE_FORMAT}:{path}:{stat.st_size}:{stat.st_mtime_ns}'.encode()).hexdigest()[:16]
+        cache_path = cache_dir / f'{Path(path).stem}-{key}.cov'
+        try:
+            with open(cache_path, 'rb') as f:
+                bitmap = bytearray(zlib.decompress(f.read()))
+            if len(bitmap) == CODEPOINTS >> 3:
+                return cls(path, bitmap)
+        except (OSError, zlib.error):
+            pass
+        coverage = cls.build(path)
+        try:
+            cache_dir.mkdir(parents=True, exist_ok=True)
+            write_file_atomic(cache_path, zlib.compress(bytes(coverage.bitmap), 9), kind='font_index', sync=False)
+        except OSError as e:
+            print(f"Could not cache font coverage for {path}: {e}")
+        return coverage
+
+
+def font_coverage(path):
+    """Return the coverage of a font file, building or loading it once per process"""
+    coverage = _coverage.get(path)
+    if coverage is None:
+        coverage = FontCoverage.load(path)
+        _coverage[path] = coverage
+    return coverage
+
+
+def load_subsets(subset_dir=None):
+    """
+    Return {font path: subset path} from the manifest written by
+    font_subset.py, leaving out subsets whose source font has changed.
+    """
+    subset_dir = Path(subset_dir or FONT_SUBSET_DIR)
+    try:
+        with open(subset_dir / SUBSET_MANIFEST, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(manifest, dict) or manifest.get('format') != SUBSET_FORMAT:
+        return {}
+    subsets = {}
+    for source, entry in manifest.get('fonts', {}).items():
+        subset = subset_dir / entry.get('subset', '')
+        try:
+            stat = Path(source).stat()
+        except OSError:
+            continue
+        if entry.get('source_stat') != [stat.st_size, stat.st_mtime_ns] or not subset.is_file():
+            print(f"Ignoring out of date font subset for {source}")
+            continue
+        subsets[source] = str(subset)
+    return subsets
+
+
+def chain_paths(role, subsets=None):
+    """
+    Return the installed font files tried for `role`, its own font first.
+    A font with an entry in `subsets` is preceded by its subset.
+    """
+    filenames, _, _ = FONT_CHAINS[role]
+    paths = []
+    for filename in filenames + FALLBACK_FONTS:
+        path = find_font(filename)
+        if path is None:
+            continue
+        for candidate in ((subsets or {}).get(path), path):
+            if candidate is not None and candidate not in paths:
+                paths.append(candidate)
+    return paths
+
+
+class FontChain:
+    """A role's fonts in fallback order, picking the font per character from coverage bitmaps"""
+
+    def __init__(self, paths):
+        self.paths = paths
+        self.coverage = []
+        for path in paths:
+            try:
+                self.coverage.append(font_coverage(path))
+            except (OSError, ValueError, struct.error) as e:
+                # Without coverage the font is still used, but only as the primary font
+                print(f"Cannot read coverage of {path}: {e}")
+                self.coverage.append(None)
+        self._choices = {}
+
+    def font_index(self, char):
+        """Return the index of the first font in the chain that can draw `char` (0 if none can)"""
+        index = self._choices.get(char)
+        if index is None:
+            index = 0
+            if not char.isspace():
+                for candidate, coverage in enumerate(self.coverage):
+                    if coverage is not None and coverage.covers(char):
+                        index = candidate
+                        break
+            self._choices[char] = index
+        return index
+
+    def covers(self, char):
+        return any(coverage is not None and coverage.covers(char) for coverage in self.coverage)
+
+    def split(self, text):
+        """Split `text` into (text, font_index) runs; spaces and marks stay in the current run"""
+        runs = []
+        for char in text:
+            index = self.font_index(char)
+            if runs and (index == 0 and (char.isspace() or not self.covers(char)) or runs[-1][1] == index):
+                runs[-1][0] += char
+            else:
+                runs.append([char, index])
+        return [tuple(run) for run in runs]
+
+
+class FontSet(dict):
+    """
+    Loaded fonts for a layout, keyed by role and by 'role+N' for a role's
+    Nth fallback font. Fallback fonts are only loaded once a run needs them.
+    """
+
+    def __init__(self, fonts, chains=None, sizes=None, load_font=ImageFont.truetype):
+        super().__init__(fonts)
+        self.chains = chains or {}
+        self.sizes = sizes or {}
+        self.load_font = load_font
+
+    def __missing__(self, key):
+        role, _, index = key.partition('+')
+        if not index or role not in self.chains:
+            raise KeyError(key)
+        font = self.load_font(self.chains[role].paths[int(index)], self.sizes[role])
+        self[key] = font
+        return font
+
+    def split(self, role, text):
+        """Split `text` into (text, font key) runs for drawing in `role`"""
+        chain = self.chains.get(role)
+        if chain is None or len(chain.paths) < 2:
+            return [(text, role)]
+        return [(run, role if index == 0 else f'{role}+{index}') for run, index in chain.split(text)]
+
+    def identity(self):
+        """Return a JSON-able description of the fonts, for cache keys"""
+        identity = []
+        for role in sorted(set(self) | set(self.chains)):
+            if '+' in role:
+                continue
+            chain = self.chains.get(role)
+            if chain is not None:
+                identity.append([role, chain.paths, self.sizes.get(role)])
+            else:
+                font = self.get(role)
+                path = getattr(font, 'path', None)
+                identity.append([role, [path if isinstance(path, str) else 'default'], getattr(font, 'size', None)])
+        return identity
+
+
+def load_font_set(font_size, load_font=ImageFont.truetype, subsets=None):
+    """
+    Return the FontSet for `font_size`, calling `load_font(path, size)` for
+    each font and preferring the font subsets in `subsets` (see
+    load_subsets). Roles without any installed font use PIL's default font.
+    """
+    fonts = {}
+    chains = {}
+    sizes = {}
+    for role, (_, scale, offset) in FONT_CHAINS.items():
+        sizes[role] = max(1, font_size * scale + offset)
+        paths = chain_paths(role, subsets)
+        for position, path in enumerate(paths):
+            try:
+                fonts[role] = load_font(path, sizes[role])
+            except OSError as e:
+                print(f"Cannot load font {path}: {e}")
+                continue
+            chains[role] = FontChain(paths[position:])
+            break
+        else:
+            fonts[role] = ImageFont.load_default()
+    return FontSet(fonts, chains, sizes, load_font)
@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+"""
+Shared-memory framebuffer between the display daemon and the web server.
+
+The daemon publishes every frame it puts on the panel - the packed black
+and red planes and the preview PNG - into a file on tmpfs that both
+processes map. A sequence counter in the header works as a seqlock: it is
+odd while a frame is being written and even once it is complete, so a
+reader copies a frame and retries if the counter moved meanwhile. A CRC
+over the payload catches a torn read that slipped past the counter.
+
+The seqlock allows one writer: publish() holds a lock, and the daemon is
+the only process that writes. Readers can answer "has the frame changed?"
+from the header alone, so serving an unchanged preview touches neither
+the payload nor the disk. A changed frame is copied out of the mapping
+once: the bytes have to outlive the next publish() while they are sent.
+
+Layout (little-endian):
+
+    magic, version, capacity, buffer id, sequence      header
+    time key, black length, red length, PNG length, CRC frame header
+    black plane, red plane, PNG                        payload
+"""
+import os
+import mmap
+import time
+import zlib
+import struct
+import threading
+from pathlib import Path
+from storage import DEFAULT_TMPFS_DIR
+
+MAGIC = b'QCLKFB\x00\x01'
+VERSION = 1
+DEFAULT_FRAMEBUFFER_PATH = DEFAULT_TMPFS_DIR / 'framebuffer'
+DEFAULT_CAPACITY = 4 * 1024 * 1024  # Two 13.3" planes and a preview PNG fit with room to spare
+NO_PLANE = 0xFFFFFFFF  # Red length of a frame without a red plane
+
+HEADER = struct.Struct('<8sIIQ')
+SEQUENCE = struct.Struct('<Q')
+FRAME = struct.Struct('<16sIIII')
+SEQUENCE_OFFSET = HEADER.size
+FRAME_OFFSET = SEQUENCE_OFFSET + SEQUENCE.size
+PAYLOAD_OFFSET = 64
+
+
+class Frame:
+    """A frame read from the framebuffer"""
+
+    def __init__(self, sequence, time_key, black, red, png):
+        self.sequence = sequence
+        self.time_key = time_key
+        self.black = black
+        self.red = red
+        self.png = png
+
+
+def as_buffer(plane):
+    """Return a packed plane (bytes, list of ints or uint8 array) as a byte buffer"""
+    if plane is None:
+        return b''
+    if isinstance(plane, (list, tuple)):
+        return bytes(plane)
+    return memoryview(plane).cast('B')
+
+
+class FrameBuffer:
+    """
+    The framebuffer at `path`. The display daemon calls create() and
+    publish(); readers call open() and then etag() and read().
+    """
+
+    def __init__(self, path=DEFAULT_FRAMEBUFFER_PATH):
+        self.path = Path(path)
+        self.map = None
+        self.capacity = 0
+        self.buffer_id = 0
+        self._inode = None
+        self._write_lock = threading.Lock()
+
+    def create(self, capacity=DEFAULT_CAPACITY):
+        """Create an empty framebuffer, replacing any left by an earlier daemon"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_name(f'.{self.path.name}.{os.getpid()}')
+        fd = os.open(temp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        try:
+            os.ftruncate(fd, PAYLOAD_OFFSET + capacity)
+            self.map = mmap.mmap(fd, PAYLOAD_OFFSET + capacity)
+        finally:
+            os.close(fd)
+        self.capacity = capacity
+        self.buffer_id = int.from_bytes(os.urandom(8), 'little')
+        HEADER.pack_into(self.map, 0, MAGIC, VERSION, capacity, self.buffer_id)
+        # Readers only map the file once it is complete
+        os.replace(temp_path, self.path)
+        self._inode = os.stat(self.path).st_ino
+        return self
+
+    def open(self):
+        """Map an existing framebuffer read-only; returns False if there is none"""
+        try:
+            with open(self.path, 'rb') as f:
+                inode = os.fstat(f.fileno()).st_ino
+                mapped = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            return False
+        magic, version, capacity, buffer_id = HEADER.unpack_from(mapped, 0)
+        if magic != MAGIC or version != VERSION:
+            mapped.close()
+            raise ValueError(f"{self.path} is not a version {VERSION} framebuffer")
+        self.close()
+        self.map, self.capacity, self.buffer_id, self._inode = mapped, capacity, buffer_id, inode
+        return True
+
+    def close(self):
+        if self.map is not None:
+            self.map.close()
+            self.map = None
+
+    def _current(self):
+        """Make sure the mapping is of the daemon's current file; returns False if there is none"""
+        try:
+            inode = os.stat(self.path).st_ino
+        except OSError:
+            return False
+        if self.map is None or inode != self._inode:
+            return self.open()  # The daemon was restarted and created a new framebuffer
+        return True
+
+    def sequence(self):
+        return SEQUENCE.unpack_from(self.map, SEQUENCE_OFFSET)[0]
+
+    def publish(self, time_key, black, red=None, png=b''):
+        """Write a frame; packed planes may be bytes, lists of ints or uint8 arrays"""
+        black, red_buffer, png = as_buffer(black), as_buffer(red), as_buffer(png)
+        sizes = [len(black), len(red_buffer), len(png)]
+        if sum(sizes) > self.capacity:
+            raise ValueError(f"Frame of {sum(sizes)} bytes does not fit a {self.capacity} byte framebuffer")
+
+        with self._write_lock:
+            sequence = self.sequence()
+            SEQUENCE.pack_into(self.map, SEQUENCE_OFFSET, sequence + 1)  # Odd: being written
+            crc = 0
+            offset = PAYLOAD_OFFSET
+            for data, size in zip((black, red_buffer, png), sizes):
+                self.map[offset:offset + size] = data
+                crc = zlib.crc32(data, crc)
+                offset += size
+            FRAME.pack_into(self.map, FRAME_OFFSET, time_key.encode()[:16], sizes[0],
+                            NO_PLANE if red is None else sizes[1], sizes[2], crc)
+            SEQUENCE.pack_into(self.map, SEQUENCE_OFFSET, sequence + 2)
+            return sequence + 2
+
+    def etag(self):
+        """An ID of the published frame read from the header alone, or None before the first frame"""
+        if not self._current():
+            return None
+        sequence = self.sequence()
+        if sequence == 0:
+            return None
+        return f'{self.buffer_id:016x}-{sequence}'
+
+    def read(self, retries=100):
+        """Return a copy of the published Frame, or None if there is no framebuffer or frame yet"""
+        if not self._current():
+            return None
+        for _ in range(retries):
+            before = self.sequence()
+            if before == 0:
+                return None
+            if before % 2 == 0:
+                time_key, black_size, red_size, png_size, crc = FRAME.unpack_from(self.map, FRAME_OFFSET)
+                has_red = red_size != NO_PLANE
+                sizes = (black_size, red_size if has_red else 0, png_size)
+                if sum(sizes) <= self.capacity:
+                    offset = PAYLOAD_OFFSET
+                    parts = []
+                    for size in sizes:
+                        parts.append(self.map[offset:offset + size])
+                        offset += size
+                    black, red, png = parts
+                    if (self.sequence() == before and
+                            zlib.crc32(png, zlib.crc32(red, zlib.crc32(black))) == crc):
+                        return Frame(before, time_key.rstrip(b'\x00').decode(), black,
+                                     red if has_red else None, png)
+            time.sleep(0.001)  # The daemon is writing; try again once it is done
+        raise TimeoutError(f"Could not read a stable frame from {self.path}")
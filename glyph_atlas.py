@@ -0,0 +1,263 @@
+#!/usr/bin/env python3
+"""
+Text drawing from pre-rasterized glyph atlases.
+
+Once layouts are cached, FreeType rasterization inside ImageDraw.text is
+most of the cost of drawing a frame, and it repeats the same few hundred
+glyphs at the same few sizes every time. A GlyphAtlas rasterizes each glyph
+of one font at one size once, 8-bit for antialiased targets and 1-bit for
+mode '1' images, together with its advance and kerning in FreeType's 1/64
+pixel units, and is stored in cache/fonts/atlas/. Drawing a run composes
+its glyph bitmaps with NumPy at the pen positions PIL's basic layout would
+use, blending overlapping glyphs with PIL's rounding, and fills the image
+through the result like ImageDraw.text does, so the output is identical to
+ImageDraw.text pixel for pixel.
+
+Runs the atlas cannot reproduce exactly are handed to ImageDraw.text: a
+fractional y position (FreeType rasterizes those differently), multi-line
+text, fonts shaped by libraqm, and PIL's built-in bitmap font.
+"""
+import io
+import math
+import hashlib
+import threading
+import time
+from pathlib import Path
+import numpy as np
+from PIL import Image, ImageDraw, ImageFont, __version__ as PIL_VERSION
+from fonts import FONT_CACHE_DIR
+from layout import run_fill
+from storage import write_file_atomic
+
+ATLAS_DIR = FONT_CACHE_DIR / 'atlas'
+ATLAS_FORMAT = 1
+ATLAS_MODES = {'1': '1', 'L': 'L', 'RGB': 'L'}  # Image mode -> glyph bitmap mode
+TEXT_RENDERERS = ('freetype', 'atlas')  # Values of the text_renderer config field
+
+
+class GlyphAtlas:
+    """The rasterized glyphs, advances and kerning of one font at one size"""
+
+    def __init__(self, font, mode='L'):
+        self.font = font
+        self.mode = mode
+        self.glyphs = {}    # char -> (bitmap, x offset, y offset)
+        self.advances = {}  # char -> advance in 1/64 pixels
+        self.kerning = {}   # (char, char) -> adjustment in 1/64 pixels
+        self.dirty = False
+        self._lock = threading.Lock()
+
+    def glyph(self, char):
+        glyph = self.glyphs.get(char)
+        if glyph is None:
+            with self._lock:
+                mask, (x, y) = self.font.getmask2(char, mode=self.mode, anchor='la')
+                width, height = mask.size
+                bitmap = np.asarray(mask, dtype=np.uint8).reshape(height, width)
+                if self.mode == '1':
+                    bitmap = np.where(bitmap > 0, 255, 0).astype(np.uint8)
+                glyph = (bitmap, x, y)
+                self.glyphs[char] = glyph
+                self.dirty = True
+        return glyph
+
+    def advance(self, char):
+        advance = self.advances.get(char)
+        if advance is None:
+            advance = round(self.font.getlength(char, mode=self.mode) * 64)
+            self.advances[char] = advance
+            self.dirty = True
+        return advance
+
+    def kern(self, left, right):
+        pair = (left, right)
+        adjustment = self.kerning.get(pair)
+        if adjustment is None:
+            pair_length = round(self.font.getlength(left + right, mode=self.mode) * 64)
+            adjustment = pair_length - self.advance(left) - self.advance(right)
+            self.kerning[pair] = adjustment
+            self.dirty = True
+        return adjustment
+
+    def add(self, chars):
+        """Rasterize `chars` ahead of drawing them"""
+        for char in chars:
+            if not char.isspace():
+                self.glyph(char)
+            self.advance(char)
+
+    def compose(self, text, x=0):
+        """
+        Return (mask, left, top): the coverage of `text` drawn with its pen
+        at `x`, placed relative to the integer part of `x` and the baseline
+        origin. The mask is empty when nothing is drawn.
+        """
+        pen = round(math.modf(x)[0] * 64)
+        placed = []
+        previous = None
+        for char in text:
+            if previous is not None:
+                pen += self.kern(previous, char)
+            bitmap, offset_x, offset_y = self.glyph(char)
+            if bitmap.size:
+                placed.append((bitmap, ((pen + 32) >> 6) + offset_x, offset_y))
+            pen += self.advance(char)
+            previous = char
+        if not placed:
+            return np.zeros((0, 0), np.uint8), 0, 0
+
+        left = min(gx for _, gx, _ in placed)
+        top = min(gy for _, _, gy in placed)
+        right = max(gx + bitmap.shape[1] for bitmap, gx, _ in placed)
+        bottom = max(gy + bitmap.shape[0] for bitmap, _, gy in placed)
+        mask = np.zeros((bottom - top, right - left), np.uint8)
+        drawn_to = left
+        for bitmap, gx, gy in placed:
+            height, width = bitmap.shape
+            region = mask[gy - top:gy - top + height, gx - left:gx - left + width]
+            if gx >= drawn_to:
+                region[:] = bitmap  # Nothing drawn here yet; blending over zero is a copy
+            else:
+                # Overlapping glyphs are blended over each other with PIL's rounding, in drawing order
+                coverage = bitmap.astype(np.uint32)
+                blended = region * (255 - coverage) + 255 * coverage + 128
+                region[:] = ((blended >> 8) + blended) >> 8
+            drawn_to = max(drawn_to, gx + width)
+        return mask, left, top
+
+    def to_bytes(self):
+        chars = sorted(self.glyphs)
+        bitmaps = [self.glyphs[char][0] for char in chars]
+        pixels = np.concatenate([bitmap.ravel() for bitmap in bitmaps]) if bitmaps else np.zeros(0, np.uint8)
+        if self.mode == '1':
+            pixels = np.packbits(pixels > 0)
+        advance_chars = sorted(self.advances)
+        pairs = sorted(self.kerning)
+        buffer = io.BytesIO()
+        np.savez_compressed(
+            buffer,
+            chars=np.array([ord(char) for char in chars], np.int32),
+            boxes=np.array([[self.glyphs[char][1], self.glyphs[char][2], *self.glyphs[char][0].shape]
+                            for char in chars], np.int32).reshape(-1, 4),
+            pixels=pixels,
+            advance_chars=np.array([ord(char) for char in advance_chars], np.int32),
+            advances=np.array([self.advances[char] for char in advance_chars], np.int32),
+            kerning=np.array([[ord(left), ord(right), self.kerning[(left, right)]] for left, right in pairs],
+                             np.int32).reshape(-1, 3),
+        )
+        return buffer.getvalue()
+
+    @classmethod
+    def from_bytes(cls, font, mode, data):
+        atlas = cls(font, mode)
+        arrays = np.load(io.BytesIO(data))
+        boxes = arrays['boxes']
+        sizes = boxes[:, 2] * boxes[:, 3]
+        pixels = arrays['pixels']
+        if mode == '1':
+            pixels = np.unpackbits(pixels, count=int(sizes.sum())) * np.uint8(255)
+        start = 0
+        for codepoint, (x, y, height, width), size in zip(arrays['chars'], boxes, sizes):
+            bitmap = pixels[start:start + size].reshape(height, width)
+            atlas.glyphs[chr(codepoint)] = (bitmap, int(x), int(y))
+            start += size
+        for codepoint, advance in zip(arrays['advance_chars'], arrays['advances']):
+            atlas.advances[chr(codepoint)] = int(advance)
+        for left, right, adjustment in arrays['kerning']:
+            atlas.kerning[(chr(left), chr(right))] = int(adjustment)
+        return atlas
+
+
+def atlas_path(font, mode, cache_dir=None):
+    """Return where the atlas of `font` in `mode` is stored; it changes with the font file and FreeType"""
+    stat = Path(font.path).stat()
+    params = (f'{ATLAS_FORMAT}:{font.path}:{stat.st_size}:{stat.st_mtime_ns}:{font.size}:{mode}:'
+              f'{ImageFont.core.freetype2_version}:{PIL_VERSION}')
+    key = hashlib.sha1(params.encode()).hexdigest()[:16]
+    return Path(cache_dir or ATLAS_DIR) / f'{Path(font.path).stem}-{font.size}-{mode}-{key}.npz'
+
+
+class AtlasRenderer:
+    """
+    Draws text by blitting glyphs from per-font atlases.
+
+    Atlases are loaded from `cache_dir` or built on first use, with the
+    characters in `preload` rasterized up front; glyphs met later are added
+    as they are drawn and written back at most every `flush_interval`
+    seconds.
+    """
+
+    def __init__(self, cache_dir=None, preload='', flush_interval=3600):
+        self.cache_dir = Path(cache_dir or ATLAS_DIR)
+        self.preload = preload
+        self.flush_interval = flush_interval
+        self.atlases = {}  # (font path, size, mode) -> GlyphAtlas
+        self._last_save = time.monotonic()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def supports(font):
+        return (isinstance(font, ImageFont.FreeTypeFont) and isinstance(font.path, str)
+                and font.layout_engine == ImageFont.Layout.BASIC)
+
+    def atlas(self, font, mode):
+        key = (font.path, font.size, mode)
+        atlas = self.atlases.get(key)
+        if atlas is None:
+            with self._lock:
+                atlas = self.atlases.get(key)
+                if atlas is None:
+                    atlas = self._load(font, mode)
+                    self.atlases[key] = atlas
+        return atlas
+
+    def _load(self, font, mode):
+        path = atlas_path(font, mode, self.cache_dir)
+        try:
+            return GlyphAtlas.from_bytes(font, mode, path.read_bytes())
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Rebuilding unreadable glyph atlas {path}: {e}")
+        atlas = GlyphAtlas(font, mode)
+        atlas.add(self.preload)
+        self._save(atlas, path)
+        return atlas
+
+    def _save(self, atlas, path=None):
+        path = path or atlas_path(atlas.font, atlas.mode, self.cache_dir)
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            write_file_atomic(path, atlas.to_bytes(), kind='glyph_atlas', sync=False)
+            atlas.dirty = False
+        except OSError as e:
+            print(f"Error saving glyph atlas {path}: {e}")
+
+    def maybe_save(self):
+        """Write back atlases that gained glyphs, at most every `flush_interval` seconds"""
+        if time.monotonic() - self._last_save < self.flush_interval:
+            return
+        self._last_save = time.monotonic()
+        for atlas in list(self.atlases.values()):
+            if atlas.dirty:
+                self._save(atlas)
+
+    def draw_text(self, image, xy, text, font, fill):
+        """Draw `text` at `xy` like ImageDraw.Draw(image).text(xy, text, font=font, fill=fill)"""
+        x, y = xy
+        mode = ATLAS_MODES.get(image.mode)
+        if mode is None or y != int(y) or '\n' in text or not self.supports(font):
+            ImageDraw.Draw(image).text(xy, text, font=font, fill=fill)
+            return
+        mask, left, top = self.atlas(font, mode).compose(text, x)
+        if mask.size:
+            left += int(x)
+            top += int(y)
+            # Filling through a mask blends with the same code and rounding as ImageDraw.text
+            image.paste(fill, (left, top, left + mask.shape[1], top + mask.shape[0]), Image.fromarray(mask, 'L'))
+
+    def draw_layout(self, image, layout, fonts, fill, role_fills=None):
+        """Replay `layout` onto `image`, like Layout.draw"""
+        for role, x, y, text in layout.runs:
+            self.draw_text(image, (x, y), text, fonts[role], run_fill(role, fill, role_fills))
+        self.maybe_save()
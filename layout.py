@@ -0,0 +1,332 @@
+#!/usr/bin/env python3
+"""
+Frame layout, computed once per quote and layout parameters and then cached.
+
+A Layout records each run of text with its font role and position, so
+drawing a frame is a replay of text calls with no measuring. The same quote
+with the same font size, info settings and canvas always lays out the same,
+so layouts are kept in a bounded LRU that the web preview and the panel
+renderer share, and can be persisted to disk between restarts.
+"""
+import json
+import time
+import atexit
+import hashlib
+import weakref
+import threading
+from collections import OrderedDict
+from pathlib import Path
+from PIL import Image, ImageDraw
+from metrics import CACHE_REQUESTS, LAYOUT_SECONDS
+from storage import write_json_atomic
+from quote_text import BREAK, quote_tokens
+from fonts import FontSet
+
+# Quote token styles and the roles they are drawn with
+STYLE_ROLES = {'': 'quote', 'em': 'quote_em', 'time': 'quote_bold'}
+# Values of the time_color config field; red is the second plane of the (B) panel
+TIME_COLORS = {'black': (0, 0, 0), 'red': (255, 0, 0)}
+LAYOUT_CACHE_VERSION = 4
+
+# Measuring only needs a draw context, not a full-size canvas; mode '1' would
+# switch off antialiasing and change the measured widths
+_MEASURE = ImageDraw.Draw(Image.new('RGB', (1, 1)))
+
+
+class Layout:
+    """Positioned text runs for one frame"""
+
+    def __init__(self, width, height, runs):
+        self.width = width
+        self.height = height
+        self.runs = runs  # (role, x, y, text) tuples in drawing order
+
+    def draw(self, draw, fonts, fill, role_fills=None):
+        """Replay the layout onto `draw` using `fonts` keyed by role, and `role_fills` over `fill`"""
+        for role, x, y, text in self.runs:
+            draw.text((x, y), text, font=fonts[role], fill=run_fill(role, fill, role_fills))
+
+    def to_dict(self):
+        return {'width': self.width, 'height': self.height, 'runs': [list(run) for run in self.runs]}
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(data['width'], data['height'], [tuple(run) for run in data['runs']])
+
+    def __eq__(self, other):
+        return isinstance(other, Layout) and self.to_dict() == other.to_dict()
+
+
+def run_fill(role, fill, role_fills=None):
+    """Return the fill of a run drawn with the font key `role`; fallbacks share their role's fill"""
+    if not role_fills:
+        return fill
+    return role_fills.get(role.partition('+')[0], fill)
+
+
+def layout_key(quote_data, fonts, width, height, font_size, show_book_info=True, show_author=True,
+               highlight_time=True):
+    """Return the cache key for laying out `quote_data` with these parameters"""
+    params = [
+        quote_data['display_time'], quote_data['quote'], quote_data['book'], quote_data['author'],
+        quote_tokens(quote_data), bool(highlight_time),
+        (fonts if isinstance(fonts, FontSet) else FontSet(fonts)).identity(),
+        width, height, font_size, bool(show_book_info), bool(show_author),
+    ]
+    return hashlib.sha1(json.dumps(params).encode('utf-8')).hexdigest()
+
+
+def text_width(text, font):
+    bbox = _MEASURE.textbbox((0, 0), text, font=font)
+    return bbox[2] - bbox[0]
+
+
+def wrap_text(text, font, max_width):
+    """Split `text` into lines that fit within `max_width` pixels"""
+    words = text.split()
+    lines = []
+    current_line = []
+    current_width = 0
+
+    for word in words:
+        word_width = _MEASURE.textbbox((0, 0), word + ' ', font=font)[2]
+        if current_width + word_width <= max_width:
+            current_line.append(word)
+            current_width += word_width
+        else:
+            lines.append(' '.join(current_line))
+            current_line = [word]
+            current_width = word_width
+    if current_line:
+        lines.append(' '.join(current_line))
+    return lines
+
+
+def wrap_styled(words, fonts, max_width):
+    """
+    Wrap words made of (text, role) pieces like wrap_text does plain text.
+
+    Returns each line as a list of (text, role) runs; the space between two
+    pieces of the same style is in that style, so a bold phrase reads as one.
+    """
+    lines = []
+    current_line = []
+    current_width = 0
+
+    for word in words:
+        word_width = sum(fonts[role].getlength(piece) for piece, role in word) + fonts['quote'].getlength(' ')
+        if current_line and current_width + word_width > max_width:
+            lines.append(current_line)
+            current_line = []
+            current_width = 0
+        if current_line:
+            space_role = current_line[-1][1] if current_line[-1][1] == word[0][1] else 'quote'
+            current_line.append((' ', space_role))
+        current_line.extend(word)
+        current_width += word_width
+    if current_line:
+        lines.append(current_line)
+
+    # Merge neighbouring pieces of the same style into single runs
+    merged = []
+    for line in lines:
+        runs = []
+        for piece, role in line:
+            if runs and runs[-1][1] == role:
+                runs[-1] = (runs[-1][0] + piece, role)
+            else:
+                runs.append((piece, role))
+        merged.append(runs)
+    return merged
+
+
+def split_paragraphs(tokens, highlight_time=True):
+    """Split a token stream at hard breaks into paragraphs of (text, role) words"""
+    paragraphs = [[]]
+    for token in tokens:
+        if token == BREAK:
+            paragraphs.append([])
+        elif isinstance(token, str):
+            paragraphs[-1].append([(token, 'quote')])
+        else:
+            paragraphs[-1].append([(piece, STYLE_ROLES['' if style == 'time' and not highlight_time else style])
+                                   for piece, style in token])
+    return paragraphs
+
+
+def place_line(line, fonts, width, y_position):
+    """
+    Centre a line of (text, role) runs, switching to a fallback font for
+    characters the role's font cannot draw.
+    """
+    pieces = []
+    for text, role in line:
+        for piece, key in fonts.split(role, text):
+            if pieces and pieces[-1][1] == key:
+                pieces[-1] = (pieces[-1][0] + piece, key)
+            else:
+                pieces.append((piece, key))
+    if len(pieces) == 1:
+        text, key = pieces[0]
+        return [(key, (width - text_width(text, fonts[key])) // 2, y_position, text)]
+    # Mixed lines are placed run by run
+    runs = []
+    x_position = (width - sum(fonts[key].getlength(text) for text, key in pieces)) / 2
+    for text, key in pieces:
+        runs.append((key, int(x_position), y_position, text))
+        x_position += fonts[key].getlength(text)
+    return runs
+
+
+@LAYOUT_SECONDS.timed
+def compute_layout(quote_data, fonts, width, height, font_size, show_book_info=True, show_author=True,
+                   highlight_time=True):
+    """Lay out a frame for `quote_data`; depends on nothing but its arguments"""
+    if not isinstance(fonts, FontSet):
+        fonts = FontSet(fonts)
+
+    # Time centred at the top
+    runs = place_line([(quote_data['display_time'], 'time')], fonts, width, 50)
+
+    # Word wrap the quote, leaving a 50px margin on each side; hard breaks start a new line
+    y_position = 150
+    for words in split_paragraphs(quote_tokens(quote_data), highlight_time):
+        if all(len(word) == 1 and word[0][1] == 'quote' for word in words):
+            # Plain text is measured as whole lines
+            lines = wrap_text(' '.join(word[0][0] for word in words), fonts['quote'], width - 100)
+            lines = [[(line, 'quote')] for line in lines] or [[]]
+        else:
+            lines = wrap_styled(words, fonts, width - 100)
+        for line in lines:
+            runs.extend(place_line(line, fonts, width, y_position))
+            y_position += font_size + 10
+
+    # Book and author if configured
+    if show_book_info:
+        info_text = f"{quote_data['book']}"
+        if show_author and quote_data['author']:
+            info_text += f" by {quote_data['author']}"
+        runs.extend(place_line([(info_text, 'info')], fonts, width, height - 100))
+
+    return Layout(width, height, runs)
+
+
+# Caches persisting to disk, saved once more when the process exits
+_persisting = weakref.WeakSet()
+
+
+@atexit.register
+def flush_persisting_caches():
+    """Save the layouts measured since the last save of every persisting cache"""
+    for cache in list(_persisting):
+        cache.flush()
+
+
+class LayoutCache:
+    """
+    Bounded LRU of layouts by layout_key.
+
+    If `path` is set the cache is loaded from it and written back at most
+    every `flush_interval` seconds, so a restart does not re-measure every
+    quote without rewriting the file on each new layout. What is left
+    unsaved is written when persisting stops and when the process exits.
+    """
+
+    def __init__(self, capacity=2048, path=None, flush_interval=3600):
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.path = None
+        self._layouts = OrderedDict()
+        self._dirty = False
+        self._last_save = time.monotonic()
+        self._lock = threading.Lock()
+        if path is not None:
+            self.persist_to(path)
+
+    def __len__(self):
+        return len(self._layouts)
+
+    def get(self, key, compute):
+        """Return the layout for `key`, calling `compute()` to build it on a miss"""
+        with self._lock:
+            layout = self._layouts.get(key)
+            if layout is not None:
+                self._layouts.move_to_end(key)
+        if layout is not None:
+            CACHE_REQUESTS.inc(cache='layout', result='hit')
+            return layout
+        CACHE_REQUESTS.inc(cache='layout', result='miss')
+        layout = compute()
+        with self._lock:
+            self._put(key, layout)
+        self.maybe_save()
+        return layout
+
+    def _put(self, key, layout):
+        self._layouts[key] = layout
+        self._layouts.move_to_end(key)
+        while len(self._layouts) > self.capacity:
+            self._layouts.popitem(last=False)
+        self._dirty = True
+
+    def clear(self):
+        with self._lock:
+            self._layouts.clear()
+            self._dirty = self.path is not None
+
+    def persist_to(self, path):
+        """Persist the cache at `path` (None stops persisting), loading what is stored there"""
+        self.flush()  # Keep what was measured for the old path
+        self.path = Path(path) if path is not None else None
+        if self.path is not None:
+            _persisting.add(self)
+            self.load()
+        else:
+            _persisting.discard(self)
+
+    def load(self):
+        """Merge the layouts stored at `path` into the cache"""
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except FileNotFoundError:
+            return 0
+        except (OSError, ValueError) as e:
+            print(f"Ignoring unreadable layout cache {self.path}: {e}")
+            return 0
+        if data.get('version') != LAYOUT_CACHE_VERSION:
+            return 0
+        with self._lock:
+            # Stored oldest first; loaded layouts rank below ones already in use
+            for key, layout in reversed(list(data.get('layouts', {}).items())):
+                if key not in self._layouts:
+                    self._layouts[key] = Layout.from_dict(layout)
+                    self._layouts.move_to_end(key, last=False)
+            while len(self._layouts) > self.capacity:
+                self._layouts.popitem(last=False)
+        return len(data.get('layouts', {}))
+
+    def maybe_save(self):
+        """Save if persisting, dirty and the last save is older than `flush_interval`"""
+        if time.monotonic() - self._last_save >= self.flush_interval:
+            self.flush()
+
+    def flush(self):
+        """Save if persisting and dirty"""
+        if self._dirty and self.path is not None:
+            try:
+                self.save()
+            except OSError as e:
+                print(f"Error saving layout cache: {e}")
+
+    def save(self):
+        if self.path is None:
+            return False
+        with self._lock:
+            layouts = {key: layout.to_dict() for key, layout in self._layouts.items()}
+            self._dirty = False
+        self._last_save = time.monotonic()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        write_json_atomic(self.path, {'version': LAYOUT_CACHE_VERSION, 'layouts': layouts},
+                          indent=None, kind='layout_cache')
+        return True
@@ -0,0 +1,251 @@
+#!/usr/bin/env python3
+"""
+Lightweight Prometheus-style metrics for the clock pipeline.
+
+Metrics are plain in-process objects; `render()` produces the Prometheus
+text exposition format served by the web server's /metrics endpoint.
+"""
+import time
+import bisect
+import resource
+import functools
+import threading
+from datetime import date
+from contextlib import contextmanager
+
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+BYTE_BUCKETS = (1024, 16384, 65536, 131072, 262144, 524288, 1048576)
+COUNT_BUCKETS = (10, 100, 1000, 10000, 100000, 1000000)
+
+
+def _format_labels(names, values, extra=None):
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+def _format_value(value):
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+
+class Metric:
+    """Base class for a metric family with optional label names"""
+    type_name = 'untyped'
+
+    def __init__(self, name, documentation, labelnames=()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f"{self.name} expects labels {self.labelnames}")
+        return tuple(labels[name] for name in self.labelnames)
+
+    def samples(self):
+        raise NotImplementedError
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type_name}']
+        for suffix, labels, value in self.samples():
+            lines.append(f'{self.name}{suffix}{labels} {_format_value(value)}')
+        return '\n'.join(lines)
+
+
+class Counter(Metric):
+    """Monotonically increasing count"""
+    type_name = 'counter'
+
+    def __init__(self, name, documentation, labelnames=()):
+        super().__init__(name, documentation, labelnames)
+        self._values = {} if labelnames else {(): 0}
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels):
+        return self._values.get(self._key(labels), 0)
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [('', _format_labels(self.labelnames, key), value) for key, value in items]
+
+
+class Gauge(Metric):
+    """Value that can go up and down, or be computed on scrape by `func`"""
+    type_name = 'gauge'
+
+    def __init__(self, name, documentation, func=None):
+        super().__init__(name, documentation)
+        self.func = func
+        self._value = 0
+
+    def set(self, value):
+        self._value = value
+
+    def value(self):
+        return self.func() if self.func else self._value
+
+    def samples(self):
+        return [('', '', self.value())]
+
+
+class Histogram(Metric):
+    """Distribution of observations in cumulative buckets"""
+    type_name = 'histogram'
+
+    def __init__(self, name, documentation, buckets=TIME_BUCKETS):
+        super().__init__(name, documentation)
+        self.buckets = tuple(sorted(buckets))
+        self._counts = [0] * (len(self.buckets) + 1)
+        self._sum = 0.0
+        self._count = 0
+
+    def observe(self, value):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            self._counts[index] += 1
+            self._sum += value
+            self._count += 1
+
+    @contextmanager
+    def time(self):
+        """Observe the wall time spent inside the `with` block"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start)
+
+    def timed(self, func):
+        """Decorator observing the wall time of each call to `func`"""
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with self.time():
+                return func(*args, **kwargs)
+        return wrapper
+
+    @property
+    def count(self):
+        return self._count
+
+    def samples(self):
+        with self._lock:
+            counts, total, count = list(self._counts), self._sum, self._count
+        samples = []
+        cumulative = 0
+        for bound, bucket_count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += bucket_count
+            samples.append(('_bucket', _format_labels((), (), ('le', _format_value(float(bound)))), cumulative))
+        samples.append(('_sum', '', total))
+        samples.append(('_count', '', count))
+        return samples
+
+
+class Registry:
+    """Collection of metrics rendered together"""
+
+    def __init__(self):
+        self._metrics = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Duplicate metric: {metric.name}")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def get(self, name):
+        return self._metrics.get(name)
+
+    def render(self):
+        return '\n'.join(metric.render() for metric in self._metrics.values()) + '\n'
+
+
+def process_rss_bytes():
+    """Return the resident set size of this process in bytes"""
+    try:
+        with open('/proc/self/status', 'r') as f:
+            for line in f:
+                if line.startswith('VmRSS:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    # Peak RSS is the best we can do without /proc; ru_maxrss is KiB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+class DailyTotal:
+    """Running total that starts again from zero each calendar day"""
+
+    def __init__(self):
+        self._day = None
+        self._total = 0
+        self._lock = threading.Lock()
+
+    def add(self, amount):
+        with self._lock:
+            self._roll()
+            self._total += amount
+
+    def value(self):
+        with self._lock:
+            self._roll()
+            return self._total
+
+    def _roll(self):
+        today = date.today()
+        if today != self._day:
+            self._day = today
+            self._total = 0
+
+
+REGISTRY = Registry()
+BYTES_WRITTEN_TODAY = DailyTotal()
+
+RENDER_SECONDS = REGISTRY.register(Histogram(
+    'quote_clock_render_seconds', 'Time to render a frame in QuoteGenerator.create_image'))
+LAYOUT_SECONDS = REGISTRY.register(Histogram(
+    'quote_clock_layout_seconds', 'Time spent laying out a frame on a layout cache miss'))
+PACK_SECONDS = REGISTRY.register(Histogram(
+    'quote_clock_pack_seconds', 'Time to pack an image into display bytes'))
+SPI_BYTES = REGISTRY.register(Histogram(
+    'quote_clock_spi_bytes', 'Bytes sent over SPI per display update', BYTE_BUCKETS))
+SPI_TRANSACTIONS = REGISTRY.register(Histogram(
+    'quote_clock_spi_transactions', 'SPI write transactions per display update', COUNT_BUCKETS))
+BUSY_WAIT_SECONDS = REGISTRY.register(Histogram(
+    'quote_clock_busy_wait_seconds', 'Time spent waiting for the e-Paper BUSY line'))
+SCHEDULER_LATENESS_SECONDS = REGISTRY.register(Histogram(
+    'quote_clock_scheduler_lateness_seconds', 'Delay between an update boundary and the start of the transfer'))
+CACHE_REQUESTS = REGISTRY.register(Counter(
+    'quote_clock_cache_requests_total', 'Cache lookups by cache and result', ('cache', 'result')))
+PROCESS_RSS = REGISTRY.register(Gauge(
+    'quote_clock_process_resident_memory_bytes', 'Resident memory size of the process', process_rss_bytes))
+STORAGE_BYTES_WRITTEN = REGISTRY.register(Counter(
+    'quote_clock_storage_bytes_written_total', 'Bytes written to persistent storage by kind', ('kind',)))
+STORAGE_BYTES_WRITTEN_TODAY = REGISTRY.register(Gauge(
+    'quote_clock_storage_bytes_written_today', 'Bytes written to persistent storage since midnight',
+    BYTES_WRITTEN_TODAY.value))
+STORAGE_WRITES_SKIPPED = REGISTRY.register(Counter(
+    'quote_clock_storage_writes_skipped_total', 'Writes skipped because the content was unchanged', ('kind',)))
+PIPELINE_BUSY_SECONDS = REGISTRY.register(Counter(
+    'quote_clock_pipeline_busy_seconds_total', 'Time each display pipeline stage spent working', ('stage',)))
+PIPELINE_BLOCKED_SECONDS = REGISTRY.register(Counter(
+    'quote_clock_pipeline_blocked_seconds_total', 'Time each pipeline stage waited on a full downstream queue',
+    ('stage',)))
+PIPELINE_ITEMS = REGISTRY.register(Counter(
+    'quote_clock_pipeline_items_total', 'Frames handled by each display pipeline stage', ('stage',)))
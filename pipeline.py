@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+Staged pipeline for the display loop.
+
+Rendering a frame, sending it to the panel and saving the preview used to
+run one after the other in the update thread, so the CPU sat idle for the
+seconds the panel spends refreshing. Each stage now runs in its own worker
+thread and hands its result to the next one through a bounded queue: the
+next frame is rendered while the panel is still busy with the current one,
+and a stage that falls behind blocks the stage feeding it (backpressure)
+instead of letting frames pile up.
+
+Every stage counts the time it spends working and the time it spends
+blocked on a full downstream queue. Busy time over wall time is the
+stage's utilization, reported by Pipeline.stats() and, as running totals,
+in the metrics.
+"""
+import queue
+import threading
+import time
+from contextlib import contextmanager
+from metrics import PIPELINE_BLOCKED_SECONDS, PIPELINE_BUSY_SECONDS, PIPELINE_ITEMS
+
+_STOP = object()
+
+
+class Stage:
+    """One step of the pipeline; `func` maps an item to the item for the next stage, or None to drop it"""
+
+    def __init__(self, name, func=None, maxsize=1):
+        self.name = name
+        self.func = func
+        self.queue = queue.Queue(maxsize) if func else None  # None for a stage run by the caller
+        self.next = None
+        self.busy_seconds = 0.0
+        self.blocked_seconds = 0.0
+        self.processed = 0
+        self.errors = 0
+        self.thread = None
+
+    @contextmanager
+    def busy(self):
+        """Count the time spent inside the `with` block as work of this stage"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.busy_seconds += elapsed
+            self.processed += 1
+            PIPELINE_BUSY_SECONDS.inc(elapsed, stage=self.name)
+            PIPELINE_ITEMS.inc(stage=self.name)
+
+    def forward(self, item, timeout=None):
+        """Hand `item` to the next stage, waiting while its queue is full"""
+        if self.next is None or item is None:
+            return
+        start = time.perf_counter()
+        try:
+            self.next.queue.put(item, timeout=timeout)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.blocked_seconds += elapsed
+            PIPELINE_BLOCKED_SECONDS.inc(elapsed, stage=self.name)
+
+    def run(self):
+        while True:
+            item = self.queue.get()
+            if item is _STOP:
+                self.queue.task_done()
+                if self.next is not None:
+                    self.next.queue.put(_STOP)
+                return
+            result = None
+            try:
+                with self.busy():
+                    result = self.func(item)
+            except Exception as e:
+                self.errors += 1
+                print(f"Error in {self.name} stage: {e}")
+            self.forward(result)
+            self.queue.task_done()
+
+
+class Pipeline:
+    """
+    A chain of stages connected by bounded queues.
+
+    The first stage may have no function, in which case it is run by the
+    caller: time its work with `with pipeline.source.busy():` and pass its
+    output to submit(). Every other stage runs in a daemon thread.
+    """
+
+    def __init__(self, stages):
+        self.stages = list(stages)
+        for stage, next_stage in zip(self.stages, self.stages[1:]):
+            stage.next = next_stage
+        self.started = None
+
+    @property
+    def source(self):
+        return self.stages[0]
+
+    def start(self):
+        self.started = time.monotonic()
+        for stage in self.stages:
+            if stage.func is not None:
+                stage.thread = threading.Thread(target=stage.run, name=f'pipeline-{stage.name}', daemon=True)
+                stage.thread.start()
+        return self
+
+    def submit(self, item, timeout=None):
+        """Feed `item` to the first threaded stage, blocking while the pipeline is full"""
+        if self.source.func is None:
+            self.source.forward(item, timeout)
+        else:
+            self.source.queue.put(item, timeout=timeout)
+
+    def join(self):
+        """Wait until every submitted item has passed through all stages"""
+        for stage in self.stages:
+            if stage.queue is not None:
+                stage.queue.join()
+
+    def stop(self, timeout=None):
+        """Let the stages finish the items already submitted, then end their threads"""
+        first = next((stage for stage in self.stages if stage.queue is not None), None)
+        if first is not None:
+            first.queue.put(_STOP)
+        for stage in self.stages:
+            if stage.thread is not None:
+                stage.thread.join(timeout)
+
+    def stats(self):
+        """Per-stage utilization, busy and blocked seconds, item counts and queue depth"""
+        elapsed = time.monotonic() - self.started if self.started else 0.0
+        return {
+            stage.name: {
+                'utilization': stage.busy_seconds / elapsed if elapsed > 0 else 0.0,
+                'busy_seconds': stage.busy_seconds,
+                'blocked_seconds': stage.blocked_seconds,
+                'processed': stage.processed,
+                'errors': stage.errors,
+                'queued': stage.queue.qsize() if stage.queue is not None else 0,
+            }
+            for stage in self.stages
+        }
@@ -0,0 +1,159 @@
+#!/usr/bin/env python3
+"""
+Opt-in cProfile and tracemalloc capture of display update cycles.
+
+The profiler is armed for the next N cycles; each armed cycle writes a
+capture to the profiles directory, and only the newest `max_profiles`
+captures are kept so the SD card cannot fill up.
+"""
+import io
+import json
+import time
+import pickle
+import marshal
+import pstats
+import cProfile
+import threading
+import tracemalloc
+from datetime import datetime
+from pathlib import Path
+from contextlib import contextmanager
+from storage import write_file_atomic, write_json_atomic
+
+# Files written for each capture, by download kind
+PROFILE_FILES = {
+    'prof': '.prof',              # pstats dump, for snakeviz or pstats.Stats()
+    'txt': '.txt',                # human readable CPU and memory summary
+    'tracemalloc': '.tracemalloc',  # tracemalloc.Snapshot dump
+}
+
+
+class CycleProfiler:
+    """Profiles the next N update cycles and stores the captures on disk"""
+
+    def __init__(self, profiles_dir=Path('images/profiles'), max_profiles=20, top=40, traceback_frames=1):
+        self.profiles_dir = Path(profiles_dir)
+        self.max_profiles = max_profiles
+        self.top = top
+        # Deeper tracebacks make the per-pixel packing loops many times slower to trace
+        self.traceback_frames = traceback_frames
+        self.pending = 0
+        self._lock = threading.Lock()
+        self._active = threading.Lock()  # cProfile and tracemalloc are process-wide
+
+    def arm(self, cycles=1):
+        """Profile the next `cycles` update cycles (0 disarms)"""
+        with self._lock:
+            self.pending = max(0, int(cycles))
+        return self.pending
+
+    def _claim(self):
+        with self._lock:
+            if self.pending <= 0:
+                return False
+            self.pending -= 1
+            return True
+
+    @contextmanager
+    def cycle(self, label='update'):
+        """
+        Profile the wrapped block if the profiler is armed, otherwise just
+        run it. Binds whether it is profiled: cProfile only sees the calling
+        thread, so work that is normally handed to other threads has to be
+        done inline to show up.
+        """
+        if self._claim():
+            with self.capture(label) as profiled:
+                yield profiled
+        else:
+            yield False
+
+    @contextmanager
+    def capture(self, label='update'):
+        """Unconditionally profile the wrapped block, unless another capture is running; binds whether it is"""
+        if not self._active.acquire(blocking=False):
+            yield False
+            return
+        profiler = cProfile.Profile()
+        started_tracing = not tracemalloc.is_tracing()
+        try:
+            if started_tracing:
+                tracemalloc.start(self.traceback_frames)
+            tracemalloc.reset_peak()
+            start = time.perf_counter()
+            profiler.enable()
+            try:
+                yield True
+            finally:
+                profiler.disable()
+                duration = time.perf_counter() - start
+                snapshot = tracemalloc.take_snapshot()
+                _, peak = tracemalloc.get_traced_memory()
+                if started_tracing:
+                    tracemalloc.stop()
+                try:
+                    self._save(label, profiler, snapshot, duration, peak)
+                except Exception as e:
+                    print(f"Error saving profile: {e}")
+        finally:
+            self._active.release()
+
+    def _save(self, label, profiler, snapshot, duration, peak):
+        self.profiles_dir.mkdir(parents=True, exist_ok=True)
+        created_at = datetime.now()
+        profile_id = f"{created_at.strftime('%Y%m%d-%H%M%S-%f')}-{label}"
+        base = self.profiles_dir / profile_id
+
+        # The same formats as Profile.dump_stats() and Snapshot.dump(), written atomically
+        profiler.create_stats()
+        write_file_atomic(str(base) + PROFILE_FILES['prof'], marshal.dumps(profiler.stats), sync=False)
+        write_file_atomic(str(base) + PROFILE_FILES['tracemalloc'],
+                          pickle.dumps(snapshot, pickle.HIGHEST_PROTOCOL), sync=False)
+
+        summary = io.StringIO()
+        summary.write(f"Profile {profile_id}: {duration * 1000:.1f} ms, peak traced memory {peak / 1024:.1f} KiB\n\n")
+        pstats.Stats(profiler, stream=summary).sort_stats('cumulative').print_stats(self.top)
+        summary.write(f"\nTop {self.top} allocation sites:\n")
+        for stat in snapshot.statistics('lineno')[:self.top]:
+            summary.write(f"{stat}\n")
+        write_file_atomic(str(base) + PROFILE_FILES['txt'], summary.getvalue().encode('utf-8'), sync=False)
+
+        # Written last: list() only shows captures whose metadata exists
+        write_json_atomic(str(base) + '.json', {
+            'id': profile_id,
+            'label': label,
+            'created_at': created_at.isoformat(timespec='seconds'),
+            'duration': round(duration, 6),
+            'peak_memory': peak,
+        })
+        print(f"Saved profile {profile_id} ({duration * 1000:.1f} ms)")
+        self._prune()
+
+    def _prune(self):
+        """Delete all but the newest `max_profiles` captures"""
+        for profile in self.list()[self.max_profiles:]:
+            for suffix in list(PROFILE_FILES.values()) + ['.json']:
+                path = self.profiles_dir / (profile['id'] + suffix)
+                if path.exists():
+                    path.unlink()
+
+    def list(self):
+        """Return the stored captures' metadata, newest first"""
+        if not self.profiles_dir.exists():
+            return []
+        profiles = []
+        for path in self.profiles_dir.glob('*.json'):
+            try:
+                with open(path, 'r') as f:
+                    profiles.append(json.load(f))
+            except (OSError, ValueError):
+                continue
+        return sorted(profiles, key=lambda profile: profile['id'], reverse=True)
+
+    def path(self, profile_id, kind):
+        """Return the file of a capture for download, or None if it does not exist"""
+        suffix = PROFILE_FILES.get(kind)
+        if suffix is None or profile_id not in {profile['id'] for profile in self.list()}:
+            return None
+        path = self.profiles_dir / (profile_id + suffix)
+        return path if path.exists() else None
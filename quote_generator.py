@@ -1,10 +1,18 @@
 #!/usr/bin/env python3
 import os
 import json
-import pandas as pd
 from datetime import datetime
 from PIL import Image, ImageDraw, ImageFont
 from pathlib import Path
+from quote_import import MANIFEST_NAME, sync_corpus
+from metrics import CACHE_REQUESTS, RENDER_SECONDS
+from tracing import TRACER
+from config_impact import LAYOUT, PACKING, SELECTION, analyze_config_change
+from storage import DEFAULT_TMPFS_DIR, PREVIEW_STORAGE_MODES, FrameStore, write_json_atomic
+from layout import TIME_COLORS, LayoutCache, compute_layout, layout_key
+from fonts import load_font_set, load_subsets
+from font_subset import corpus_codepoints
+from glyph_atlas import AtlasRenderer
 
 class QuoteGenerator:
     def __init__(self):
@@ -15,18 +23,25 @@ class QuoteGenerator:
         self.font_size = 24
         self.data_dir = Path('data')
         self.images_dir = Path('images/generated')
+        self.generation = 0  # Bumped whenever config or quotes are reloaded
+        self.fonts = {}  # Loaded fonts keyed by (path, size)
+        self.font_sets = {}  # Font chains keyed by font size
+        self.font_subsets = load_subsets()  # Corpus subsets built by font_subset.py, if any
+        self.frame_store = FrameStore()
+        self.layouts = LayoutCache()  # Shared by the web preview and the panel
+        self.atlas_renderer = None  # Glyph atlases, built when text_renderer is 'atlas'
         self.load_config()
         self.load_quotes()
 
+    @TRACER.traced('config load')
     def load_config(self):
         """Load configuration from config.json"""
         config_path = self.data_dir / 'config.json'
         if config_path.exists():
             with open(config_path, 'r') as f:
-                self.config = json.load(f)
-                self.font_size = self.config.get('font_size', 24)
+                config = json.load(f)
         else:
-            self.config = {
+            config = {
                 'update_interval': 300,
                 'display_brightness': 100,
                 'font_size': 24,
@@ -34,8 +49,32 @@ class QuoteGenerator:
                 'show_author': True,
                 'content_filter': 'all'  # Options: 'sfw', 'nsfw', 'all'
             }
-            with open(config_path, 'w') as f:
-                json.dump(self.config, f, indent=4)
+            write_json_atomic(config_path, config, kind='config')
+        self.set_config(config)
+
+    def set_config(self, config):
+        """Swap in a new configuration and return what the change invalidates"""
+        impact = analyze_config_change(getattr(self, 'config', {}), config)
+        preview_storage = config.get('preview_storage', 'disk')
+        if preview_storage not in PREVIEW_STORAGE_MODES:
+            print(f"Unknown preview_storage {preview_storage!r}, using 'disk'")
+            preview_storage = 'disk'
+        self.font_size = config.get('font_size', 24)
+        self.config = config
+        self.frame_store.mode = preview_storage
+        layout_cache_path = self.data_dir / 'layout_cache.json' if config.get('persist_layouts', False) else None
+        if layout_cache_path != self.layouts.path:
+            self.layouts.persist_to(layout_cache_path)
+        # Only selection and layout changes make rendered frames stale
+        if SELECTION in impact or LAYOUT in impact:
+            changed_minutes = self.build_selection()
+            impact.changed_minutes = None if LAYOUT in impact or PACKING in impact else changed_minutes
+            self.generation += 1
+        elif PACKING in impact:
+            # Frames look the same but were packed for the panel differently
+            impact.changed_minutes = None
+            self.generation += 1
+        return impact
 
     def convert_csv_to_json(self):
         """Convert quotes.csv to quotes.json"""
@@ -47,31 +86,10 @@ class QuoteGenerator:
         
         if csv_file.exists():
             try:
-                # Read CSV with pipe delimiter and no header
-                df = pd.read_csv(csv_file, sep='|', header=None, 
-                                names=['time_key', 'display_time', 'quote', 'book', 'author', 'rating'])
-                
-                quotes_dict = {}
-                
-                for _, row in df.iterrows():
-                    time_key = row['time_key']
-                    
-                    # Default to 'unknown' if rating is missing or empty
-                    rating = row.get('rating', 'unknown')
-                    if pd.isna(rating) or rating == '':
-                        rating = 'unknown'
-                        
-                    quotes_dict[time_key] = {
-                        'display_time': row['display_time'],
-                        'quote': row['quote'],
-                        'book': row['book'],
-                        'author': row['author'],
-                        'rating': rating.lower()
-                    }
-                
-                with open(json_file, 'w') as f:
-                    json.dump(quotes_dict, f, indent=4)
-                print(f"Converted {csv_file} to {json_file}")
+                # Skips parsing entirely when the CSV is unchanged since the last import
+                diff = sync_corpus(csv_file, json_file, self.data_dir / MANIFEST_NAME)
+                if not diff.unchanged_source:
+                    print(f"Converted {csv_file} to {json_file}")
                 return True
             except Exception as e:
                 print(f"Error converting CSV to JSON: {e}")
@@ -80,34 +98,53 @@ class QuoteGenerator:
             print(f"CSV file not found: {csv_file}")
             return False
 
+    @TRACER.traced('corpus load')
     def load_quotes(self):
-        """Load quotes from quotes.json"""
+        """Load quotes from quotes.json and return the minutes whose quote changed"""
         quotes_path = self.data_dir / 'quotes.json'
         if quotes_path.exists():
             with open(quotes_path, 'r') as f:
-                self.quotes = json.load(f)
+                quotes = json.load(f)
         else:
-            self.quotes = {}
+            quotes = {}
+        return self.set_quotes(quotes)
 
-    def get_current_quote(self):
-        """Get the quote for the current time"""
-        current_time = datetime.now().strftime('%H:%M')
-        
-        # Apply content filter if set
+    def set_quotes(self, quotes):
+        """Swap in a new corpus and return the minutes whose displayed quote changed"""
+        self.quotes = quotes
+        changed = self.build_selection()
+        if changed:
+            self.generation += 1
+        return changed
+
+    def build_selection(self):
+        """
+        Rebuild the per-minute index of quotes allowed by the content filter.
+
+        Returns the minutes whose selected quote differs from the previous index.
+        """
+        quotes = getattr(self, 'quotes', {})
         content_filter = self.config.get('content_filter', 'all')
-        available_quotes = {}
-        
-        if content_filter == 'all':
-            available_quotes = self.quotes
+        if content_filter in ('all', 'unknown'):
+            selection = quotes
+        elif content_filter in ('sfw', 'nsfw'):
+            selection = {time_key: quote_data for time_key, quote_data in quotes.items()
+                         if quote_data.get('rating', '').lower() == content_filter}
         else:
-            for time_key, quote_data in self.quotes.items():
-                rating = quote_data.get('rating', '').lower()
-                if content_filter == 'sfw' and rating == 'sfw':
-                    available_quotes[time_key] = quote_data
-                elif content_filter == 'nsfw' and rating == 'nsfw':
-                    available_quotes[time_key] = quote_data
-                elif content_filter == 'unknown' or content_filter == 'all':
-                    available_quotes[time_key] = quote_data
+            selection = {}
+        old_selection = getattr(self, 'selection', {})
+        changed = {time_key for time_key in old_selection.keys() | selection.keys()
+                   if old_selection.get(time_key) != selection.get(time_key)}
+        self.selection = selection
+        return changed
+
+    @TRACER.traced('quote lookup')
+    def get_current_quote(self, now=None):
+        """Get the quote for the current time, or for `now` if given"""
+        current_time = (now or datetime.now()).strftime('%H:%M')
+        
+        # The selection index only holds quotes allowed by the content filter
+        available_quotes = self.selection
         
         # Try to find a quote for the current time
         quote = available_quotes.get(current_time)
@@ -130,96 +167,88 @@ class QuoteGenerator:
                 'rating': 'sfw'
             }
 
-    def create_image(self):
-        """Create a new image with the current quote"""
+    def load_font(self, path, size):
+        """Load a TrueType font, reusing fonts already loaded at the same size"""
+        key = (path, size)
+        font = self.fonts.get(key)
+        if font is not None:
+            CACHE_REQUESTS.inc(cache='font', result='hit')
+            return font
+        CACHE_REQUESTS.inc(cache='font', result='miss')
+        font = ImageFont.truetype(path, size)
+        self.fonts[key] = font
+        return font
+
+    def load_fonts(self):
+        """Return the FontSet for the configured font size: each role's font and its fallbacks"""
+        fonts = self.font_sets.get(self.font_size)
+        if fonts is None:
+            fonts = load_font_set(self.font_size, self.load_font, self.font_subsets)
+            self.font_sets[self.font_size] = fonts
+        return fonts
+
+    def get_layout(self, quote_data, fonts):
+        """Return the cached layout of `quote_data` for the current config, computing it on a miss"""
+        params = (self.width, self.height, self.font_size,
+                  self.config.get('show_book_info', True), self.config.get('show_author', True),
+                  self.config.get('highlight_time', True))
+        key = layout_key(quote_data, fonts, *params)
+        return self.layouts.get(key, lambda: compute_layout(quote_data, fonts, *params))
+
+    def glyph_atlases(self):
+        """Return the atlas text renderer; new atlases start with every character of the corpus"""
+        if self.atlas_renderer is None:
+            preload = ''.join(chr(codepoint) for codepoint in corpus_codepoints(self.quotes))
+            self.atlas_renderer = AtlasRenderer(preload=preload)
+        return self.atlas_renderer
+
+    def role_fills(self):
+        """Return the colours of roles not drawn in the text colour"""
+        time_color = self.config.get('time_color', 'black')
+        if time_color not in TIME_COLORS:
+            print(f"Unknown time_color {time_color!r}, using 'black'")
+            time_color = 'black'
+        if TIME_COLORS[time_color] == self.text_color:
+            return None
+        return {'quote_bold': TIME_COLORS[time_color]}
+
+    @RENDER_SECONDS.timed
+    @TRACER.traced('render')
+    def create_image(self, now=None):
+        """Create a new image with the quote for the current time, or for `now` if given"""
         # Create a new image with white background
         image = Image.new('RGB', (self.width, self.height), self.background_color)
         draw = ImageDraw.Draw(image)
 
         # Load fonts
-        try:
-            time_font = ImageFont.truetype('/usr/share/fonts/truetype/dejavu/DejaVuSans-Bold.ttf', self.font_size * 2)
-            quote_font = ImageFont.truetype('/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf', self.font_size)
-            info_font = ImageFont.truetype('/usr/share/fonts/truetype/dejavu/DejaVuSans-Italic.ttf', self.font_size - 4)
-        except:
-            # Fallback to default font if DejaVu is not available
-            time_font = ImageFont.load_default()
-            quote_font = ImageFont.load_default()
-            info_font = ImageFont.load_default()
+        fonts = self.load_fonts()
 
         # Get current quote
-        quote_data = self.get_current_quote()
+        quote_data = self.get_current_quote(now)
         
-        # Draw time
-        time_text = quote_data['display_time']
-        time_bbox = draw.textbbox((0, 0), time_text, font=time_font)
-        time_width = time_bbox[2] - time_bbox[0]
-        time_height = time_bbox[3] - time_bbox[1]
-        draw.text(
-            ((self.width - time_width) // 2, 50),
-            time_text,
-            font=time_font,
-            fill=self.text_color
-        )
-
-        # Draw quote
-        quote_text = quote_data['quote']
-        # Word wrap the quote
-        words = quote_text.split()
-        lines = []
-        current_line = []
-        current_width = 0
-        max_width = self.width - 100  # Leave 50px margin on each side
-
-        for word in words:
-            word_width = draw.textbbox((0, 0), word + ' ', font=quote_font)[2]
-            if current_width + word_width <= max_width:
-                current_line.append(word)
-                current_width += word_width
+        with TRACER.span('layout'):
+            layout = self.get_layout(quote_data, fonts)
+
+        with TRACER.span('draw'):
+            role_fills = self.role_fills()
+            if self.config.get('text_renderer', 'freetype') == 'atlas':
+                self.glyph_atlases().draw_layout(image, layout, fonts, self.text_color, role_fills)
             else:
-                lines.append(' '.join(current_line))
-                current_line = [word]
-                current_width = word_width
-        if current_line:
-            lines.append(' '.join(current_line))
-
-        # Draw each line of the quote
-        y_position = 150
-        for line in lines:
-            line_bbox = draw.textbbox((0, 0), line, font=quote_font)
-            line_width = line_bbox[2] - line_bbox[0]
-            draw.text(
-                ((self.width - line_width) // 2, y_position),
-                line,
-                font=quote_font,
-                fill=self.text_color
-            )
-            y_position += self.font_size + 10
-
-        # Draw book and author if configured
-        if self.config.get('show_book_info', True):
-            info_text = f"{quote_data['book']}"
-            if self.config.get('show_author', True) and quote_data['author']:
-                info_text += f" by {quote_data['author']}"
-            
-            info_bbox = draw.textbbox((0, 0), info_text, font=info_font)
-            info_width = info_bbox[2] - info_bbox[0]
-            draw.text(
-                ((self.width - info_width) // 2, self.height - 100),
-                info_text,
-                font=info_font,
-                fill=self.text_color
-            )
+                layout.draw(draw, fonts, self.text_color, role_fills)
 
         return image
 
+    def preview_path(self):
+        """Return where the preview image is stored for the configured preview storage"""
+        if self.frame_store.mode == 'tmpfs':
+            return Path(self.config.get('preview_tmpfs_dir', DEFAULT_TMPFS_DIR)) / 'current_display.png'
+        return self.images_dir / 'current_display.png'
+
+    @TRACER.traced('png save')
     def save_image(self, image):
-        """Save the generated image"""
-        self.images_dir.mkdir(parents=True, exist_ok=True)
-        
-        # Save as PNG
-        image.save(self.images_dir / 'current_display.png', 'PNG')
-        print("Generated new display image")
+        """Save the generated image, unless it is identical to the one already saved"""
+        if self.frame_store.save(image, self.preview_path()):
+            print("Generated new display image")
 
 def main():
     generator = QuoteGenerator()
@@ -0,0 +1,391 @@
+#!/usr/bin/env python3
+import os
+import re
+import csv
+import json
+import uuid
+import queue
+import hashlib
+import threading
+import multiprocessing
+from datetime import datetime
+from pathlib import Path
+from storage import record_write, write_file_atomic, write_json_atomic
+from quote_text import prepare_quotes
+from fonts import FontChain, chain_paths
+
+COLUMNS = ['time_key', 'display_time', 'quote', 'book', 'author', 'rating']
+TIME_KEY_PATTERN = re.compile(r'^(\d{1,2}):(\d{2})$')
+CHUNK_ROWS = 1000
+MANIFEST_NAME = 'quotes.manifest.json'
+STORE_FORMAT = 3  # Bumped when ingest adds fields, so existing stores are rebuilt
+# Spawned, not forked: a fork of the threaded server could copy in a lock (metrics, stdout)
+# held by another thread at that moment, and the worker would deadlock on it
+WORKER_CONTEXT = multiprocessing.get_context('spawn')
+
+
+def normalize_time_key(value):
+    """Return `value` as a zero-padded HH:MM key, or None if it is not a valid time"""
+    match = TIME_KEY_PATTERN.match(value.strip())
+    if not match:
+        return None
+    hour, minute = int(match.group(1)), int(match.group(2))
+    if hour > 23 or minute > 59:
+        return None
+    return f"{hour:02d}:{minute:02d}"
+
+
+def parse_quotes_csv(csv_path, progress=None):
+    """
+    Parse a pipe-delimited quotes CSV into the quotes dictionary keyed by HH:MM.
+
+    Rows without a valid time key (such as a header row) are skipped, and each
+    quote is normalized into the token stream the renderer draws (see
+    quote_text). Raises ValueError if the file contains no usable quotes. If given, `progress` is
+    called with (rows_processed, bytes_read, total_bytes) after each chunk.
+    """
+    import pandas as pd  # Deferred: importing pandas dominates server start-up time
+
+    csv_path = Path(csv_path)
+    total_bytes = csv_path.stat().st_size
+    quotes_dict = {}
+    rows = 0
+
+    with open(csv_path, 'r', encoding='utf-8') as f:
+        # Quotes routinely start with a double quote, so the field must not be treated as quoted
+        reader = pd.read_csv(f, sep='|', header=None, names=COLUMNS, dtype=str,
+                             keep_default_na=False, quoting=csv.QUOTE_NONE,
+                             chunksize=CHUNK_ROWS)
+        for chunk in reader:
+            for row in chunk.itertuples(index=False):
+                rows += 1
+                time_key = normalize_time_key(row.time_key)
+                if time_key is None or not row.quote.strip():
+                    continue
+
+                # Default to 'unknown' if rating is missing or empty
+                rating = row.rating.strip().lower() or 'unknown'
+
+                quotes_dict[time_key] = {
+                    'display_time': row.display_time,
+                    'quote': row.quote,
+                    'book': row.book,
+                    'author': row.author,
+                    'rating': rating
+                }
+            if progress:
+                progress(rows, min(f.tell(), total_bytes), total_bytes)
+
+    if not quotes_dict:
+        raise ValueError(f"No valid quotes found in {csv_path.name}")
+    font_paths = chain_paths('quote')
+    flagged = prepare_quotes(quotes_dict, FontChain(font_paths).covers if font_paths else None)
+    if flagged:
+        print(f"{flagged} quotes contain characters no installed font can render")
+    return quotes_dict
+
+
+def file_digest(path):
+    """Return the SHA-256 of a file's contents"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 16), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def minute_digest(quote_data):
+    """Return a short content hash for a single minute's quote"""
+    encoded = json.dumps(quote_data, sort_keys=True, ensure_ascii=False).encode('utf-8')
+    return hashlib.sha256(encoded).hexdigest()[:16]
+
+
+def encode_store(quotes_dict):
+    """Serialize the quotes store compactly; it is read by machines, not people"""
+    return json.dumps(quotes_dict, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+
+
+def load_manifest(manifest_path):
+    """Load the import manifest, or an empty one if it is missing or unreadable"""
+    try:
+        with open(manifest_path, 'r') as f:
+            manifest = json.load(f)
+        return manifest if isinstance(manifest, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+class CorpusDiff:
+    """Per-minute changes between the stored corpus and a new source file"""
+
+    def __init__(self, added=(), removed=(), modified=(), total=0, unchanged_source=False):
+        self.added = sorted(added)
+        self.removed = sorted(removed)
+        self.modified = sorted(modified)
+        self.total = total
+        self.unchanged_source = unchanged_source
+
+    @property
+    def changed(self):
+        return bool(self.added or self.removed or self.modified)
+
+    def summary(self):
+        if self.unchanged_source:
+            return f"Corpus unchanged ({self.total} quotes)"
+        return (f"Corpus diff: {len(self.added)} added, {len(self.removed)} removed, "
+                f"{len(self.modified)} modified ({self.total} quotes)")
+
+    def to_dict(self):
+        return {
+            'added': len(self.added),
+            'removed': len(self.removed),
+            'modified': len(self.modified),
+            'total': self.total,
+            'unchanged_source': self.unchanged_source
+        }
+
+
+def plan_import(csv_path, json_path, manifest_path, progress=None):
+    """
+    Work out what importing `csv_path` changes in the store at `json_path`.
+
+    Returns (diff, store_bytes, manifest). If the source file hash matches the
+    manifest and the store is intact the CSV is not parsed at all. Otherwise
+    only the minutes whose content hash changed are applied to the existing
+    store. `store_bytes` is None when the store does not need to be rewritten.
+    """
+    json_path = Path(json_path)
+    source_hash = file_digest(csv_path)
+    manifest = load_manifest(manifest_path)
+    minutes = manifest.get('minutes', {})
+    store_intact = (json_path.exists() and manifest.get('format') == STORE_FORMAT
+                    and manifest.get('store_sha256') == file_digest(json_path))
+
+    if store_intact and manifest.get('source_sha256') == source_hash:
+        return CorpusDiff(total=len(minutes), unchanged_source=True), None, manifest
+
+    new_quotes = parse_quotes_csv(csv_path, progress=progress)
+    new_minutes = {time_key: minute_digest(quote_data) for time_key, quote_data in new_quotes.items()}
+
+    store = {}
+    if json_path.exists():
+        try:
+            with open(json_path, 'r') as f:
+                store = json.load(f)
+        except ValueError:
+            store = {}
+    if not store_intact:
+        # Without a trustworthy manifest, diff against what is actually stored
+        minutes = {time_key: minute_digest(quote_data) for time_key, quote_data in store.items()}
+
+    diff = CorpusDiff(
+        added=new_minutes.keys() - minutes.keys(),
+        removed=minutes.keys() - new_minutes.keys(),
+        modified=[time_key for time_key in new_minutes.keys() & minutes.keys()
+                  if new_minutes[time_key] != minutes[time_key]],
+        total=len(new_quotes))
+
+    store_bytes = None
+    store_hash = manifest.get('store_sha256')
+    if diff.changed or not store_intact:
+        for time_key in diff.removed:
+            store.pop(time_key, None)
+        for time_key in diff.added + diff.modified:
+            store[time_key] = new_quotes[time_key]
+        store_bytes = encode_store(dict(sorted(store.items())))
+        store_hash = hashlib.sha256(store_bytes).hexdigest()
+
+    manifest = {
+        'format': STORE_FORMAT,
+        'source': Path(csv_path).name,
+        'source_sha256': source_hash,
+        'store_sha256': store_hash,
+        'minutes': new_minutes
+    }
+    return diff, store_bytes, manifest
+
+
+def sync_corpus(csv_path, json_path, manifest_path, progress=None):
+    """Bring the quotes store up to date with `csv_path`, writing only what changed"""
+    diff, store_bytes, manifest = plan_import(csv_path, json_path, manifest_path, progress)
+    if store_bytes is not None:
+        write_file_atomic(json_path, store_bytes, kind='corpus')
+    if not diff.unchanged_source:
+        write_json_atomic(manifest_path, manifest, indent=None, kind='corpus')
+    print(diff.summary())
+    return diff
+
+
+def _import_worker(csv_path, data_dir, staged_json, staged_manifest, messages):
+    """Worker process entry point: diff the upload and stage the new store and manifest"""
+    try:
+        def report(rows, done, total):
+            messages.put(('progress', rows, done, total))
+
+        data_dir = Path(data_dir)
+        diff, store_bytes, manifest = plan_import(
+            csv_path, data_dir / 'quotes.json', data_dir / MANIFEST_NAME, progress=report)
+        if store_bytes is not None:
+            write_file_atomic(staged_json, store_bytes)
+        if not diff.unchanged_source:
+            write_json_atomic(staged_manifest, manifest, indent=None)
+        messages.put(('done', diff))
+    except Exception as e:
+        messages.put(('error', str(e)))
+
+
+class ImportJob:
+    """State of a single background CSV import"""
+
+    def __init__(self, job_id, filename):
+        self.id = job_id
+        self.filename = filename
+        self.state = 'queued'  # queued, running, succeeded, failed
+        self.progress = 0.0
+        self.rows_processed = 0
+        self.quotes = 0
+        self.diff = None
+        self.message = ''
+        self.created_at = datetime.now().isoformat(timespec='seconds')
+        self.finished_at = None
+
+    def to_dict(self):
+        return {
+            'job_id': self.id,
+            'filename': self.filename,
+            'state': self.state,
+            'progress': round(self.progress, 3),
+            'rows_processed': self.rows_processed,
+            'quotes': self.quotes,
+            'diff': self.diff,
+            'message': self.message,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at
+        }
+
+
+class ImportJobManager:
+    """
+    Runs CSV uploads as background jobs.
+
+    Parsing and the per-minute diff against the live store happen in a worker
+    process, which stages the new quotes.json and manifest next to the live
+    ones. Only when the worker succeeds are the staged files renamed over
+    `quotes.json`, the manifest and `litclock_annotated.csv`, so a bad upload
+    never leaves the data directory half-updated. The renames happen under
+    `commit_lock`, which whatever else re-imports the data directory (the
+    server's file watcher) should hold too, so it never sees the new CSV with
+    the old manifest. `on_commit` is called afterwards to swap the new corpus
+    into the running server.
+    """
+
+    def __init__(self, on_commit=None, max_jobs=20, commit_lock=None):
+        self.on_commit = on_commit
+        self.commit_lock = commit_lock or threading.Lock()
+        self.max_jobs = max_jobs
+        self.jobs = {}
+        self._lock = threading.Lock()
+        self._run_lock = threading.Lock()  # One import at a time
+
+    def submit(self, file_storage, filename, data_dir):
+        """Stage an uploaded file and start importing it into `data_dir` in the background"""
+        job = ImportJob(uuid.uuid4().hex[:12], filename)
+        upload_dir = Path(data_dir) / 'uploads'
+        upload_dir.mkdir(parents=True, exist_ok=True)
+        upload_path = upload_dir / f'{job.id}.csv'
+        file_storage.save(str(upload_path))
+
+        with self._lock:
+            self.jobs[job.id] = job
+            self._prune()
+        thread = threading.Thread(target=self._run, args=(job, Path(data_dir), upload_path))
+        thread.daemon = True
+        thread.start()
+        return job
+
+    def get(self, job_id):
+        with self._lock:
+            return self.jobs.get(job_id)
+
+    def list(self):
+        with self._lock:
+            return [job.to_dict() for job in self.jobs.values()]
+
+    def _prune(self):
+        """Forget the oldest finished jobs beyond `max_jobs`"""
+        finished = [job_id for job_id, job in self.jobs.items()
+                    if job.state in ('succeeded', 'failed')]
+        while len(self.jobs) > self.max_jobs and finished:
+            del self.jobs[finished.pop(0)]
+
+    def _run(self, job, data_dir, upload_path):
+        with self._run_lock:
+            job.state = 'running'
+            staged_json = upload_path.with_suffix('.json')
+            staged_manifest = upload_path.with_suffix('.manifest')
+            try:
+                diff = self._parse_in_worker(job, data_dir, upload_path, staged_json, staged_manifest)
+                if not diff.unchanged_source:
+                    self._commit(data_dir, upload_path, staged_json, staged_manifest)
+            except Exception as e:
+                job.state = 'failed'
+                job.message = str(e)
+                print(f"Import job {job.id} failed: {e}")
+            else:
+                # Swap the new corpus in before reporting success
+                if diff.changed and self.on_commit:
+                    try:
+                        self.on_commit()
+                    except Exception as e:
+                        print(f"Error reloading quotes after import: {e}")
+                job.quotes = diff.total
+                job.diff = diff.to_dict()
+                job.progress = 1.0
+                job.state = 'succeeded'
+                job.message = diff.summary()
+                print(f"Import job {job.id}: {job.message}")
+            finally:
+                job.finished_at = datetime.now().isoformat(timespec='seconds')
+                for path in (upload_path, staged_json, staged_manifest):
+                    if path.exists():
+                        path.unlink()
+
+    def _parse_in_worker(self, job, data_dir, upload_path, staged_json, staged_manifest):
+        messages = WORKER_CONTEXT.Queue()
+        process = WORKER_CONTEXT.Process(
+            target=_import_worker,
+            args=(str(upload_path), str(data_dir), str(staged_json), str(staged_manifest), messages))
+        process.daemon = True
+        process.start()
+        try:
+            while True:
+                try:
+                    message = messages.get(timeout=0.5)
+                except queue.Empty:
+                    if not process.is_alive():
+                        raise RuntimeError(f"Import worker exited with code {process.exitcode}")
+                    continue
+
+                if message[0] == 'progress':
+                    _, rows, done, total = message
+                    job.rows_processed = rows
+                    # Leave the last few percent for the commit step
+                    job.progress = 0.95 * done / total if total else 0.0
+                elif message[0] == 'done':
+                    return message[1]
+                else:
+                    raise ValueError(message[1])
+        finally:
+            process.join(timeout=5)
+
+    def _commit(self, data_dir, upload_path, staged_json, staged_manifest):
+        """Atomically replace the live corpus with the staged one"""
+        # The worker process wrote these files, so count them here where the metrics live
+        for path in (staged_json, staged_manifest, upload_path):
+            if path.exists():
+                record_write('corpus', path.stat().st_size)
+        with self.commit_lock:
+            if staged_json.exists():
+                os.replace(staged_json, data_dir / 'quotes.json')
+            os.replace(staged_manifest, data_dir / MANIFEST_NAME)
+            os.replace(upload_path, data_dir / 'litclock_annotated.csv')
@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Ingest-time normalization of quote text into a token stream.
+
+The corpus carries `<br/>` tags in three spellings, stray markup such as
+`<time/>`, HTML entities, and emphasis written as Unicode mathematical
+italic letters. Each quote is normalized once when it is imported (tags
+resolved, entities decoded, NFC) and stored as tokens, so the renderer
+only wraps and draws:
+
+    "word"                     a plain word
+    "\\n"                       a hard line break
+    [["piece", "style"], ...]  a word with styled pieces, style being
+                               "" (plain), "em" or "time" (the time phrase)
+
+Characters no installed font has a glyph for are listed under
+'missing_glyphs' so they can be spotted before they reach the panel.
+"""
+import re
+import html
+import unicodedata
+from time_phrase import PhraseMatcher, find_time_span, fold
+
+BREAK = '\n'
+EMPHASIS_TAGS = {'i', 'em', 'b', 'strong', 'cite'}
+TAG_PATTERN = re.compile(r'<\s*(/?)\s*([a-zA-Z]+)\b[^>]*>')
+# Mathematical Alphanumeric Symbols, used in the corpus for italic titles
+MATH_ALPHANUMERICS = range(0x1D400, 0x1D800)
+
+
+def _append(chars, styles, segment, emphasized):
+    segment = unicodedata.normalize('NFC', html.unescape(segment))
+    for char in segment:
+        if ord(char) in MATH_ALPHANUMERICS:
+            chars.append(unicodedata.normalize('NFKC', char))
+            styles.append(True)
+        else:
+            chars.append(' ' if char.isspace() else char)
+            styles.append(emphasized)
+
+
+def normalize_quote(raw):
+    """
+    Return (text, emphasis): `raw` with markup resolved, entities decoded
+    and NFC applied, hard breaks as '\\n', and a per-character flag for
+    emphasized text.
+    """
+    chars = []
+    emphasis = []
+    depth = 0
+    position = 0
+    for match in TAG_PATTERN.finditer(raw):
+        _append(chars, emphasis, raw[position:match.start()], depth > 0)
+        closing, name = match.group(1), match.group(2).lower()
+        if name == 'br':
+            chars.append(BREAK)
+            emphasis.append(False)
+        elif name in EMPHASIS_TAGS and not match.group(0).endswith('/>'):
+            depth = max(0, depth - 1) if closing else depth + 1
+        position = match.end()
+    _append(chars, emphasis, raw[position:], depth > 0)
+    return ''.join(chars), emphasis
+
+
+def normalize_inline(raw):
+    """Return `raw` normalized to a single line of plain text, e.g. a display time"""
+    text, _ = normalize_quote(raw)
+    return ' '.join(text.split())
+
+
+def tokenize(text, emphasis, time_span=None):
+    """Split normalized text into word and break tokens, marking emphasis and the time phrase"""
+    tokens = []
+    word = []
+    for index, char in enumerate(text + ' '):
+        if char == ' ' or char == BREAK:
+            if word:
+                tokens.append(_word_token(word))
+                word = []
+            if char == BREAK:
+                tokens.append(BREAK)
+            continue
+        if time_span and time_span[0] <= index < time_span[1]:
+            style = 'time'
+        else:
+            style = 'em' if emphasis[index] else ''
+        if word and word[-1][1] == style:
+            word[-1][0] += char
+        else:
+            word.append([char, style])
+    return tokens
+
+
+def _word_token(pieces):
+    if len(pieces) == 1 and not pieces[0][1]:
+        return pieces[0][0]
+    return pieces
+
+
+def missing_glyphs(text, covers):
+    """Return the characters of `text` for which `covers(char)` is false, in order of appearance"""
+    missing = []
+    for char in dict.fromkeys(text):
+        if char.isspace() or unicodedata.category(char) in ('Cc', 'Cf', 'Mn'):
+            continue
+        if not covers(char):
+            missing.append(char)
+    return ''.join(missing)
+
+
+def prepare_quotes(quotes, covers=None):
+    """
+    Normalize and tokenize every quote in place.
+
+    Display times are normalized to plain text, each quote's time phrase is
+    located with one matcher over the whole corpus, and if given, the
+    characters for which `covers(char)` is false are recorded. Returns the
+    number of quotes with missing glyphs.
+    """
+    for quote_data in quotes.values():
+        quote_data['display_time'] = normalize_inline(quote_data['display_time'])
+    matcher = PhraseMatcher({fold(quote_data['display_time'])[0] for quote_data in quotes.values()})
+
+    flagged = 0
+    for quote_data in quotes.values():
+        text, emphasis = normalize_quote(quote_data['quote'])
+        span = find_time_span(matcher, text, quote_data['display_time'])
+        quote_data['tokens'] = tokenize(text, emphasis, span)
+        missing = missing_glyphs(text, covers) if covers else ''
+        if missing:
+            quote_data['missing_glyphs'] = missing
+            flagged += 1
+    return flagged
+
+
+def quote_tokens(quote_data):
+    """Return the stored tokens of a quote, tokenizing quotes that were never ingested"""
+    tokens = quote_data.get('tokens')
+    if tokens is None:
+        text, emphasis = normalize_quote(quote_data['quote'])
+        tokens = tokenize(text, emphasis)
+    return tokens
@@ -0,0 +1,66 @@
+#!/usr/bin/env python3
+import argparse
+import os
+import sys
+
+def run_benchmarks():
+    """Run the benchmark suite and compare the results against the stored baseline"""
+    root_dir = os.path.dirname(os.path.abspath(__file__))
+    sys.path.append(root_dir)
+    # QuoteGenerator and the web server resolve data/ and images/ relative to the working directory
+    os.chdir(root_dir)
+    from benchmarks.suite import BENCHMARKS, SCALING_SIZES, compare, load_results, run, run_scaling, save_results
+
+    parser = argparse.ArgumentParser(description='Benchmark the render -> pack -> transfer pipeline')
+    parser.add_argument('names', nargs='*', help='Benchmarks to run (default: all)')
+    parser.add_argument('--output', help='Where to write the results JSON (default: benchmarks/results/<suite>.json)')
+    parser.add_argument('--baseline', help='Baseline results to compare against (default: benchmarks/baseline[_scaling].json)')
+    parser.add_argument('--threshold', type=float, default=0.25,
+                        help='Allowed slowdown of the median before it counts as a regression (0.25 = 25%%)')
+    parser.add_argument('--save-baseline', action='store_true', help='Store these results as the new baseline')
+    parser.add_argument('--samples', type=int, default=24, help='Number of corpus minutes to sample')
+    parser.add_argument('--quick', action='store_true', help='Run a quarter of the iterations')
+    parser.add_argument('--list', action='store_true', help='List the available benchmarks and exit')
+    parser.add_argument('--scaling', action='store_true',
+                        help='Run the ingest/lookup/render scaling benchmarks on synthetic corpora instead')
+    parser.add_argument('--sizes', default=','.join(str(size) for size in SCALING_SIZES),
+                        help='Comma-separated corpus sizes for --scaling')
+    args = parser.parse_args()
+    suite = 'scaling' if args.scaling else 'latest'
+    args.output = args.output or f'benchmarks/results/{suite}.json'
+    args.baseline = args.baseline or ('benchmarks/baseline_scaling.json' if args.scaling else 'benchmarks/baseline.json')
+
+    if args.list:
+        for name, _, iterations, _ in BENCHMARKS:
+            print(f"{name} ({iterations} iterations)")
+        return 0
+
+    scale = 0.25 if args.quick else 1.0
+    if args.scaling:
+        sizes = [int(size) for size in args.sizes.split(',') if size]
+        results = run_scaling(sizes, sample_size=args.samples, scale=scale)
+    else:
+        results = run(args.names, sample_size=args.samples, scale=scale)
+    save_results(results, args.output)
+    print(f"Results written to {args.output}")
+
+    if args.save_baseline:
+        save_results(results, args.baseline)
+        print(f"Baseline saved to {args.baseline}")
+        return 0
+
+    if not os.path.exists(args.baseline):
+        print(f"No baseline at {args.baseline}; run with --save-baseline to create one")
+        return 0
+
+    regressions = compare(results, load_results(args.baseline), args.threshold)
+    for name, previous, current, ratio in regressions:
+        print(f"REGRESSION {name}: median {previous * 1000:.2f} ms -> {current * 1000:.2f} ms ({ratio:.2f}x)")
+    if not regressions:
+        print(f"No regressions beyond {args.threshold:.0%} of the baseline")
+
+    # Return 0 if nothing regressed, 1 otherwise
+    return 1 if regressions else 0
+
+if __name__ == '__main__':
+    sys.exit(run_benchmarks())
@@ -0,0 +1,96 @@
+#!/usr/bin/env python3
+import time
+from datetime import datetime, timedelta
+from metrics import CACHE_REQUESTS
+from tracing import TRACER
+
+
+def next_boundary(now, interval):
+    """Return the next update boundary after `now`, aligned to `interval` seconds from midnight"""
+    interval = max(1, int(interval))
+    midnight = now.replace(hour=0, minute=0, second=0, microsecond=0)
+    elapsed = (now - midnight).total_seconds()
+    return midnight + timedelta(seconds=(int(elapsed // interval) + 1) * interval)
+
+
+@TRACER.traced('sleep')
+def sleep_until(when, should_continue=lambda: True):
+    """Sleep until the wall clock reaches `when`, or until `should_continue` returns False"""
+    while should_continue():
+        remaining = (when - datetime.now()).total_seconds()
+        if remaining <= 0:
+            return True
+        time.sleep(min(remaining, 1.0))
+    return False
+
+
+class PreparedFrame:
+    """A rendered frame for a specific minute, packed into its black and red planes"""
+
+    def __init__(self, time_key, generation, image, data):
+        self.time_key = time_key
+        self.generation = generation
+        self.image = image
+        self.data = data
+
+
+class FrameLookahead:
+    """
+    One-slot lookahead buffer for the display scheduler.
+
+    The next minute's frame is rendered and packed during the idle part of
+    the current minute, so at the boundary only the SPI transfer is left.
+    A frame is only handed out if it was rendered for the requested minute
+    from the same config/corpus generation it was prepared with.
+    """
+
+    def __init__(self, quote_generator, display_manager):
+        self.quote_generator = quote_generator
+        self.display_manager = display_manager
+        self.frame = None
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, when):
+        """Render and pack the frame for `when` without touching the slot"""
+        generation = self.quote_generator.generation
+        image = self.quote_generator.create_image(when)
+        data = self.display_manager.convert_image_to_planes(
+            image, self.quote_generator.config.get('dither_mode', 'threshold'))
+        return PreparedFrame(when.strftime('%H:%M'), generation, image, data)
+
+    @TRACER.traced('prepare next frame')
+    def prepare(self, when):
+        """Pre-render the frame for `when` into the lookahead slot"""
+        self.frame = self.render(when)
+        return self.frame
+
+    def take(self, when):
+        """Return the frame for `when`, rendering it now if the slot is empty or stale"""
+        frame, self.frame = self.frame, None
+        if (frame is not None
+                and frame.time_key == when.strftime('%H:%M')
+                and frame.generation == self.quote_generator.generation):
+            self.hits += 1
+            CACHE_REQUESTS.inc(cache='frame', result='hit')
+            return frame
+        self.misses += 1
+        CACHE_REQUESTS.inc(cache='frame', result='miss')
+        return self.render(when)
+
+    def retain(self, generation, changed_minutes):
+        """
+        Keep the pre-rendered frame across a corpus reload.
+
+        A frame rendered from `generation` is still valid after the reload
+        if its own minute is not among `changed_minutes`.
+        """
+        frame = self.frame
+        if frame is not None and frame.generation == generation and frame.time_key not in changed_minutes:
+            frame.generation = self.quote_generator.generation
+            return True
+        return False
+
+    def invalidate(self):
+        """Drop any pre-rendered frame"""
+        self.frame = None
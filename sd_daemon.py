@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+The two systemd protocols the service uses (see sd-daemon(3)), without libsystemd.
+
+Socket activation: systemd binds port 5001 itself (quote_clock.socket)
+and hands the listening socket over as file descriptor 3, announced by
+LISTEN_PID and LISTEN_FDS, so connections queue up in the kernel while
+the server is still starting instead of being refused.
+
+Readiness and watchdog: with Type=notify, systemd considers the service
+started once it sends READY=1 as a datagram to NOTIFY_SOCKET, and with
+WatchdogSec= it restarts the service unless WATCHDOG=1 arrives at least
+every WATCHDOG_USEC microseconds.
+
+Every function does nothing when the variables are not set, so running
+the server by hand is unaffected.
+"""
+import os
+import socket
+import threading
+
+LISTEN_FDS_START = 3
+
+
+def listen_fds(unset_environment=True):
+    """Return the file descriptors of the sockets passed by systemd, if any are meant for us"""
+    try:
+        pid = int(os.environ.get('LISTEN_PID', ''))
+        count = int(os.environ.get('LISTEN_FDS', ''))
+    except ValueError:
+        return []
+    if unset_environment:
+        # Child processes must not think the sockets are theirs
+        for name in ('LISTEN_PID', 'LISTEN_FDS', 'LISTEN_FDNAMES'):
+            os.environ.pop(name, None)
+    if pid != os.getpid():
+        return []
+    fds = list(range(LISTEN_FDS_START, LISTEN_FDS_START + count))
+    for fd in fds:
+        os.set_inheritable(fd, False)
+    return fds
+
+
+def notify_socket():
+    """The address systemd listens for notifications on, or None when not run by it"""
+    address = os.environ.get('NOTIFY_SOCKET')
+    if not address:
+        return None
+    if address.startswith('@'):
+        return '\0' + address[1:]  # Abstract namespace
+    return address
+
+
+def notify(state):
+    """Send `state`, such as 'READY=1', to systemd; returns False when there is nothing to notify"""
+    address = notify_socket()
+    if address is None:
+        return False
+    with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+        sock.connect(address)
+        sock.sendall(state.encode())
+    return True
+
+
+def watchdog_interval():
+    """Seconds between watchdog pings systemd expects, or None without a watchdog"""
+    try:
+        usec = int(os.environ.get('WATCHDOG_USEC', ''))
+    except ValueError:
+        return None
+    pid = os.environ.get('WATCHDOG_PID')
+    if usec <= 0 or (pid and pid != str(os.getpid())):
+        return None
+    return usec / 1e6
+
+
+class Watchdog:
+    """
+    Sends WATCHDOG=1 twice per watchdog interval while `healthy()` holds,
+    so a service that stops making progress is restarted by systemd.
+    """
+
+    def __init__(self, interval, healthy=None):
+        self.interval = interval
+        self.healthy = healthy or (lambda: True)
+        self.pings = 0
+        self._stop = threading.Event()
+        self.thread = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run, name='watchdog', daemon=True)
+        self.thread.start()
+        return self
+
+    def run(self):
+        while not self._stop.wait(self.interval / 2):
+            try:
+                if self.healthy() and notify('WATCHDOG=1'):
+                    self.pings += 1
+            except Exception as e:
+                print(f"Error sending watchdog ping: {e}")
+
+    def stop(self):
+        self._stop.set()
+        if self.thread is not None:
+            self.thread.join()
+
+
+def start_watchdog(healthy=None):
+    """Start pinging the watchdog if systemd set one up; returns the Watchdog or None"""
+    interval = watchdog_interval()
+    if interval is None:
+        return None
+    return Watchdog(interval, healthy).start()
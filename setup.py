@@ -1,7 +1,8 @@
 #!/usr/bin/env python3
 import os
 import json
-import pandas as pd
+from quote_import import MANIFEST_NAME, sync_corpus
+from font_subset import build_subsets
 from pathlib import Path
 
 def create_directories():
@@ -41,36 +42,24 @@ def convert_csv_to_json():
     
     if os.path.exists(csv_file):
         try:
-            # Read CSV with pipe delimiter and no header
-            df = pd.read_csv(csv_file, sep='|', header=None, 
-                           names=['time_key', 'display_time', 'quote', 'book', 'author', 'rating'])
-            
-            quotes_dict = {}
-            
-            for _, row in df.iterrows():
-                time_key = row['time_key']
-                
-                # Default to 'unknown' if rating is missing or empty
-                rating = row.get('rating', 'unknown')
-                if pd.isna(rating) or rating == '':
-                    rating = 'unknown'
-                    
-                quotes_dict[time_key] = {
-                    'display_time': row['display_time'],
-                    'quote': row['quote'],
-                    'book': row['book'],
-                    'author': row['author'],
-                    'rating': rating.lower()
-                }
-            
-            with open(json_file, 'w') as f:
-                json.dump(quotes_dict, f, indent=4)
+            sync_corpus(csv_file, json_file, os.path.join('data', MANIFEST_NAME))
             print(f"Converted {csv_file} to {json_file}")
         except Exception as e:
             print(f"Error converting CSV to JSON: {e}")
     else:
         print(f"CSV file not found: {csv_file}")
 
+def create_font_subsets():
+    """Subset the fonts to the characters of quotes.json (needs fontTools)."""
+    json_file = 'data/quotes.json'
+    if not os.path.exists(json_file):
+        return
+    try:
+        with open(json_file, 'r', encoding='utf-8') as f:
+            build_subsets(json.load(f))
+    except Exception as e:
+        print(f"Error building font subsets: {e}")
+
 def create_config_file():
     """Create a default config.json file if it doesn't exist."""
     config_file = 'data/config.json'
@@ -92,6 +81,7 @@ def main():
     create_directories()
     create_sample_quotes()
     convert_csv_to_json()
+    create_font_subsets()
     create_config_file()
     print("Setup completed successfully!")
 
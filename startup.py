@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+import time
+import threading
+
+
+class StartupTimer:
+    """Records how long each startup phase took since the process started"""
+
+    def __init__(self):
+        self.start = time.monotonic()
+        self.phases = {}
+        self._lock = threading.Lock()
+
+    def mark(self, phase):
+        """Record `phase` the first time it is reached and log the elapsed time"""
+        with self._lock:
+            if phase in self.phases:
+                return
+            elapsed = time.monotonic() - self.start
+            self.phases[phase] = elapsed
+        print(f"[startup] {phase}: {elapsed * 1000:.0f} ms")
+
+    def to_dict(self):
+        with self._lock:
+            return {phase: round(elapsed, 3) for phase, elapsed in self.phases.items()}
+
+
+class LazyObject:
+    """
+    Proxy that builds the wrapped object on first use.
+
+    Attribute reads and writes are forwarded to the object returned by
+    `factory`, which is called at most once, so module-level singletons can
+    be declared at import time without paying for their construction.
+    """
+
+    def __init__(self, factory, on_ready=None):
+        object.__setattr__(self, '_factory', factory)
+        object.__setattr__(self, '_on_ready', on_ready)
+        object.__setattr__(self, '_instance', None)
+        object.__setattr__(self, '_lock', threading.Lock())
+
+    def _get_instance(self):
+        instance = object.__getattribute__(self, '_instance')
+        if instance is None:
+            with object.__getattribute__(self, '_lock'):
+                instance = object.__getattribute__(self, '_instance')
+                if instance is None:
+                    instance = object.__getattribute__(self, '_factory')()
+                    object.__setattr__(self, '_instance', instance)
+                    on_ready = object.__getattribute__(self, '_on_ready')
+                    if on_ready:
+                        on_ready()
+        return instance
+
+    @property
+    def is_ready(self):
+        return object.__getattribute__(self, '_instance') is not None
+
+    def __getattr__(self, name):
+        return getattr(self._get_instance(), name)
+
+    def __setattr__(self, name, value):
+        setattr(self._get_instance(), name, value)
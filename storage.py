@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+Storage helpers that keep writes to the Pi's SD card to a minimum.
+
+Files are replaced atomically (temp file + fsync + rename) so a power cut
+never leaves a truncated config or corpus behind, unchanged preview frames
+are not rewritten, and every byte that reaches persistent storage is
+counted in the metrics.
+"""
+import io
+import os
+import json
+import stat
+import hashlib
+import tempfile
+import threading
+from pathlib import Path
+from metrics import BYTES_WRITTEN_TODAY, STORAGE_BYTES_WRITTEN, STORAGE_WRITES_SKIPPED
+
+PREVIEW_STORAGE_MODES = ('disk', 'tmpfs', 'memory')
+DEFAULT_TMPFS_DIR = Path('/dev/shm/quote_clock')
+
+
+def record_write(kind, size):
+    """Count `size` bytes written to persistent storage"""
+    STORAGE_BYTES_WRITTEN.inc(size, kind=kind)
+    BYTES_WRITTEN_TODAY.add(size)
+
+
+def write_file_atomic(path, data, kind=None, sync=True):
+    """
+    Write `data` bytes next to `path`, fsync and rename it into place.
+
+    If `kind` is given the write is counted under that kind; pass
+    sync=False for files on tmpfs, where fsync buys nothing. The file keeps
+    the mode of the one it replaces, or gets 0644 if it is new.
+    """
+    path = Path(path)
+    try:
+        mode = stat.S_IMODE(os.stat(path).st_mode)
+    except FileNotFoundError:
+        mode = 0o644
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=f'.{path.name}.', suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            os.fchmod(f.fileno(), mode)  # mkstemp creates it 0600
+            f.write(data)
+            if sync:
+                f.flush()
+                os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+    if sync:
+        # Make the rename itself durable
+        try:
+            dir_fd = os.open(path.parent, os.O_RDONLY)
+        except OSError:
+            dir_fd = None
+        if dir_fd is not None:
+            try:
+                os.fsync(dir_fd)
+            except OSError:
+                pass
+            finally:
+                os.close(dir_fd)
+    if kind:
+        record_write(kind, len(data))
+
+
+def write_json_atomic(path, data, indent=4, kind=None):
+    """Write `data` as JSON to `path` atomically"""
+    write_file_atomic(path, json.dumps(data, indent=indent).encode('utf-8'), kind=kind)
+
+
+def image_digest(image):
+    """Return a hash of an image's pixels, cheaper than encoding it"""
+    digest = hashlib.sha256(f'{image.mode}{image.size}'.encode('ascii'))
+    digest.update(image.tobytes())
+    return digest.hexdigest()
+
+
+class FrameStore:
+    """
+    Stores preview frames as PNG, skipping frames identical to the last one.
+
+    In 'disk' mode frames are written where they are asked to be; 'tmpfs'
+    mode is the same but the caller points it at a RAM-backed directory and
+    writes are neither fsynced nor counted; 'memory' mode keeps the PNG
+    bytes in the process and never touches the filesystem.
+    """
+
+    def __init__(self, mode='disk'):
+        if mode not in PREVIEW_STORAGE_MODES:
+            raise ValueError(f"Unknown preview storage mode: {mode}")
+        self.mode = mode
+        self._digests = {}
+        self._frames = {}
+        self._lock = threading.Lock()
+
+    def save(self, image, path):
+        """Store `image` as the frame for `path`; returns False if it was unchanged"""
+        key = str(path)
+        digest = image_digest(image)
+        with self._lock:
+            if self._digests.get(key) == digest and self.exists(path):
+                STORAGE_WRITES_SKIPPED.inc(kind='frame')
+                return False
+
+        buffer = io.BytesIO()
+        image.save(buffer, 'PNG')
+        data = buffer.getvalue()
+        if self.mode == 'memory':
+            with self._lock:
+                self._frames[key] = data
+        else:
+            Path(path).parent.mkdir(parents=True, exist_ok=True)
+            persistent = self.mode == 'disk'
+            write_file_atomic(path, data, kind='frame' if persistent else None, sync=persistent)
+        with self._lock:
+            self._digests[key] = digest
+        return True
+
+    def exists(self, path):
+        if self.mode == 'memory':
+            return str(path) in self._frames
+        return Path(path).exists()
+
+    def read(self, path):
+        """Return the stored PNG bytes for `path`, or None"""
+        if self.mode == 'memory':
+            return self._frames.get(str(path))
+        try:
+            with open(path, 'rb') as f:
+                return f.read()
+        except OSError:
+            return None
+
+    def digest(self, path):
+        """Return the pixel hash of the last frame saved to `path`, if known"""
+        return self._digests.get(str(path))
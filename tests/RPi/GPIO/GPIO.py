@@ -33,7 +33,7 @@ class GPIO:
     _pin_states = {}
     _pin_modes = {}
     _event_callbacks = {}
-    _busy_pin = 24  # BUSY_PIN from DisplayManager
+    _busy_pin = 18  # BUSY_PIN from DisplayManager (BOARD numbering)
     _busy_state = 0
     _busy_timeout = 0.1  # 100ms timeout for busy state
 
@@ -30,6 +30,10 @@ class SpiDev:
         """Write bytes to the SPI device"""
         self._buffer.extend(data)
 
+    def writebytes2(self, data):
+        """Write a buffer of any length to the SPI device"""
+        self._buffer.extend(bytes(data))
+
     def readbytes(self, length):
         """Read bytes from the SPI device"""
         return [0] * length  # Return dummy data
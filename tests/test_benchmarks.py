@@ -0,0 +1,41 @@
+#!/usr/bin/env python3
+import unittest
+import os
+import sys
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.suite import compare, sample_minutes, summarize
+
+class TestBenchmarks(unittest.TestCase):
+    def test_sample_minutes_is_deterministic(self):
+        """Test the sample is stable and covers the shortest and longest quotes"""
+        quotes = {f"{h:02d}:{m:02d}": {'quote': 'x' * (h * 60 + m + 1)} for h in range(24) for m in range(0, 60, 5)}
+        quotes['03:07'] = {'quote': ''}
+        quotes['17:33'] = {'quote': 'x' * 5000}
+        sample = sample_minutes(quotes, 10)
+        self.assertEqual(sample, sample_minutes(quotes, 10))
+        self.assertIn('03:07', sample)
+        self.assertIn('17:33', sample)
+        self.assertLessEqual(len(sample), 12)
+        self.assertEqual(sample_minutes({'12:00': {'quote': 'q'}}, 10), ['12:00'])
+
+    def test_summarize(self):
+        """Test summary statistics of the per-iteration timings"""
+        stats = summarize([0.3, 0.1, 0.2, 0.4])
+        self.assertEqual(stats['iterations'], 4)
+        self.assertEqual(stats['min'], 0.1)
+        self.assertEqual(stats['max'], 0.4)
+        self.assertAlmostEqual(stats['median'], 0.25)
+        self.assertEqual(stats['p95'], 0.4)
+
+    def test_compare_flags_regressions_beyond_threshold(self):
+        """Test only benchmarks slower than the threshold are reported"""
+        baseline = {'benchmarks': {'fast': {'median': 1.0}, 'slow': {'median': 1.0}}}
+        results = {'benchmarks': {'fast': {'median': 1.1}, 'slow': {'median': 1.5}, 'new': {'median': 9.0}}}
+        regressions = compare(results, baseline, threshold=0.25)
+        self.assertEqual([name for name, *_ in regressions], ['slow'])
+        self.assertAlmostEqual(regressions[0][3], 1.5)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+import unittest
+import os
+import sys
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from config_impact import LAYOUT, PACKING, PREVIEW, SCHEDULER, SELECTION, analyze_config_change
+
+BASE_CONFIG = {
+    'update_interval': 300,
+    'display_brightness': 100,
+    'font_size': 24,
+    'show_book_info': True,
+    'show_author': True,
+    'content_filter': 'all'
+}
+
+class TestConfigImpact(unittest.TestCase):
+    def impact(self, **changes):
+        return analyze_config_change(BASE_CONFIG, dict(BASE_CONFIG, **changes))
+
+    def test_fields_are_classified(self):
+        """Test each field only invalidates what it feeds into"""
+        self.assertEqual(self.impact(update_interval=60).impacts, {SCHEDULER})
+        self.assertEqual(self.impact(content_filter='sfw').impacts, {SELECTION})
+        self.assertEqual(self.impact(font_size=30).impacts, {LAYOUT})
+        self.assertEqual(self.impact(show_author=False).impacts, {LAYOUT})
+        self.assertEqual(self.impact(time_color='red').impacts, {LAYOUT})
+        self.assertEqual(self.impact(display_brightness=50).impacts, set())
+        self.assertEqual(self.impact(dither_mode='bayer').impacts, {PACKING})
+        self.assertEqual(self.impact(mystery=1).impacts, {SCHEDULER, SELECTION, LAYOUT, PREVIEW, PACKING})
+
+    def test_preview_refresh(self):
+        """Test the preview is only refreshed for changes to what is drawn"""
+        self.assertFalse(self.impact(update_interval=60).refresh_preview)
+        self.assertFalse(self.impact().refresh_preview)
+        self.assertFalse(self.impact())
+        self.assertTrue(self.impact(font_size=30).refresh_preview)
+        self.assertTrue(self.impact(content_filter='nsfw').refresh_preview)
+
+    def test_missing_fields_use_defaults(self):
+        """Test adding a field at its default value is not a change"""
+        config = dict(BASE_CONFIG)
+        del config['content_filter']
+        self.assertFalse(analyze_config_change(config, BASE_CONFIG))
+        self.assertEqual(analyze_config_change(config, dict(BASE_CONFIG, content_filter='sfw')).changed,
+                         ['content_filter'])
+
+if __name__ == '__main__':
+    unittest.main()
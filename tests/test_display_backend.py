@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+import unittest
+import os
+import sys
+import shutil
+from pathlib import Path
+import numpy as np
+from PIL import Image, ImageDraw
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from display_backend import BACKENDS, SimulatorBackend, create_backend, pack_rows, split_planes, unpack_rows
+
+def sample_frame(width=960, height=680):
+    """A frame with black text-like blocks and a red one"""
+    image = Image.new('RGB', (width, height), (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    draw.rectangle((100, 100, 300, 140), fill=(0, 0, 0))
+    draw.rectangle((400, 300, 520, 333), fill=(255, 0, 0))
+    return image
+
+class TestDisplayBackend(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = Path('test_display_backend')
+        self.simulator = SimulatorBackend(self.test_dir / 'panel.png')
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_backends_share_the_interface(self):
+        """Test every backend that runs on the mocks offers the whole interface"""
+        for name in ('uc8159', 'ssd', 'simulator'):
+            backend = create_backend(name)
+            for method in ('init', 'convert_image_to_planes', 'display', 'sleep'):
+                self.assertTrue(callable(getattr(backend, method)), (name, method))
+            self.assertLessEqual(backend.capabilities, {'red', 'partial', '4gray'})
+            if 'partial' in backend.capabilities:
+                self.assertTrue(callable(backend.display_partial), name)
+            black, red = backend.convert_image_to_planes(sample_frame())
+            self.assertEqual(len(black), backend.width * backend.height // 8, name)
+            self.assertEqual(red is not None, 'red' in backend.capabilities, name)
+        self.assertIn('epd13in3b', BACKENDS)
+        with self.assertRaises(ValueError):
+            create_backend('crt')
+
+    def test_split_planes(self):
+        """Test red pixels are split off and left white in the black plane"""
+        black, red = split_planes(sample_frame(), 960, 680)
+        self.assertEqual(int(red.sum()), 121 * 34)
+        self.assertTrue(black[310, 450])
+        self.assertFalse(black[120, 200])
+        self.assertTrue(np.array_equal(unpack_rows(pack_rows(black), 960, 680), black.astype(bool)))
+
+    def test_simulator_shows_the_frame(self):
+        """Test the simulator's PNG shows what the panel would"""
+        frame = sample_frame()
+        self.simulator.display(*self.simulator.convert_image_to_planes(frame))
+        self.assertEqual(self.simulator.refreshes, 1)
+        with Image.open(self.simulator.path) as shown:
+            self.assertEqual(shown.tobytes(), frame.tobytes())
+
+    def test_simulator_partial_window(self):
+        """Test a partial refresh only changes its window"""
+        self.simulator.display(sample_frame())
+        blank = Image.new('RGB', (960, 680), (255, 255, 255))
+        self.simulator.display_partial(blank, 0, 0, 960, 200)
+        shown = self.simulator.render()
+        self.assertEqual(shown.getpixel((200, 120)), (255, 255, 255))
+        self.assertEqual(shown.getpixel((450, 310)), (255, 0, 0))
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+import unittest
+import os
+import sys
+import shutil
+import tempfile
+import threading
+import time
+from pathlib import Path
+from unittest import mock
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import control
+import web_server
+from control import ControlServer
+from display_daemon import DisplayDaemon
+from framebuffer import FrameBuffer
+
+class TestControlSocket(unittest.TestCase):
+    def setUp(self):
+        # Unix socket paths are limited to about 100 characters
+        self.test_dir = Path(tempfile.mkdtemp())
+        self.path = self.test_dir / 'control.sock'
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_commands_and_errors(self):
+        """Test commands reach their handler and failures come back as error replies"""
+        def fail():
+            raise RuntimeError('panel unplugged')
+        server = ControlServer({'status': lambda: {'running': True}, 'update': fail}, self.path).start()
+        try:
+            self.assertEqual(control.call('status', self.path), {'running': True})
+            self.assertEqual(control.call('update', self.path), {'status': 'error', 'message': 'panel unplugged'})
+            self.assertEqual(control.call('reboot', self.path)['status'], 'error')
+        finally:
+            server.stop()
+        self.assertFalse(self.path.exists())
+        with self.assertRaises(ConnectionError):
+            control.call('status', self.path)
+
+class TestDisplayDaemon(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = Path(tempfile.mkdtemp())
+        self.frame_store_mode = web_server.quote_generator.frame_store.mode
+        web_server.quote_generator.frame_store.mode = 'memory'  # Keep the preview out of images/
+        self.daemon = DisplayDaemon(self.test_dir / 'framebuffer', self.test_dir / 'control.sock')
+        with mock.patch.object(web_server, 'start_watcher'):
+            self.daemon.start(updates=False)
+
+    def tearDown(self):
+        self.daemon.stop()
+        web_server.quote_generator.frame_store.mode = self.frame_store_mode
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_update_publishes_the_frame(self):
+        """Test a forced update over the control socket lands in the framebuffer"""
+        path = self.daemon.control.path
+        self.assertEqual(control.call('status', path)['frame'], None)
+        self.assertEqual(control.call('update', path), {'status': 'success'})
+
+        reader = FrameBuffer(self.test_dir / 'framebuffer')
+        frame = reader.read()
+        self.assertTrue(frame.png.startswith(b'\x89PNG'))
+        display_manager = web_server.display_manager
+        self.assertEqual(len(frame.black), display_manager.width * display_manager.height // 8)
+        self.assertEqual(control.call('status', path)['frame'], reader.etag())
+        reader.close()
+
+    def test_concurrent_updates_are_serialized(self):
+        """Test update requests on separate control connections never drive the panel at once"""
+        display_manager = web_server.display_manager._get_instance()
+        display = display_manager.display
+        active, overlaps = [], []
+        def exclusive_display(*planes):
+            overlaps.append(bool(active))
+            active.append(True)
+            try:
+                time.sleep(0.05)  # Give another update the chance to run meanwhile
+                display(*planes)
+            finally:
+                active.pop()
+        path = self.daemon.control.path
+        with mock.patch.object(display_manager, 'display', exclusive_display):
+            replies = []
+            clients = [threading.Thread(target=lambda: replies.append(control.call('update', path)))
+                       for _ in range(3)]
+            for client in clients:
+                client.start()
+            for client in clients:
+                client.join()
+        self.assertEqual(replies, [{'status': 'success'}] * 3)
+        self.assertEqual(overlaps, [False] * 3)
+        self.assertEqual(self.daemon.framebuffer.sequence(), 2 * 3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -90,6 +90,75 @@ class TestDisplayManager(unittest.TestCase):
         # Verify display is updated
         self.assertEqual(self.display.digital_read(self.display.busy_pin), 0)
 
+    def test_convert_image_to_planes(self):
+        """Test red pixels are packed into the red plane and left white in the black plane"""
+        image = Image.new('RGB', (self.display.width, self.display.height), (255, 255, 255))
+        image.putpixel((0, 0), (0, 0, 0))
+        image.putpixel((1, 0), (255, 0, 0))
+        image.putpixel((2, 9), (230, 60, 40))
+        black, red = self.display.convert_image_to_planes(image)
+        self.assertEqual(black.tolist(), self.display.convert_image_to_bytes(image.convert('L').point(
+            lambda value: 0 if value == 0 else 255)))
+        self.assertEqual(black[0], 0xFE)
+        self.assertEqual(red[1], 0xFE)  # (1, 0): column 1, top row in the lowest bit
+        self.assertEqual(red[self.display.width + 2], 0xFD)  # (2, 9): second band of rows, bit 1
+        self.assertEqual(int(np.count_nonzero(red != 0xFF)), 2)
+
+    def test_red_plane_upload_skipped(self):
+        """Test the red plane is only uploaded when it changes or the panel was reset or asleep"""
+        self.display.init()
+        plane = self.display.height * self.display.width // 8
+        image = Image.new('RGB', (self.display.width, self.display.height), (255, 255, 255))
+        image.putpixel((5, 5), (255, 0, 0))
+        black, red = self.display.convert_image_to_planes(image)
+
+        def upload(black, red):
+            self.display.spi._buffer = []
+            self.display.display(black, red)
+            return len(self.display.spi._buffer)
+
+        self.assertEqual(upload(black, red), 2 * plane + 3)
+        black[0] = 0x00
+        self.assertEqual(upload(black, red), plane + 2)
+        red = red.copy()
+        red[0] = 0x00
+        self.assertEqual(upload(black, red), 2 * plane + 3)
+        self.display.reset()
+        self.assertEqual(upload(black, red), 2 * plane + 3)
+        self.display.sleep()
+        self.display.init()
+        self.assertEqual(upload(black, red), plane + 3)  # POWER_OFF kept the RAM; POWER_ON again
+        self.display.deep_sleep = True
+        self.display.sleep()
+        self.display.init()
+        self.assertEqual(upload(black, red), 2 * plane + 3)
+
+    def test_red_plane_kept_across_frames(self):
+        """Test frames sent like the update loop does only upload the red plane when it changes"""
+        from datetime import datetime
+        from unittest import mock
+        import web_server
+        from scheduler import PreparedFrame
+        self.display.init()
+        commands = []
+        send_command = self.display.send_command
+        self.display.send_command = lambda command: commands.append(command) or send_command(command)
+
+        def transfer(black_pixel):
+            image = Image.new('RGB', (self.display.width, self.display.height), (255, 255, 255))
+            image.putpixel((3, 3), (255, 0, 0))
+            image.putpixel(black_pixel, (0, 0, 0))
+            frame = PreparedFrame('13:35', 0, image, self.display.convert_image_to_planes(image))
+            with mock.patch.object(web_server, 'display_manager', self.display):
+                web_server.transfer_frame((datetime.now(), frame))
+
+        transfer((10, 10))
+        transfer((11, 10))
+        self.assertEqual(commands.count(0x10), 1)
+        self.assertEqual(commands.count(0x13), 2)
+        self.assertNotIn(0x07, commands)  # No deep sleep between frames
+        self.assertEqual(commands.count(0x04), 1)  # Powered on again after the first POWER_OFF
+
     def test_reset_sequence(self):
         """Test display reset sequence"""
         self.display.reset()
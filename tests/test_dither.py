@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+import unittest
+import os
+import sys
+import numpy as np
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from dither import DIFFUSION_KERNELS, DITHER_MODES, bayer_matrix, blue_noise_matrix, dither
+
+def scalar_diffusion(gray, kernel, levels):
+    """Textbook one-pixel-at-a-time error diffusion"""
+    height, width = gray.shape
+    values = gray.astype(np.float64) * ((levels - 1) / 255.0)
+    result = np.zeros((height, width), dtype=np.uint8)
+    for y in range(height):
+        for x in range(width):
+            level = min(max(round(values[y, x]), 0), levels - 1)
+            result[y, x] = level
+            error = values[y, x] - level
+            for dx, dy, weight in kernel:
+                if 0 <= x + dx < width and y + dy < height:
+                    values[y + dy, x + dx] += error * weight
+    return result
+
+class TestDither(unittest.TestCase):
+    def setUp(self):
+        self.noise = np.random.default_rng(1).integers(0, 256, (37, 53)).astype(np.uint8)
+        self.ramp = np.tile(np.linspace(0, 255, 256).astype(np.uint8), (64, 1))
+
+    def test_threshold_matches_fixed_cutoffs(self):
+        """Test the default mode keeps the original 1-bit and 4-gray cut-offs"""
+        gray = np.array([[0, 63, 64, 127, 128, 129, 191, 192, 255]], dtype=np.uint8)
+        self.assertEqual(dither(gray).tolist(), [[0, 0, 0, 0, 0, 1, 1, 1, 1]])
+        self.assertEqual(dither(gray, levels=4).tolist(), [[0, 0, 1, 1, 2, 2, 2, 3, 3]])
+
+    def test_error_diffusion_matches_scalar(self):
+        """Test the wavefront implementation gives exactly the sequential result"""
+        for mode, kernel in DIFFUSION_KERNELS.items():
+            for levels in (2, 4):
+                np.testing.assert_array_equal(dither(self.noise, mode, levels),
+                                              scalar_diffusion(self.noise, kernel, levels))
+
+    def test_modes_preserve_tone(self):
+        """Test every dithering mode keeps the average gray of a ramp"""
+        for mode in DITHER_MODES:
+            if mode == 'threshold':
+                continue
+            for levels in (2, 4):
+                levels_out = dither(self.ramp, mode, levels)
+                self.assertLessEqual(levels_out.max(), levels - 1)
+                self.assertAlmostEqual(levels_out.mean() / (levels - 1), self.ramp.mean() / 255, delta=0.02,
+                                       msg=(mode, levels))
+        # Pure black and white stay pure
+        for mode in DITHER_MODES:
+            self.assertEqual(dither(np.zeros((8, 8), np.uint8), mode).max(), 0)
+            self.assertEqual(dither(np.full((8, 8), 255, np.uint8), mode, 4).min(), 3)
+
+    def test_threshold_matrices(self):
+        """Test the ordered-dither matrices rank every cell exactly once"""
+        self.assertEqual(sorted(bayer_matrix().ravel()), list(range(64)))
+        matrix = blue_noise_matrix(size=16)
+        self.assertEqual(sorted(matrix.ravel()), list(range(256)))
+        np.testing.assert_array_equal(matrix, blue_noise_matrix(size=16))
+
+    def test_unknown_mode(self):
+        with self.assertRaises(ValueError):
+            dither(self.noise, 'halftone')
+        with self.assertRaises(ValueError):
+            dither(self.noise, 'bayer', levels=3)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,132 @@
+#!/usr/bin/env python3
+import unittest
+import os
+import sys
+import shutil
+import subprocess
+from pathlib import Path
+from unittest import mock
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from display_backend import UTILS_DIR, Epd13in3bBackend
+sys.path.append(UTILS_DIR)
+import epdconfig
+
+class TestEpdconfig(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = Path('test_epdconfig')
+        self.test_dir.mkdir(exist_ok=True)
+        self.model = self.test_dir / 'model'
+        self.cpuinfo = self.test_dir / 'cpuinfo'
+        epdconfig.implementation = None
+        epdconfig._platform = None
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+        epdconfig.implementation = None
+        epdconfig._platform = None
+
+    def detect(self, model=None, cpuinfo=None):
+        for path, text in ((self.model, model), (self.cpuinfo, cpuinfo)):
+            if text is None:
+                path.unlink(missing_ok=True)
+            else:
+                path.write_bytes(text.encode() + b'\x00')
+        return epdconfig.detect_platform(self.model, self.cpuinfo, self.test_dir / 'gpio-x3')
+
+    def test_import_has_no_side_effects(self):
+        """Test importing epdconfig detects nothing and loads no hardware modules"""
+        code = ("import sys; sys.path.append(%r); import epdconfig; "
+                "assert epdconfig.implementation is None and epdconfig._platform is None; "
+                "assert 'subprocess' not in sys.modules and 'gpiozero' not in sys.modules; "
+                "assert 'ctypes' not in sys.modules" % UTILS_DIR)
+        env = dict(os.environ)
+        env.pop('EPD_PLATFORM', None)
+        subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, env=env)
+
+    def test_detect_platform(self):
+        """Test the board is recognised from the device tree model, or /proc/cpuinfo without one"""
+        with mock.patch.dict(os.environ, {'EPD_PLATFORM': ''}):
+            self.assertEqual(self.detect('Raspberry Pi 4 Model B Rev 1.4'), 'raspberrypi')
+            self.assertEqual(self.detect(None, 'Model\t: Raspberry Pi Zero 2 W Rev 1.0\n'), 'raspberrypi')
+            self.assertEqual(self.detect('NVIDIA Jetson Nano Developer Kit'), 'jetsonnano')
+            with self.assertRaises(RuntimeError):
+                self.detect('QEMU Virtual Machine', 'model name\t: Intel(R) Xeon(R)\n')
+
+    def test_platform_from_environment(self):
+        """Test EPD_PLATFORM overrides detection and is checked"""
+        with mock.patch.dict(os.environ, {'EPD_PLATFORM': 'simulator'}):
+            self.assertEqual(self.detect('Raspberry Pi 4 Model B Rev 1.4'), 'simulator')
+        with mock.patch.dict(os.environ, {'EPD_PLATFORM': 'toaster'}):
+            with self.assertRaises(ValueError):
+                self.detect()
+
+    def test_detection_is_deferred_and_cached(self):
+        """Test the platform is set up on first use of a hardware attribute, once"""
+        with mock.patch.dict(os.environ, {'EPD_PLATFORM': 'simulator'}):
+            self.assertIsNone(epdconfig.implementation)
+            self.assertEqual(epdconfig.RST_PIN, 17)
+            implementation = epdconfig.implementation
+            self.assertIsInstance(implementation, epdconfig.Simulator)
+            self.assertEqual(epdconfig.module_init(), 0)
+            self.assertIs(epdconfig.get_implementation(), implementation)
+
+    def test_epd13in3b_backend_on_simulator(self):
+        """Test the Waveshare driver runs end to end on the simulated platform"""
+        from PIL import Image
+        with mock.patch.dict(os.environ, {'EPD_PLATFORM': 'simulator'}):
+            backend = Epd13in3bBackend()
+            backend.init()
+            image = Image.new('RGB', (backend.width, backend.height), (255, 255, 255))
+            image.putpixel((3, 3), (255, 0, 0))
+            plane = backend.width * backend.height // 8
+            backend.display(*backend.convert_image_to_planes(image))
+            self.assertGreaterEqual(epdconfig.SPI.bytes_written, 2 * plane)
+            written = epdconfig.SPI.bytes_written
+            backend.display(*backend.convert_image_to_planes(image))
+            self.assertLess(epdconfig.SPI.bytes_written - written, 2 * plane)  # Red plane skipped
+
+    def test_epd13in3b_red_plane_kept_across_frames(self):
+        """Test frames sent like the update loop does only upload RAM 0x26 when the red plane changes"""
+        from datetime import datetime
+        from PIL import Image
+        import web_server
+        from scheduler import PreparedFrame
+        with mock.patch.dict(os.environ, {'EPD_PLATFORM': 'simulator'}):
+            backend = Epd13in3bBackend()
+            commands = []
+            send_command = backend.epd.send_command
+            backend.epd.send_command = lambda command: commands.append(command) or send_command(command)
+
+            def transfer(red_pixel):
+                image = Image.new('RGB', (backend.width, backend.height), (255, 255, 255))
+                image.putpixel(red_pixel, (255, 0, 0))
+                frame = PreparedFrame('13:35', 0, image, backend.convert_image_to_planes(image))
+                del commands[:]
+                with mock.patch.object(web_server, 'display_manager', backend):
+                    web_server.transfer_frame((datetime.now(), frame))
+                return commands.count(0x26)
+
+            self.assertEqual(transfer((3, 3)), 1)
+            self.assertEqual(transfer((3, 3)), 0)
+            self.assertEqual(transfer((4, 3)), 1)
+            backend.display_partial(Image.new('RGB', (backend.width, backend.height), (255, 255, 255)), 0, 0, 8, 8)
+            self.assertEqual(transfer((4, 3)), 1)  # The partial refresh overwrote RAM 0x26
+            backend.sleep_mode = 0x03
+            backend.sleep()
+            self.assertEqual(transfer((4, 3)), 1)  # Deep sleep mode 2 lost the RAM
+
+    def test_epd13in3b_accepts_numpy_planes(self):
+        """Test the driver takes packed planes as NumPy arrays as well as lists"""
+        import numpy as np
+        with mock.patch.dict(os.environ, {'EPD_PLATFORM': 'simulator'}):
+            backend = Epd13in3bBackend()
+            backend.init()
+            plane = np.full(backend.width * backend.height // 8, 0xFF, dtype=np.uint8)
+            backend.epd.display(plane, plane)
+            backend.epd.display_Base(plane, None)
+            self.assertGreaterEqual(epdconfig.SPI.bytes_written, 4 * len(plane))
+
+if __name__ == '__main__':
+    unittest.main()
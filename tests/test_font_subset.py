@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+import unittest
+import os
+import sys
+import json
+import shutil
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fonts import FontCoverage, SUBSET_FORMAT, SUBSET_MANIFEST, chain_paths, find_font, load_font_set, load_subsets
+from font_subset import build_subsets, corpus_codepoints, have_fonttools
+
+SANS = find_font('DejaVuSans.ttf')
+MONO = find_font('DejaVuSansMono.ttf')
+
+QUOTES = {
+    '00:01': {
+        'time': '00:01',
+        'display_time': 'one minute past midnight',
+        'quote': 'It was one minute past midnight in Zürich — “late”.',
+        'tokens': ['It', 'was', [['one', 'time']], [['minute', 'time']], [['past', 'time']],
+                   [['midnight', 'time']], 'in', 'Zürich', '—', '“late”.'],
+        'book': 'Ærø',
+        'author': 'Brontë',
+        'rating': 'sfw',
+    },
+}
+
+
+class TestFontSubset(unittest.TestCase):
+    def setUp(self):
+        self.subset_dir = Path('test_font_subsets')
+        self.subset_dir.mkdir(exist_ok=True)
+
+    def tearDown(self):
+        shutil.rmtree(self.subset_dir, ignore_errors=True)
+
+    def write_manifest(self, source, subset_path, stat=None):
+        stat = stat or [os.stat(source).st_size, os.stat(source).st_mtime_ns]
+        manifest = {'format': SUBSET_FORMAT,
+                    'fonts': {source: {'subset': subset_path.name, 'source_stat': stat}}}
+        with open(self.subset_dir / SUBSET_MANIFEST, 'w') as f:
+            json.dump(manifest, f)
+
+    def test_corpus_codepoints(self):
+        """Test the corpus characters, ASCII and the info line are all collected"""
+        codepoints = set(corpus_codepoints(QUOTES))
+        for char in 'ü—“”ÆøëZ0123456789:':
+            self.assertIn(ord(char), codepoints, char)
+        self.assertNotIn(ord('\n'), codepoints)
+
+    @unittest.skipUnless(SANS and MONO, "DejaVu fonts are not installed")
+    def test_subset_precedes_full_font(self):
+        """Test a subset is tried first and the full font still draws what it lacks"""
+        # DejaVu Sans Mono stands in for a subset: it has fewer glyphs than DejaVu Sans
+        subset_path = self.subset_dir / 'DejaVuSans-test.ttf'
+        shutil.copy(MONO, subset_path)
+        self.write_manifest(SANS, subset_path)
+
+        subsets = load_subsets(self.subset_dir)
+        self.assertEqual(subsets, {SANS: str(subset_path)})
+        paths = chain_paths('quote', subsets)
+        self.assertEqual(paths[:2], [str(subset_path), SANS])
+
+        fonts = load_font_set(24, subsets=subsets)
+        self.assertEqual(fonts['quote'].path, str(subset_path))
+        mono, sans = FontCoverage.build(MONO), FontCoverage.build(SANS)
+        sans_only = next(chr(codepoint) for codepoint in range(0x2000, 0x3000)
+                         if sans.covers(chr(codepoint)) and not mono.covers(chr(codepoint)))
+        self.assertEqual(fonts.split('quote', f'ab{sans_only}'), [('ab', 'quote'), (sans_only, 'quote+1')])
+        self.assertEqual(fonts['quote+1'].path, SANS)
+
+    @unittest.skipUnless(SANS, "DejaVu fonts are not installed")
+    def test_stale_subsets_are_ignored(self):
+        """Test a subset is not used once its source font has changed or it has gone"""
+        subset_path = self.subset_dir / 'DejaVuSans-test.ttf'
+        shutil.copy(SANS, subset_path)
+        self.write_manifest(SANS, subset_path, stat=[1, 2])
+        self.assertEqual(load_subsets(self.subset_dir), {})
+
+        self.write_manifest(SANS, subset_path)
+        subset_path.unlink()
+        self.assertEqual(load_subsets(self.subset_dir), {})
+        self.assertEqual(load_subsets(self.subset_dir / 'missing'), {})
+
+    @unittest.skipIf(have_fonttools(), "fontTools is installed")
+    def test_build_without_fonttools(self):
+        """Test the build step is skipped rather than failing without fontTools"""
+        self.assertIsNone(build_subsets(QUOTES, self.subset_dir, log=lambda message: None))
+        self.assertFalse((self.subset_dir / SUBSET_MANIFEST).exists())
+
+    @unittest.skipUnless(have_fonttools() and SANS, "fontTools or DejaVu fonts are not installed")
+    def test_subsets_render_like_full_fonts(self):
+        """Test subsets are smaller and draw the corpus text exactly like the full fonts"""
+        manifest = build_subsets(QUOTES, self.subset_dir, log=lambda message: None)
+        self.assertIn(SANS, manifest['fonts'])
+        full = load_font_set(24)
+        subset = load_font_set(24, subsets=load_subsets(self.subset_dir))
+        self.assertNotEqual(subset['quote'].path, full['quote'].path)
+        self.assertLess(os.path.getsize(subset['quote'].path), os.path.getsize(SANS))
+        text = 'It was one minute past midnight in Zürich — “late”. 12:59'
+        for role in ('time', 'quote', 'quote_bold', 'info'):
+            self.assertEqual(subset[role].getlength(text), full[role].getlength(text), role)
+            self.assertEqual(bytes(subset[role].getmask(text)), bytes(full[role].getmask(text)), role)
+
+
+if __name__ == '__main__':
+    unittest.main()
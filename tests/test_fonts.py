@@ -0,0 +1,67 @@
+#!/usr/bin/env python3
+import unittest
+import os
+import shutil
+import sys
+from pathlib import Path
+from PIL import ImageFont
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fonts import FontChain, FontCoverage, FontSet, find_font, load_font_set
+
+SANS = find_font('DejaVuSans.ttf')
+SERIF = find_font('DejaVuSerif.ttf')
+
+@unittest.skipUnless(SANS and SERIF, "DejaVu fonts are not installed")
+class TestFonts(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = Path('test_font_cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def test_coverage_matches_rendering(self):
+        """Test the cmap bitmap agrees with what FreeType draws as .notdef"""
+        coverage = FontCoverage.build(SANS)
+        font = ImageFont.truetype(SANS, 24)
+        notdef = bytes(font.getmask('\U0010FFFD'))
+        for char in 'aZ9é—“€😀中\U0001d60b͸':
+            self.assertEqual(coverage.covers(char), bytes(font.getmask(char)) != notdef, repr(char))
+
+    def test_coverage_is_cached_on_disk(self):
+        """Test the bitmap is written once and read back for an unchanged font"""
+        coverage = FontCoverage.load(SANS, self.cache_dir)
+        cached = list(self.cache_dir.iterdir())
+        self.assertEqual(len(cached), 1)
+        self.assertEqual(FontCoverage.load(SANS, self.cache_dir).bitmap, coverage.bitmap)
+        
+        # A corrupt cache file is rebuilt rather than trusted
+        cached[0].write_bytes(b'junk')
+        self.assertEqual(FontCoverage.load(SANS, self.cache_dir).bitmap, coverage.bitmap)
+
+    def test_chain_falls_back_per_run(self):
+        """Test characters the first font lacks are drawn with the next font that has them"""
+        sans, serif = FontCoverage.build(SANS), FontCoverage.build(SERIF)
+        serif_only = next(chr(codepoint) for codepoint in range(0x2000, 0x3000)
+                          if serif.covers(chr(codepoint)) and not sans.covers(chr(codepoint)))
+        chain = FontChain([SANS, SERIF])
+        self.assertEqual(chain.split(f'ab {serif_only}{serif_only} cd'),
+                         [('ab ', 0), (serif_only * 2 + ' ', 1), ('cd', 0)])
+        # Characters no font has stay in the current run
+        self.assertEqual(chain.split('a中b'), [('a中b', 0)])
+
+    def test_font_set(self):
+        """Test missing role fonts fall back along the chain and fallbacks load on demand"""
+        fonts = load_font_set(24)
+        self.assertEqual(fonts['quote'].path, SANS)
+        self.assertEqual(fonts['time'].size, 48)
+        # DejaVu Sans has no italic; an installed font is used rather than PIL's bitmap font
+        self.assertIsInstance(fonts['info'].path, str)
+        self.assertEqual(fonts['info'].size, 20)
+        runs = fonts.split('quote', 'abc')
+        self.assertEqual(runs, [('abc', 'quote')])
+        self.assertEqual(FontSet({'quote': fonts['quote']}).split('quote', 'abc'), [('abc', 'quote')])
+
+if __name__ == '__main__':
+    unittest.main()
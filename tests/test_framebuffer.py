@@ -0,0 +1,111 @@
+#!/usr/bin/env python3
+import unittest
+import os
+import sys
+import shutil
+import subprocess
+import threading
+from pathlib import Path
+import numpy as np
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from framebuffer import PAYLOAD_OFFSET, SEQUENCE, SEQUENCE_OFFSET, FrameBuffer
+
+class TestFrameBuffer(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = Path('test_framebuffer')
+        self.path = self.test_dir / 'framebuffer'
+        self.writer = FrameBuffer(self.path).create(capacity=64 * 1024)
+        self.reader = FrameBuffer(self.path)
+
+    def tearDown(self):
+        self.writer.close()
+        self.reader.close()
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_publish_and_read(self):
+        """Test a published frame reads back whole, whatever the planes are packed as"""
+        self.assertIsNone(self.reader.read())
+        self.assertIsNone(self.reader.etag())
+        black = np.arange(100, dtype=np.uint8)
+        self.writer.publish('13:35', black, [1, 2, 3], b'\x89PNG')
+        frame = self.reader.read()
+        self.assertEqual(frame.time_key, '13:35')
+        self.assertEqual(frame.black, black.tobytes())
+        self.assertEqual(frame.red, b'\x01\x02\x03')
+        self.assertEqual(frame.png, b'\x89PNG')
+
+        self.writer.publish('13:36', b'\x00' * 10)
+        frame = self.reader.read()
+        self.assertIsNone(frame.red)
+        self.assertEqual(frame.png, b'')
+        with self.assertRaises(ValueError):
+            self.writer.publish('13:37', b'\x00' * (64 * 1024 + 1))
+
+    def test_etag_follows_the_sequence(self):
+        """Test the header alone tells whether a new frame was published"""
+        self.writer.publish('13:35', b'\x00')
+        etag = self.reader.etag()
+        self.assertEqual(self.reader.etag(), etag)
+        self.writer.publish('13:35', b'\x00')
+        self.assertNotEqual(self.reader.etag(), etag)
+
+    def test_torn_reads_are_retried(self):
+        """Test a reader never returns a frame that is being written"""
+        self.writer.publish('13:35', b'\x00' * 10)
+        sequence = self.writer.sequence()
+        SEQUENCE.pack_into(self.writer.map, SEQUENCE_OFFSET, sequence + 1)  # Writer stopped midway
+        with self.assertRaises(TimeoutError):
+            self.reader.read(retries=3)
+        SEQUENCE.pack_into(self.writer.map, SEQUENCE_OFFSET, sequence)
+        self.writer.map[PAYLOAD_OFFSET] = 1  # Payload changed without moving the counter
+        with self.assertRaises(TimeoutError):
+            self.reader.read(retries=3)
+        self.writer.publish('13:36', b'\x01' * 10)
+        self.assertEqual(self.reader.read().black, b'\x01' * 10)
+
+    def test_concurrent_writers(self):
+        """Test frames published from several threads are never read torn"""
+        def publish(value):
+            for _ in range(200):
+                self.writer.publish('13:35', bytes([value]) * 4096, bytes([value]) * 4096, bytes([value]) * 512)
+        writers = [threading.Thread(target=publish, args=(value,)) for value in range(4)]
+        switch_interval = sys.getswitchinterval()
+        sys.setswitchinterval(1e-6)  # Switch threads in the middle of a publish
+        try:
+            for writer in writers:
+                writer.start()
+            while any(writer.is_alive() for writer in writers):
+                frame = self.reader.read()
+                if frame is not None:
+                    self.assertEqual(len(set(frame.black + frame.red + frame.png)), 1)
+            for writer in writers:
+                writer.join()
+        finally:
+            sys.setswitchinterval(switch_interval)
+        self.assertEqual(self.writer.sequence(), 2 * 4 * 200)
+
+    def test_reader_follows_a_restarted_daemon(self):
+        """Test a reader maps the new framebuffer once the daemon recreates it"""
+        self.writer.publish('13:35', b'\x00')
+        old = self.reader.etag()
+        self.writer.close()
+        self.writer = FrameBuffer(self.path).create(capacity=1024)
+        self.assertIsNone(self.reader.etag())
+        self.writer.publish('13:35', b'\x00')
+        self.assertNotEqual(self.reader.etag(), old)
+        self.assertEqual(self.reader.read().black, b'\x00')
+
+    def test_read_from_another_process(self):
+        """Test another process sees the frame through its own mapping"""
+        self.writer.publish('13:35', b'\x07' * 5, None, b'png')
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        code = ("import sys; sys.path.insert(0, %r); from framebuffer import FrameBuffer; "
+                "frame = FrameBuffer(%r).read(); "
+                "assert (frame.time_key, frame.black, frame.png) == ('13:35', b'\\x07' * 5, b'png')"
+                % (root, str(self.path.resolve())))
+        subprocess.run([sys.executable, '-c', code], check=True, capture_output=True)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+import unittest
+import os
+import sys
+import shutil
+from datetime import datetime
+from pathlib import Path
+from PIL import Image, ImageDraw, ImageFont
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from fonts import find_font
+from glyph_atlas import AtlasRenderer, GlyphAtlas, atlas_path
+from quote_generator import QuoteGenerator
+
+SANS = find_font('DejaVuSans.ttf')
+BOLD = find_font('DejaVuSans-Bold.ttf')
+# Kerning pairs, overlapping glyphs ('rf'), punctuation and accents
+TEXT = 'AVATAR “WAVE” Fletcher fearful — 1:35 P.M. in Zürich, ffi'
+
+@unittest.skipUnless(SANS and BOLD, "DejaVu fonts are not installed")
+class TestGlyphAtlas(unittest.TestCase):
+    def setUp(self):
+        self.cache_dir = Path('test_glyph_atlas')
+        self.renderer = AtlasRenderer(self.cache_dir)
+        self.font = ImageFont.truetype(SANS, 40)
+
+    def tearDown(self):
+        shutil.rmtree(self.cache_dir, ignore_errors=True)
+
+    def assertSameAsImageDraw(self, mode, background, fill, xy, text=TEXT, font=None):
+        font = font or self.font
+        expected = Image.new(mode, (1000, 80), background)
+        actual = expected.copy()
+        ImageDraw.Draw(expected).text(xy, text, font=font, fill=fill)
+        self.renderer.draw_text(actual, xy, text, font, fill)
+        self.assertEqual(actual.tobytes(), expected.tobytes(), (mode, background, fill, xy))
+
+    def test_matches_image_draw(self):
+        """Test atlas text is pixel-identical to ImageDraw.text, including fractional and clipped positions"""
+        for xy in ((10, 10), (10.3, 10), (10.5, 10), (-7.6, -12), (900.25, 60)):
+            self.assertSameAsImageDraw('RGB', (255, 255, 255), (0, 0, 0), xy)
+            self.assertSameAsImageDraw('RGB', (200, 180, 30), (90, 20, 200), xy)
+            self.assertSameAsImageDraw('L', 200, 60, xy)
+            self.assertSameAsImageDraw('1', 1, 0, xy)
+        self.assertSameAsImageDraw('RGB', 'white', 'black', (3, 4), font=ImageFont.truetype(BOLD, 48))
+
+    def test_falls_back_to_image_draw(self):
+        """Test runs the atlas cannot reproduce are drawn by ImageDraw.text"""
+        self.assertSameAsImageDraw('RGB', 'white', 'black', (10, 10.5))
+        self.assertSameAsImageDraw('RGB', 'white', 'black', (10, 10), text='two\nlines')
+        self.assertSameAsImageDraw('RGB', 'white', 'black', (10, 10), font=ImageFont.load_default())
+        self.assertSameAsImageDraw('RGBA', (255, 255, 255, 255), (0, 0, 0, 255), (10, 10))
+
+    def test_atlas_round_trip(self):
+        """Test an atlas is stored on disk when built and read back unchanged"""
+        for mode in ('L', '1'):
+            atlas = GlyphAtlas(self.font, mode)
+            atlas.add(TEXT)
+            atlas.compose(TEXT)  # Fills in the kerning pairs
+            loaded = GlyphAtlas.from_bytes(self.font, mode, atlas.to_bytes())
+            self.assertEqual(loaded.advances, atlas.advances)
+            self.assertEqual(loaded.kerning, atlas.kerning)
+            mask, left, top = loaded.compose(TEXT, 0.5)
+            expected, expected_left, expected_top = atlas.compose(TEXT, 0.5)
+            self.assertEqual((mask.tobytes(), left, top), (expected.tobytes(), expected_left, expected_top))
+
+        renderer = AtlasRenderer(self.cache_dir, preload='xyz')
+        atlas = renderer.atlas(self.font, '1')
+        self.assertTrue(atlas_path(self.font, '1', self.cache_dir).exists())
+        self.assertEqual(set(AtlasRenderer(self.cache_dir).atlas(self.font, '1').glyphs), {'x', 'y', 'z'})
+
+    def test_quote_generator_frames(self):
+        """Test frames drawn from atlases are identical to frames drawn by FreeType"""
+        generator = QuoteGenerator()
+        generator.atlas_renderer = AtlasRenderer(self.cache_dir)
+        for hour, minute in ((0, 0), (7, 15), (13, 35), (23, 59)):
+            now = datetime(2024, 1, 1, hour, minute)
+            generator.config['text_renderer'] = 'freetype'
+            expected = generator.create_image(now)
+            generator.config['text_renderer'] = 'atlas'
+            self.assertEqual(generator.create_image(now).tobytes(), expected.tobytes(), now)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+import unittest
+import os
+import shutil
+import sys
+from pathlib import Path
+from PIL import Image, ImageDraw
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from layout import Layout, LayoutCache, compute_layout, layout_key
+from quote_text import prepare_quotes
+from quote_generator import QuoteGenerator
+
+QUOTE = {
+    'display_time': '1:35 P.M.',
+    'quote': 'Fletcher checked his watch again. It was 1:35 P.M. He sighed and asked the receptionist '
+             'if he could use the washroom, then sat back down and waited for the lift to arrive.',
+    'book': 'Sons of Fortune',
+    'author': 'Jeffrey Archer',
+    'rating': 'sfw'
+}
+
+class TestLayout(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = Path('test_layout_data')
+        self.test_dir.mkdir(exist_ok=True)
+        self.generator = QuoteGenerator()
+        self.fonts = self.generator.load_fonts()
+
+    def tearDown(self):
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def layout(self, quote_data=QUOTE, **params):
+        return compute_layout(quote_data, self.fonts, **dict(dict(width=960, height=680, font_size=24), **params))
+
+    def test_compute_layout(self):
+        """Test the layout places the time, wrapped quote lines and info line"""
+        layout = self.layout(width=400)
+        roles = [run[0] for run in layout.runs]
+        self.assertEqual(roles[0], 'time')
+        self.assertGreater(roles.count('quote'), 1)
+        self.assertEqual(layout.runs[-1], ('info', layout.runs[-1][1], 580, 'Sons of Fortune by Jeffrey Archer'))
+        self.assertEqual(self.layout(width=400), layout)
+        self.assertEqual([run[0] for run in self.layout(show_book_info=False).runs][-1], 'quote')
+
+    def tokenized(self, **fields):
+        quote = dict(QUOTE, **fields)
+        prepare_quotes({'13:35': quote})
+        return quote
+
+    def test_time_phrase_is_bold(self):
+        """Test the time phrase found at ingest is laid out in the bold quote font"""
+        quote = self.tokenized()
+        layout = self.layout(quote_data=quote)
+        bold = [run[3] for run in layout.runs if run[0] == 'quote_bold']
+        self.assertEqual(bold, ['1:35 P.M.'])
+        lines = {}
+        for role, _, y, text in layout.runs:
+            if role in ('quote', 'quote_bold'):
+                lines[y] = lines.get(y, '') + text
+        self.assertIn('It was 1:35 P.M. He sighed', ' '.join(lines.values()))
+        self.assertEqual(self.layout(quote_data=quote, highlight_time=False), self.layout())
+
+    def test_hard_breaks_and_emphasis(self):
+        """Test <br/> starts a new line and emphasized words use the emphasis font"""
+        quote = self.tokenized(quote='It was <i>late</i>.<br/>Very late.')
+        layout = self.layout(quote_data=quote)
+        quote_runs = [run for run in layout.runs if run[0].startswith('quote')]
+        self.assertEqual([(run[0], run[3]) for run in quote_runs],
+                         [('quote', 'It was '), ('quote_em', 'late'), ('quote', '.'), ('quote', 'Very late.')])
+        self.assertEqual(quote_runs[-1][2], 150 + 24 + 10)
+        self.assertNotIn('<br/>', ''.join(run[3] for run in layout.runs))
+
+    def test_key_covers_layout_parameters(self):
+        """Test the key changes with every parameter the layout depends on"""
+        key = layout_key(QUOTE, self.fonts, 960, 680, 24)
+        self.assertEqual(key, layout_key(dict(QUOTE), self.fonts, 960, 680, 24))
+        self.assertNotEqual(key, layout_key(QUOTE, self.fonts, 960, 680, 30))
+        self.assertNotEqual(key, layout_key(QUOTE, self.fonts, 800, 480, 24))
+        self.assertNotEqual(key, layout_key(QUOTE, self.fonts, 960, 680, 24, show_author=False))
+        self.assertNotEqual(key, layout_key(dict(QUOTE, quote='Other'), self.fonts, 960, 680, 24))
+        self.assertNotEqual(key, layout_key(self.tokenized(), self.fonts, 960, 680, 24))
+
+    def test_replay_matches_direct_drawing(self):
+        """Test drawing a layout restored from JSON gives the same pixels"""
+        layout = self.layout()
+        images = []
+        for replayed in (layout, Layout.from_dict(layout.to_dict())):
+            image = Image.new('RGB', (960, 680), (255, 255, 255))
+            replayed.draw(ImageDraw.Draw(image), self.fonts, (0, 0, 0))
+            images.append(image.tobytes())
+        self.assertEqual(images[0], images[1])
+
+    def test_lru_is_bounded(self):
+        """Test the least recently used layout is evicted first"""
+        cache = LayoutCache(capacity=2)
+        calls = []
+        compute = lambda name: lambda: calls.append(name) or Layout(1, 1, [])
+        cache.get('a', compute('a'))
+        cache.get('b', compute('b'))
+        cache.get('a', compute('a'))
+        cache.get('c', compute('c'))
+        self.assertEqual(len(cache), 2)
+        cache.get('a', compute('a'))
+        cache.get('b', compute('b'))
+        self.assertEqual(calls, ['a', 'b', 'c', 'b'])
+
+    def test_persistence(self):
+        """Test layouts saved to disk are reused by a new cache"""
+        path = self.test_dir / 'layout_cache.json'
+        cache = LayoutCache(path=path)
+        layout = cache.get('key', self.layout)
+        self.assertTrue(cache.save())
+        
+        restored = LayoutCache(path=path)
+        self.assertEqual(restored.get('key', lambda: self.fail('layout was recomputed')), layout)
+        
+        # A corrupt file is ignored rather than breaking rendering
+        path.write_text('{not json')
+        self.assertEqual(len(LayoutCache(path=path)), 0)
+
+    def test_unsaved_layouts_are_flushed(self):
+        """Test layouts not yet saved are written when persisting stops and at exit"""
+        from layout import flush_persisting_caches
+        path = self.test_dir / 'layout_cache.json'
+        cache = LayoutCache(path=path)
+        cache.get('key', self.layout)
+        self.assertFalse(path.exists())  # Within flush_interval of the last save
+        flush_persisting_caches()
+        self.assertEqual(len(LayoutCache(path=path)), 1)
+
+        cache.get('other', lambda: self.layout(font_size=30))
+        cache.persist_to(None)
+        self.assertEqual(len(LayoutCache(path=path)), 2)
+        path.unlink()
+        flush_persisting_caches()  # No longer persisting
+        self.assertFalse(path.exists())
+
+    def test_preview_and_panel_share_layouts(self):
+        """Test rendering the same minute twice reuses the cached layout"""
+        self.generator.create_image()
+        count = len(self.generator.layouts)
+        self.generator.create_image()
+        self.assertEqual(len(self.generator.layouts), count)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+import unittest
+import os
+import sys
+import time
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from metrics import RENDER_SECONDS, Counter, Gauge, Histogram, Registry, process_rss_bytes
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        """Create a fresh registry for each test"""
+        self.registry = Registry()
+
+    def test_counter_with_labels(self):
+        """Test labelled counters render one sample per label set"""
+        counter = self.registry.register(Counter('cache_total', 'Cache lookups', ('cache', 'result')))
+        counter.inc(cache='font', result='hit')
+        counter.inc(2, cache='font', result='miss')
+        self.assertEqual(counter.value(cache='font', result='miss'), 2)
+        output = self.registry.render()
+        self.assertIn('# TYPE cache_total counter', output)
+        self.assertIn('cache_total{cache="font",result="hit"} 1', output)
+        self.assertIn('cache_total{cache="font",result="miss"} 2', output)
+
+    def test_counter_rejects_wrong_labels(self):
+        """Test label names are checked"""
+        counter = Counter('cache_total', 'Cache lookups', ('cache',))
+        with self.assertRaises(ValueError):
+            counter.inc(result='hit')
+
+    def test_histogram_buckets_are_cumulative(self):
+        """Test histogram buckets, sum and count"""
+        histogram = self.registry.register(Histogram('render_seconds', 'Render time', (0.1, 1.0)))
+        for value in (0.05, 0.5, 5.0):
+            histogram.observe(value)
+        output = self.registry.render()
+        self.assertIn('render_seconds_bucket{le="0.1"} 1', output)
+        self.assertIn('render_seconds_bucket{le="1"} 2', output)
+        self.assertIn('render_seconds_bucket{le="+Inf"} 3', output)
+        self.assertIn('render_seconds_sum 5.55', output)
+        self.assertIn('render_seconds_count 3', output)
+
+    def test_histogram_timed_decorator(self):
+        """Test the decorator records one observation per call"""
+        histogram = Histogram('pack_seconds', 'Pack time')
+
+        @histogram.timed
+        def pack(value):
+            return value * 2
+
+        self.assertEqual(pack(21), 42)
+        self.assertEqual(histogram.count, 1)
+
+    def test_render_seconds_cover_a_render(self):
+        """Test the render histogram times the whole of create_image"""
+        from quote_generator import QuoteGenerator
+        generator = QuoteGenerator()
+        generator.create_image()  # Load fonts and quotes first
+        before = RENDER_SECONDS._sum
+        start = time.perf_counter()
+        generator.create_image()
+        elapsed = time.perf_counter() - start
+        self.assertGreaterEqual(RENDER_SECONDS._sum - before, elapsed * 0.9)
+
+    def test_gauge_callback(self):
+        """Test gauges can be computed at scrape time"""
+        gauge = self.registry.register(Gauge('rss_bytes', 'Resident memory', process_rss_bytes))
+        self.assertGreater(gauge.value(), 0)
+        self.assertIn('# TYPE rss_bytes gauge', self.registry.render())
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+import unittest
+import os
+import sys
+import queue
+import threading
+import time
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from pipeline import Pipeline, Stage
+
+class TestPipeline(unittest.TestCase):
+    def setUp(self):
+        self.pipeline = None
+
+    def tearDown(self):
+        if self.pipeline is not None:
+            self.pipeline.stop(timeout=5)
+
+    def test_items_pass_through_in_order(self):
+        """Test each item goes through every stage in order and None drops it"""
+        seen = []
+        self.pipeline = Pipeline([
+            Stage('double', lambda item: None if item == 3 else item * 2),
+            Stage('collect', seen.append),
+        ]).start()
+        for item in range(5):
+            self.pipeline.submit(item)
+        self.pipeline.join()
+        self.assertEqual(seen, [0, 2, 4, 8])
+        stats = self.pipeline.stats()
+        self.assertEqual(stats['double']['processed'], 5)
+        self.assertEqual(stats['collect']['processed'], 4)
+
+    def test_backpressure(self):
+        """Test a stalled stage fills the bounded queues and then blocks the producer"""
+        release = threading.Event()
+        self.pipeline = Pipeline([Stage('render'), Stage('transfer', lambda item: release.wait(5))]).start()
+        self.pipeline.submit(1)  # Picked up by the transfer stage
+        self.pipeline.submit(2, timeout=1)  # Waits in its queue
+        time.sleep(0.05)
+        with self.assertRaises(queue.Full):
+            self.pipeline.submit(3, timeout=0.1)
+        self.assertGreater(self.pipeline.source.blocked_seconds, 0.05)
+        release.set()
+        self.pipeline.join()
+        self.assertEqual(self.pipeline.stats()['transfer']['processed'], 2)
+
+    def test_render_overlaps_refresh(self):
+        """Test the caller renders the next frame while the transfer stage waits on the panel"""
+        busy = 0.1
+        self.pipeline = Pipeline([Stage('render'), Stage('transfer', lambda item: time.sleep(busy))]).start()
+        start = time.perf_counter()
+        for frame in range(4):
+            with self.pipeline.source.busy():
+                time.sleep(busy)  # Rendering
+            self.pipeline.submit(frame)
+        self.pipeline.join()
+        elapsed = time.perf_counter() - start
+        self.assertLess(elapsed, 8 * busy * 0.8)  # Sequential would take 8 * busy
+        stats = self.pipeline.stats()
+        self.assertGreater(stats['render']['utilization'], 0.5)
+        self.assertGreater(stats['transfer']['utilization'], 0.5)
+
+    def test_stage_errors_are_contained(self):
+        """Test an item that fails in a stage is dropped and later items still go through"""
+        seen = []
+        def fail_on_two(item):
+            if item == 2:
+                raise RuntimeError('panel unplugged')
+            return item
+        self.pipeline = Pipeline([Stage('transfer', fail_on_two), Stage('preview', seen.append)]).start()
+        for item in range(4):
+            self.pipeline.submit(item)
+        self.pipeline.join()
+        self.assertEqual(seen, [0, 1, 3])
+        self.assertEqual(self.pipeline.stats()['transfer']['errors'], 1)
+
+    def test_stop_finishes_submitted_items(self):
+        """Test stopping lets queued items finish and ends the stage threads"""
+        seen = []
+        pipeline = Pipeline([Stage('slow', lambda item: time.sleep(0.02) or item), Stage('collect', seen.append)])
+        pipeline.start()
+        for item in range(3):
+            pipeline.submit(item)
+        pipeline.stop(timeout=5)
+        self.assertEqual(seen, [0, 1, 2])
+        self.assertFalse(any(stage.thread.is_alive() for stage in pipeline.stages))
+
+if __name__ == '__main__':
+    unittest.main()
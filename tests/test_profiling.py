@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+import unittest
+import os
+import pstats
+import shutil
+import sys
+import tracemalloc
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from profiling import CycleProfiler
+
+class TestCycleProfiler(unittest.TestCase):
+    def setUp(self):
+        self.profiles_dir = Path('test_data_profiles')
+        self.profiler = CycleProfiler(self.profiles_dir, max_profiles=3)
+
+    def tearDown(self):
+        if self.profiles_dir.exists():
+            shutil.rmtree(self.profiles_dir)
+
+    def work(self):
+        return [str(i) * 10 for i in range(2000)]
+
+    def test_only_armed_cycles_are_profiled(self):
+        """Test the profiler captures exactly the number of armed cycles"""
+        with self.profiler.cycle():
+            self.work()
+        self.assertEqual(self.profiler.list(), [])
+
+        self.profiler.arm(2)
+        for _ in range(3):
+            with self.profiler.cycle():
+                self.work()
+        self.assertEqual(len(self.profiler.list()), 2)
+        self.assertEqual(self.profiler.pending, 0)
+        self.assertFalse(tracemalloc.is_tracing())
+
+    def test_capture_files_and_retention(self):
+        """Test each capture is readable and only the newest captures are kept"""
+        for _ in range(5):
+            with self.profiler.capture('force_update'):
+                self.work()
+        profiles = self.profiler.list()
+        self.assertEqual(len(profiles), 3)
+        self.assertEqual(len(list(self.profiles_dir.iterdir())), 3 * 4)
+
+        newest = profiles[0]
+        self.assertEqual(newest['label'], 'force_update')
+        pstats.Stats(str(self.profiler.path(newest['id'], 'prof')))
+        tracemalloc.Snapshot.load(str(self.profiler.path(newest['id'], 'tracemalloc')))
+        with open(self.profiler.path(newest['id'], 'txt')) as f:
+            self.assertIn('allocation sites', f.read())
+        self.assertIsNone(self.profiler.path(newest['id'], 'json'))
+        self.assertIsNone(self.profiler.path('../etc', 'prof'))
+
+if __name__ == '__main__':
+    unittest.main()
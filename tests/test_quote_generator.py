@@ -93,6 +93,19 @@ class TestQuoteGenerator(unittest.TestCase):
         self.assertEqual(image.size, (self.generator.width, self.generator.height))
         self.assertEqual(image.mode, 'RGB')
 
+    def test_time_color(self):
+        """Test the time phrase is drawn in red when time_color is 'red', by both text renderers"""
+        self.generator.convert_csv_to_json()
+        self.generator.load_quotes()
+        now = datetime(2024, 1, 1, 13, 35)
+        black = self.generator.create_image(now)
+        self.generator.config['time_color'] = 'red'
+        red = self.generator.create_image(now)
+        self.assertNotIn((255, 0, 0), [color for _, color in black.getcolors(65536)])
+        self.assertIn((255, 0, 0), [color for _, color in red.getcolors(65536)])
+        self.generator.config['text_renderer'] = 'atlas'
+        self.assertEqual(self.generator.create_image(now).tobytes(), red.tobytes())
+
     def test_save_image(self):
         """Test saving generated image"""
         image = self.generator.create_image()
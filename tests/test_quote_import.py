@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+import unittest
+import os
+import json
+import time
+import shutil
+import sys
+import threading
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from quote_import import (ImportJobManager, MANIFEST_NAME, normalize_time_key,
+                          parse_quotes_csv, sync_corpus)
+
+class FakeUpload:
+    """Minimal stand-in for werkzeug's FileStorage"""
+    def __init__(self, content):
+        self.content = content
+
+    def save(self, path):
+        with open(path, 'w') as f:
+            f.write(self.content)
+
+class TestQuoteImport(unittest.TestCase):
+    def setUp(self):
+        """Set up a data directory with an existing corpus"""
+        self.test_dir = Path('test_data_import')
+        self.data_dir = self.test_dir / 'data'
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        self.existing = {'12:00': {'display_time': 'noon', 'quote': 'Old quote',
+                                   'book': 'Book', 'author': 'Author', 'rating': 'sfw'}}
+        with open(self.data_dir / 'quotes.json', 'w') as f:
+            json.dump(self.existing, f)
+        self.commits = 0
+
+    def tearDown(self):
+        """Clean up test environment"""
+        if self.test_dir.exists():
+            shutil.rmtree(self.test_dir)
+
+    def on_commit(self):
+        self.commits += 1
+
+    def wait(self, job):
+        deadline = time.time() + 30
+        while job.state not in ('succeeded', 'failed') and time.time() < deadline:
+            time.sleep(0.05)
+        return job
+
+    def test_normalize_time_key(self):
+        """Test time keys are zero padded and validated"""
+        self.assertEqual(normalize_time_key('7:05'), '07:05')
+        self.assertEqual(normalize_time_key('23:59'), '23:59')
+        self.assertIsNone(normalize_time_key('HH:MM'))
+        self.assertIsNone(normalize_time_key('24:00'))
+
+    def test_parse_skips_header_and_keeps_quote_marks(self):
+        """Test the header row is skipped and leading double quotes survive"""
+        csv_path = self.data_dir / 'quotes.csv'
+        with open(csv_path, 'w') as f:
+            f.write("HH:MM|H:MM A.M.|Quote|Book|Author|Rating\n")
+            f.write('13:35|1:35 P.M.|"Hello," she said at 1:35 P.M.|Book|Author|SFW\n')
+            f.write("14:00|2:00 P.M.|Another quote|Book|Author|\n")
+        quotes = parse_quotes_csv(csv_path)
+        self.assertEqual(sorted(quotes), ['13:35', '14:00'])
+        self.assertEqual(quotes['13:35']['quote'], '"Hello," she said at 1:35 P.M.')
+        self.assertEqual(quotes['13:35']['rating'], 'sfw')
+        self.assertEqual(quotes['14:00']['rating'], 'unknown')
+        
+        # Quotes are tokenized once, at ingest, with the time phrase marked
+        self.assertEqual(quotes['13:35']['tokens'][-2:], [[['1:35', 'time']], [['P.M.', 'time']]])
+        self.assertEqual(quotes['14:00']['tokens'], ['Another', 'quote'])
+
+    def test_successful_import_is_committed(self):
+        """Test a good upload replaces the corpus and notifies the server"""
+        manager = ImportJobManager(on_commit=self.on_commit)
+        job = self.wait(manager.submit(
+            FakeUpload("16:00|4:00 P.M.|New quote|Book|Author|sfw\n"), 'new.csv', self.data_dir))
+        self.assertEqual(job.state, 'succeeded', job.message)
+        self.assertEqual(job.progress, 1.0)
+        self.assertEqual(self.commits, 1)
+        with open(self.data_dir / 'quotes.json') as f:
+            self.assertEqual(list(json.load(f)), ['16:00'])
+        self.assertTrue((self.data_dir / 'litclock_annotated.csv').exists())
+
+    def test_commit_waits_for_the_commit_lock(self):
+        """Test the corpus files are only replaced while holding the lock the file watcher takes"""
+        commit_lock = threading.Lock()
+        manager = ImportJobManager(on_commit=self.on_commit, commit_lock=commit_lock)
+        with commit_lock:
+            job = manager.submit(FakeUpload("16:00|4:00 P.M.|New quote|Book|Author|sfw\n"), 'new.csv', self.data_dir)
+            deadline = time.time() + 30
+            while not list((self.data_dir / 'uploads').glob('*.manifest')) and time.time() < deadline:
+                time.sleep(0.05)  # The worker has staged the new corpus
+            time.sleep(0.5)
+            self.assertEqual(job.state, 'running')
+            with open(self.data_dir / 'quotes.json') as f:
+                self.assertEqual(json.load(f), self.existing)
+            self.assertFalse((self.data_dir / MANIFEST_NAME).exists())
+            self.assertFalse((self.data_dir / 'litclock_annotated.csv').exists())
+        self.assertEqual(self.wait(job).state, 'succeeded', job.message)
+        self.assertTrue((self.data_dir / 'litclock_annotated.csv').exists())
+
+    def test_failed_import_leaves_data_untouched(self):
+        """Test a bad upload does not modify the data directory"""
+        manager = ImportJobManager(on_commit=self.on_commit)
+        job = self.wait(manager.submit(FakeUpload("Invalid,CSV,Format\n1,2,3\n"), 'bad.csv', self.data_dir))
+        self.assertEqual(job.state, 'failed')
+        self.assertEqual(self.commits, 0)
+        with open(self.data_dir / 'quotes.json') as f:
+            self.assertEqual(json.load(f), self.existing)
+        self.assertFalse((self.data_dir / 'litclock_annotated.csv').exists())
+        self.assertEqual(list((self.data_dir / 'uploads').iterdir()), [])
+
+    def test_sync_skips_unchanged_source(self):
+        """Test an unchanged CSV is neither parsed nor rewritten"""
+        csv_path = self.data_dir / 'quotes.csv'
+        json_path = self.data_dir / 'quotes.json'
+        manifest_path = self.data_dir / MANIFEST_NAME
+        with open(csv_path, 'w') as f:
+            f.write("13:35|1:35 P.M.|Quote one|Book|Author|sfw\n")
+            f.write("14:00|2:00 P.M.|Quote two|Book|Author|sfw\n")
+
+        diff = sync_corpus(csv_path, json_path, manifest_path)
+        self.assertEqual((len(diff.added), len(diff.removed)), (2, 1))
+        mtime = json_path.stat().st_mtime_ns
+
+        diff = sync_corpus(csv_path, json_path, manifest_path)
+        self.assertTrue(diff.unchanged_source)
+        self.assertEqual(json_path.stat().st_mtime_ns, mtime)
+
+    def test_sync_applies_changed_minutes(self):
+        """Test only added, removed and modified minutes are reported and applied"""
+        csv_path = self.data_dir / 'quotes.csv'
+        json_path = self.data_dir / 'quotes.json'
+        manifest_path = self.data_dir / MANIFEST_NAME
+        with open(csv_path, 'w') as f:
+            f.write("13:35|1:35 P.M.|Quote one|Book|Author|sfw\n")
+            f.write("14:00|2:00 P.M.|Quote two|Book|Author|sfw\n")
+        sync_corpus(csv_path, json_path, manifest_path)
+
+        with open(csv_path, 'w') as f:
+            f.write("13:35|1:35 P.M.|Quote one, revised|Book|Author|sfw\n")
+            f.write("15:00|3:00 P.M.|Quote three|Book|Author|sfw\n")
+        diff = sync_corpus(csv_path, json_path, manifest_path)
+        self.assertEqual(diff.added, ['15:00'])
+        self.assertEqual(diff.removed, ['14:00'])
+        self.assertEqual(diff.modified, ['13:35'])
+
+        with open(json_path) as f:
+            quotes = json.load(f)
+        self.assertEqual(sorted(quotes), ['13:35', '15:00'])
+        self.assertEqual(quotes['13:35']['quote'], 'Quote one, revised')
+
+    def test_reimport_of_same_upload_is_a_no_op(self):
+        """Test uploading the current corpus again does not reload the server"""
+        manager = ImportJobManager(on_commit=self.on_commit)
+        content = "16:00|4:00 P.M.|New quote|Book|Author|sfw\n"
+        self.wait(manager.submit(FakeUpload(content), 'new.csv', self.data_dir))
+        job = self.wait(manager.submit(FakeUpload(content), 'new.csv', self.data_dir))
+        self.assertEqual(job.state, 'succeeded', job.message)
+        self.assertTrue(job.diff['unchanged_source'])
+        self.assertEqual(self.commits, 1)
+
+if __name__ == '__main__':
+    unittest.main()
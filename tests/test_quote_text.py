@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+import unittest
+import os
+import sys
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from quote_text import missing_glyphs, normalize_inline, normalize_quote, prepare_quotes, quote_tokens, tokenize
+
+def covers(char):
+    return ord(char) < 0x3000
+
+class TestQuoteText(unittest.TestCase):
+    def test_markup_and_entities(self):
+        """Test every <br> spelling becomes a break and entities and stray tags are resolved"""
+        text, _ = normalize_quote('One<br>two<br/>three<br />four &amp; <time/>five</time> &ldquo;six&rdquo;')
+        self.assertEqual(text, 'One\ntwo\nthree\nfour & five “six”')
+        self.assertEqual(normalize_inline('<time/>one</time>'), 'one')
+
+    def test_nfc(self):
+        """Test decomposed accents are composed"""
+        text, _ = normalize_quote('Café at noon')
+        self.assertEqual(text, 'Café at noon')
+
+    def test_emphasis(self):
+        """Test <i> tags and mathematical italic letters become emphasized plain text"""
+        text, emphasis = normalize_quote('read <i>War</i> and 𝘗𝘦𝘢')
+        self.assertEqual(text, 'read War and Pea')
+        self.assertEqual(tokenize(text, emphasis), ['read', [['War', 'em']], 'and', [['Pea', 'em']]])
+
+    def test_tokenize(self):
+        """Test breaks are kept as tokens and the time span splits words into pieces"""
+        text, emphasis = normalize_quote('At noon,<br/><br/>she left')
+        self.assertEqual(tokenize(text, emphasis, [3, 7]),
+                         ['At', [['noon', 'time'], [',', '']], '\n', '\n', 'she', 'left'])
+
+    def test_prepare_quotes(self):
+        """Test ingest normalizes display times, marks the phrase and flags missing glyphs"""
+        quotes = {
+            '13:00': {'display_time': '<time/>one</time>', 'quote': 'At One&nbsp;it rang'},
+            '14:00': {'display_time': 'two', 'quote': 'Two 中'},
+        }
+        self.assertEqual(prepare_quotes(quotes, covers), 1)
+        self.assertEqual(quotes['13:00']['display_time'], 'one')
+        self.assertEqual(quotes['13:00']['tokens'], ['At', [['One', 'time']], 'it', 'rang'])
+        self.assertEqual(quotes['14:00']['missing_glyphs'], '中')
+        self.assertNotIn('missing_glyphs', quotes['13:00'])
+
+    def test_missing_glyphs(self):
+        """Test each uncovered character is reported once, ignoring spaces and marks"""
+        self.assertEqual(missing_glyphs('It’s — café 中\U0001d60b 中\u200b', covers), '中\U0001d60b')
+
+    def test_untokenized_quotes(self):
+        """Test quotes that never went through ingest are tokenized on demand"""
+        self.assertEqual(quote_tokens({'quote': 'a<br/>b'}), ['a', '\n', 'b'])
+        self.assertEqual(quote_tokens({'quote': 'x', 'tokens': ['y']}), ['y'])
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+import unittest
+import os
+import json
+import shutil
+import sys
+from datetime import datetime
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from quote_generator import QuoteGenerator
+from scheduler import FrameLookahead, next_boundary
+
+class FakeDisplayManager:
+    """Display manager stand-in that records packing calls"""
+    def __init__(self):
+        self.packed = 0
+        self.dither_modes = []
+
+    def convert_image_to_planes(self, image, dither_mode=None):
+        self.packed += 1
+        self.dither_modes.append(dither_mode)
+        return [0xFF], [0xFF]
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        """Set up a generator with a small corpus and config"""
+        self.test_dir = Path('test_data_scheduler')
+        self.data_dir = self.test_dir / 'data'
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        with open(self.data_dir / 'config.json', 'w') as f:
+            json.dump({'update_interval': 60, 'font_size': 24}, f)
+        with open(self.data_dir / 'quotes.json', 'w') as f:
+            json.dump({
+                '13:35': {'display_time': '1:35 P.M.', 'quote': 'First quote',
+                          'book': 'Book', 'author': 'Author', 'rating': 'sfw'},
+                '13:36': {'display_time': '1:36 P.M.', 'quote': 'Second quote',
+                          'book': 'Book', 'author': 'Author', 'rating': 'sfw'}
+            }, f)
+
+        self.generator = QuoteGenerator()
+        self.generator.data_dir = self.data_dir
+        self.generator.images_dir = self.test_dir / 'images'
+        self.generator.load_config()
+        self.generator.load_quotes()
+        self.display = FakeDisplayManager()
+        self.lookahead = FrameLookahead(self.generator, self.display)
+
+    def tearDown(self):
+        """Clean up test environment"""
+        if self.test_dir.exists():
+            shutil.rmtree(self.test_dir)
+
+    def test_next_boundary(self):
+        """Test boundaries are aligned to the interval from midnight"""
+        now = datetime(2024, 1, 1, 13, 35, 20)
+        self.assertEqual(next_boundary(now, 60), datetime(2024, 1, 1, 13, 36))
+        self.assertEqual(next_boundary(now, 600), datetime(2024, 1, 1, 13, 40))
+        self.assertEqual(next_boundary(datetime(2024, 1, 1, 23, 59, 30), 60),
+                         datetime(2024, 1, 2, 0, 0))
+
+    def test_prepared_frame_is_used(self):
+        """Test a frame prepared for the boundary is handed out without re-rendering"""
+        when = datetime(2024, 1, 1, 13, 36)
+        prepared = self.lookahead.prepare(when)
+        frame = self.lookahead.take(when)
+        self.assertIs(frame, prepared)
+        self.assertEqual(self.display.packed, 1)
+        self.assertEqual(self.lookahead.hits, 1)
+        self.assertIsNone(self.lookahead.frame)
+
+    def test_wrong_minute_renders_again(self):
+        """Test a frame prepared for another minute is not displayed"""
+        self.lookahead.prepare(datetime(2024, 1, 1, 13, 35))
+        frame = self.lookahead.take(datetime(2024, 1, 1, 13, 36))
+        self.assertEqual(frame.time_key, '13:36')
+        self.assertEqual(self.lookahead.misses, 1)
+
+    def test_config_change_invalidates(self):
+        """Test config or quote changes that affect the frame invalidate the lookahead"""
+        when = datetime(2024, 1, 1, 13, 36)
+        prepared = self.lookahead.prepare(when)
+        with open(self.data_dir / 'config.json', 'w') as f:
+            json.dump({'update_interval': 60, 'font_size': 30}, f)
+        self.generator.load_config()
+        self.assertIsNot(self.lookahead.take(when), prepared)
+
+        prepared = self.lookahead.prepare(when)
+        quotes = dict(self.generator.quotes)
+        quotes['13:36'] = dict(quotes['13:36'], author='Someone else')
+        self.generator.set_quotes(quotes)
+        self.assertIsNot(self.lookahead.take(when), prepared)
+
+    def test_dither_mode_repacks(self):
+        """Test frames are packed with the configured dither mode and repacked when it changes"""
+        when = datetime(2024, 1, 1, 13, 36)
+        prepared = self.lookahead.prepare(when)
+        impact = self.generator.set_config(dict(self.generator.config, dither_mode='atkinson'))
+        self.assertFalse(impact.refresh_preview)
+        self.assertIsNot(self.lookahead.take(when), prepared)
+        self.assertEqual(self.display.dither_modes, ['threshold', 'atkinson'])
+
+    def test_unaffecting_reload_keeps_frame(self):
+        """Test reloading unchanged files or changing only the interval keeps the frame"""
+        when = datetime(2024, 1, 1, 13, 36)
+        prepared = self.lookahead.prepare(when)
+        self.generator.load_config()
+        self.generator.load_quotes()
+        self.generator.set_config(dict(self.generator.config, update_interval=120))
+        self.assertIs(self.lookahead.take(when), prepared)
+
+    def test_corpus_reload_keeps_unaffected_frame(self):
+        """Test a reload that leaves the prepared minute alone keeps its frame"""
+        when = datetime(2024, 1, 1, 13, 36)
+        prepared = self.lookahead.prepare(when)
+        quotes = dict(self.generator.quotes)
+        quotes['13:35'] = dict(quotes['13:35'], quote='Revised first quote')
+
+        generation = self.generator.generation
+        changed = self.generator.set_quotes(quotes)
+        self.assertEqual(changed, {'13:35'})
+        self.assertTrue(self.lookahead.retain(generation, changed))
+        self.assertIs(self.lookahead.take(when), prepared)
+
+        prepared = self.lookahead.prepare(when)
+        quotes = dict(quotes)
+        del quotes['13:36']
+        generation = self.generator.generation
+        changed = self.generator.set_quotes(quotes)
+        self.assertFalse(self.lookahead.retain(generation, changed))
+        self.assertIsNot(self.lookahead.take(when), prepared)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+import unittest
+import os
+import sys
+import shutil
+import socket
+import tempfile
+import threading
+import time
+import subprocess
+from pathlib import Path
+from unittest import mock
+import requests
+from werkzeug.serving import make_server
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import sd_daemon
+import web_server
+
+class FakeNotifySocket:
+    """Stands in for systemd's notification socket"""
+
+    def __init__(self, path):
+        self.path = path
+        self.sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        self.sock.bind(str(path))
+        self.sock.settimeout(5)
+
+    def receive(self, timeout=5):
+        self.sock.settimeout(timeout)
+        return self.sock.recv(4096).decode()
+
+    def pending(self):
+        self.sock.setblocking(False)
+        try:
+            return self.sock.recv(4096).decode()
+        except BlockingIOError:
+            return None
+        finally:
+            self.sock.setblocking(True)
+
+    def close(self):
+        self.sock.close()
+
+class TestSdDaemon(unittest.TestCase):
+    def setUp(self):
+        # Unix socket paths are limited to about 100 characters
+        self.test_dir = Path(tempfile.mkdtemp())
+        self.systemd = FakeNotifySocket(self.test_dir / 'notify')
+        self.environ = mock.patch.dict(os.environ, {'NOTIFY_SOCKET': str(self.systemd.path)})
+        self.environ.start()
+
+    def tearDown(self):
+        self.environ.stop()
+        self.systemd.close()
+        shutil.rmtree(self.test_dir, ignore_errors=True)
+
+    def test_notify(self):
+        """Test notifications reach the socket and are skipped without one"""
+        self.assertTrue(sd_daemon.notify('READY=1'))
+        self.assertEqual(self.systemd.receive(), 'READY=1')
+        with mock.patch.dict(os.environ, {'NOTIFY_SOCKET': ''}):
+            self.assertFalse(sd_daemon.notify('READY=1'))
+
+    def test_abstract_notify_socket(self):
+        """Test an '@' address is taken from the abstract namespace"""
+        name = f'quote_clock_test_{os.getpid()}'
+        with socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM) as sock:
+            sock.bind('\0' + name)
+            with mock.patch.dict(os.environ, {'NOTIFY_SOCKET': '@' + name}):
+                sd_daemon.notify('STATUS=rendering')
+            self.assertEqual(sock.recv(4096), b'STATUS=rendering')
+
+    def test_watchdog(self):
+        """Test the watchdog pings at half the interval, and only while healthy"""
+        healthy = threading.Event()
+        healthy.set()
+        with mock.patch.dict(os.environ, {'WATCHDOG_USEC': '100000', 'WATCHDOG_PID': str(os.getpid())}):
+            watchdog = sd_daemon.start_watchdog(healthy.is_set)
+        try:
+            self.assertEqual(watchdog.interval, 0.1)
+            self.assertEqual(self.systemd.receive(), 'WATCHDOG=1')
+            healthy.clear()
+            time.sleep(0.06)
+            while self.systemd.pending():
+                pass  # Pings sent before the change
+            with self.assertRaises(socket.timeout):
+                self.systemd.receive(timeout=0.3)
+        finally:
+            watchdog.stop()
+        with mock.patch.dict(os.environ, {'WATCHDOG_USEC': '100000', 'WATCHDOG_PID': '1'}):
+            self.assertIsNone(sd_daemon.start_watchdog())
+
+    def test_listen_fds(self):
+        """Test a socket passed as fd 3 is found, only by the process it is meant for"""
+        with mock.patch.dict(os.environ, {'LISTEN_PID': '1', 'LISTEN_FDS': '1'}):
+            self.assertEqual(sd_daemon.listen_fds(), [])
+            self.assertNotIn('LISTEN_FDS', os.environ)
+
+        listener = socket.create_server(('127.0.0.1', 0))
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        # The child first does what systemd does between fork and exec
+        code = ("import os, socket, sys; sys.path.insert(0, %r); import sd_daemon; "
+                "os.dup2(int(sys.argv[1]), 3); os.environ.update(LISTEN_PID=str(os.getpid()), LISTEN_FDS='1'); "
+                "fds = sd_daemon.listen_fds(); assert 'LISTEN_FDS' not in os.environ; "
+                "conn, _ = socket.socket(fileno=fds[0]).accept(); conn.sendall(str(fds).encode())" % root)
+        child = subprocess.Popen([sys.executable, '-c', code, str(listener.fileno())],
+                                 pass_fds=(listener.fileno(),))
+        try:
+            with socket.create_connection(listener.getsockname(), timeout=10) as conn:
+                self.assertEqual(conn.recv(64), b'[3]')
+            self.assertEqual(child.wait(timeout=10), 0)
+        finally:
+            child.kill()
+            listener.close()
+
+    def test_server_on_inherited_socket(self):
+        """Test the web server serves on a socket it did not bind itself"""
+        listener = socket.create_server(('127.0.0.1', 0))
+        server = make_server('0.0.0.0', 5001, web_server.app, threaded=True, fd=listener.fileno())
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        try:
+            host, port = listener.getsockname()
+            response = requests.get(f'http://{host}:{port}/metrics', timeout=10)
+            self.assertEqual(response.status_code, 200)
+        finally:
+            server.shutdown()
+            server.server_close()
+            listener.close()
+
+    def test_ready_after_first_frame_on_panel(self):
+        """Test READY=1 waits for the first panel update, and the watchdog starts after it"""
+        frame_store_mode = web_server.quote_generator.frame_store.mode
+        web_server.quote_generator.frame_store.mode = 'memory'  # Keep the preview out of images/
+        web_server.frame_listeners.append(web_server.notify_ready)
+        try:
+            web_server.quote_generator.create_image()  # Rendering alone is not enough
+            self.assertIsNone(self.systemd.pending())
+            with mock.patch.dict(os.environ, {'WATCHDOG_USEC': '200000'}):
+                web_server.update_now()
+            self.assertEqual(self.systemd.receive(), 'READY=1')
+            self.assertEqual(self.systemd.receive(), 'WATCHDOG=1')
+            self.assertNotIn(web_server.notify_ready, web_server.frame_listeners)
+        finally:
+            if web_server.notify_ready in web_server.frame_listeners:
+                web_server.frame_listeners.remove(web_server.notify_ready)
+            if web_server.watchdog is not None:
+                web_server.watchdog.stop()
+                web_server.watchdog = None
+            web_server.quote_generator.frame_store.mode = frame_store_mode
+
+    def test_web_server_with_daemon_ready_after_published_frame(self):
+        """Test in display daemon mode the web server waits for a running daemon's first frame"""
+        from control import ControlServer
+        from framebuffer import FrameBuffer
+        writer = FrameBuffer(self.test_dir / 'framebuffer').create(capacity=1024)
+        writer.publish('13:34', b'\x00' * 8)  # Left behind by a daemon that has died
+        daemon = ControlServer({'status': lambda: {'frame': FrameBuffer(writer.path).etag()}},
+                               self.test_dir / 'control.sock')
+        frame_store_mode = web_server.quote_generator.frame_store.mode
+        web_server.quote_generator.frame_store.mode = 'memory'  # Keep the preview out of images/
+        web_server.frame_listeners.append(web_server.notify_ready)
+        try:
+            with mock.patch.object(web_server, 'daemon_mode', True), \
+                    mock.patch.object(web_server, 'framebuffer', FrameBuffer(writer.path)), \
+                    mock.patch.object(web_server, 'control_socket', daemon.path), \
+                    mock.patch.object(web_server, 'start_watcher'), \
+                    mock.patch.object(web_server, 'update_now') as update_now:
+                warm_up = threading.Thread(target=web_server.warm_up)
+                warm_up.start()
+                self.assertTrue(self.systemd.receive().startswith('STATUS='))
+                with self.assertRaises(socket.timeout):
+                    self.systemd.receive(timeout=1)  # A stale frame and no daemon to vouch for it
+                writer.close()
+                writer = FrameBuffer(writer.path).create(capacity=1024)  # The daemon starts
+                daemon.start()
+                with self.assertRaises(socket.timeout):
+                    self.systemd.receive(timeout=1)  # Nothing on the panel yet
+                writer.publish('13:35', b'\x00' * 8)
+                self.assertEqual(self.systemd.receive(), 'READY=1')
+                warm_up.join(timeout=5)
+                update_now.assert_not_called()  # The panel is the daemon's
+        finally:
+            daemon.stop()
+            if web_server.notify_ready in web_server.frame_listeners:
+                web_server.frame_listeners.remove(web_server.notify_ready)
+            web_server.quote_generator.frame_store.mode = frame_store_mode
+            writer.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+import unittest
+import os
+import sys
+import subprocess
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from startup import LazyObject, StartupTimer
+
+class Widget:
+    def __init__(self):
+        self.size = 1
+
+    def grow(self):
+        self.size += 1
+        return self.size
+
+class TestStartup(unittest.TestCase):
+    def test_lazy_object_builds_on_first_use(self):
+        """Test the factory only runs when the proxy is first used"""
+        calls = []
+        lazy = LazyObject(lambda: calls.append(1) or Widget())
+        self.assertFalse(lazy.is_ready)
+        self.assertEqual(calls, [])
+
+        self.assertEqual(lazy.grow(), 2)
+        lazy.size = 10
+        self.assertEqual(lazy.size, 10)
+        self.assertTrue(lazy.is_ready)
+        self.assertEqual(calls, [1])
+
+    def test_lazy_object_ready_callback(self):
+        """Test the ready callback fires once"""
+        ready = []
+        lazy = LazyObject(Widget, lambda: ready.append(True))
+        lazy.grow()
+        lazy.grow()
+        self.assertEqual(ready, [True])
+
+    def test_startup_timer_marks_once(self):
+        """Test each phase is recorded the first time only"""
+        timer = StartupTimer()
+        timer.mark('port bound')
+        first = timer.phases['port bound']
+        timer.mark('port bound')
+        self.assertEqual(timer.phases['port bound'], first)
+        self.assertIn('port bound', timer.to_dict())
+
+    def test_web_server_import_is_light(self):
+        """Test importing the web server defers pandas and the hardware/corpus setup"""
+        root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+        code = ("import sys, web_server; "
+                "assert 'pandas' not in sys.modules; "
+                "assert 'display_manager' not in sys.modules; "
+                "assert not web_server.quote_generator.is_ready")
+        subprocess.run([sys.executable, '-c', code], cwd=root, check=True, capture_output=True)
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+import unittest
+import os
+import json
+import shutil
+import sys
+from pathlib import Path
+from PIL import Image
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from storage import FrameStore, write_file_atomic, write_json_atomic
+from metrics import BYTES_WRITTEN_TODAY, STORAGE_BYTES_WRITTEN, STORAGE_WRITES_SKIPPED
+
+class TestStorage(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = Path('test_data_storage')
+        self.test_dir.mkdir(exist_ok=True)
+
+    def tearDown(self):
+        if self.test_dir.exists():
+            shutil.rmtree(self.test_dir)
+
+    def test_atomic_write_counts_bytes(self):
+        """Test atomic writes replace the file, leave no temp files and are counted"""
+        path = self.test_dir / 'config.json'
+        before = STORAGE_BYTES_WRITTEN.value(kind='config')
+        today = BYTES_WRITTEN_TODAY.value()
+        write_json_atomic(path, {'font_size': 24}, kind='config')
+        write_json_atomic(path, {'font_size': 30}, kind='config')
+        with open(path) as f:
+            self.assertEqual(json.load(f), {'font_size': 30})
+        self.assertEqual(os.listdir(self.test_dir), ['config.json'])
+        written = STORAGE_BYTES_WRITTEN.value(kind='config') - before
+        self.assertEqual(written, 2 * path.stat().st_size)
+        self.assertEqual(BYTES_WRITTEN_TODAY.value() - today, written)
+
+        # Uncounted writes leave the metrics alone
+        write_file_atomic(path, b'{}')
+        self.assertEqual(STORAGE_BYTES_WRITTEN.value(kind='config') - before, written)
+
+    def test_atomic_write_keeps_the_file_mode(self):
+        """Test a rewritten file keeps its permissions and a new one is readable by all"""
+        path = self.test_dir / 'config.json'
+        write_file_atomic(path, b'{}')
+        self.assertEqual(path.stat().st_mode & 0o777, 0o644)
+        os.chmod(path, 0o640)
+        write_file_atomic(path, b'{"font_size": 30}')
+        self.assertEqual(path.stat().st_mode & 0o777, 0o640)
+
+    def test_unchanged_frames_are_not_rewritten(self):
+        """Test a byte-identical frame is skipped and a changed one is written"""
+        store = FrameStore()
+        path = self.test_dir / 'current_display.png'
+        image = Image.new('RGB', (40, 30), (255, 255, 255))
+        skipped = STORAGE_WRITES_SKIPPED.value(kind='frame')
+
+        self.assertTrue(store.save(image, path))
+        mtime = path.stat().st_mtime_ns
+        self.assertFalse(store.save(image.copy(), path))
+        self.assertEqual(path.stat().st_mtime_ns, mtime)
+        self.assertEqual(STORAGE_WRITES_SKIPPED.value(kind='frame') - skipped, 1)
+
+        image.putpixel((0, 0), (0, 0, 0))
+        self.assertTrue(store.save(image, path))
+        with Image.open(path) as saved:
+            self.assertEqual(saved.getpixel((0, 0)), (0, 0, 0))
+
+        # A deleted preview is written again even if unchanged
+        path.unlink()
+        self.assertTrue(store.save(image, path))
+
+    def test_memory_mode_never_touches_disk(self):
+        """Test in-memory previews are readable but not written to disk"""
+        store = FrameStore('memory')
+        path = self.test_dir / 'current_display.png'
+        before = STORAGE_BYTES_WRITTEN.value(kind='frame')
+        self.assertTrue(store.save(Image.new('RGB', (40, 30)), path))
+        self.assertFalse(path.exists())
+        self.assertTrue(store.exists(path))
+        self.assertTrue(store.read(path).startswith(b'\x89PNG'))
+        self.assertEqual(STORAGE_BYTES_WRITTEN.value(kind='frame'), before)
+        with self.assertRaises(ValueError):
+            FrameStore('flash')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+import unittest
+import os
+import shutil
+import sys
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from benchmarks.synthetic_corpus import SyntheticCorpus, parse_length_distribution, parse_rating_mix
+from quote_import import parse_quotes_csv
+
+class TestSyntheticCorpus(unittest.TestCase):
+    def setUp(self):
+        self.test_dir = Path('test_data_synthetic')
+        self.test_dir.mkdir(exist_ok=True)
+
+    def tearDown(self):
+        if self.test_dir.exists():
+            shutil.rmtree(self.test_dir)
+
+    def test_same_seed_gives_identical_corpus(self):
+        """Test generation is deterministic for a seed and differs across seeds"""
+        first = list(SyntheticCorpus(200, seed=7, unicode_mix=0.5))
+        self.assertEqual(first, list(SyntheticCorpus(200, seed=7, unicode_mix=0.5)))
+        self.assertNotEqual(first, list(SyntheticCorpus(200, seed=8, unicode_mix=0.5)))
+
+    def test_output_parses_as_a_corpus(self):
+        """Test the written file is accepted by the importer"""
+        csv_path = self.test_dir / 'synthetic.csv'
+        self.assertEqual(SyntheticCorpus(500, unicode_mix=0.3, br_rate=0.5).write(csv_path), 500)
+        quotes = parse_quotes_csv(csv_path)
+        self.assertGreater(len(quotes), 0)
+        for quote_data in quotes.values():
+            self.assertIn(quote_data['display_time'].lower(), quote_data['quote'].lower())
+            self.assertIn(quote_data['rating'], ('sfw', 'nsfw', 'unknown'))
+
+    def test_mix_parameters(self):
+        """Test <br/> frequency, rating mix, Unicode mix and duplicate minutes are honoured"""
+        rows = list(SyntheticCorpus(2000, br_rate=0.0, rating_mix='nsfw=1', duplicate_density=0.0))
+        self.assertFalse(any('<br/>' in row[2] for row in rows))
+        self.assertEqual({row[5] for row in rows}, {'nsfw'})
+        self.assertTrue(all(row[2].isascii() for row in rows))
+        # Without duplicates every covered minute is used before any repeats
+        self.assertEqual(len({row[0] for row in rows[:1440]}), 1440)
+
+        rows = list(SyntheticCorpus(1000, br_rate=1.0, unicode_mix=1.0, duplicate_density=0.9, minute_coverage=0.1))
+        self.assertTrue(all('<br/>' in row[2] for row in rows))
+        self.assertFalse(any(row[2].isascii() for row in rows))
+        self.assertLessEqual(len({row[0] for row in rows}), 144)
+
+    def test_parse_specs(self):
+        """Test length distribution and rating mix specs"""
+        sample = parse_length_distribution('fixed:12')
+        self.assertEqual(sample(None), 12)
+        self.assertEqual(parse_rating_mix('sfw=3,unknown=1'), (['sfw', ''], [3.0, 1.0]))
+        with self.assertRaises(ValueError):
+            parse_length_distribution('normal:3')
+        with self.assertRaises(ValueError):
+            parse_rating_mix('safe=1')
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,46 @@
+#!/usr/bin/env python3
+import unittest
+import os
+import sys
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from time_phrase import PhraseMatcher, find_time_span, fold
+
+class TestTimePhrase(unittest.TestCase):
+    def span_text(self, quote, display_time, phrases=()):
+        matcher = PhraseMatcher({fold(phrase)[0] for phrase in (display_time,) + tuple(phrases)})
+        span = find_time_span(matcher, quote, display_time)
+        return quote[span[0]:span[1]] if span else None
+
+    def test_fold_maps_back_to_original(self):
+        """Test folding drops case and accents but keeps offsets into the original"""
+        folded, offsets = fold('Ça SONNE')
+        self.assertEqual(folded, 'ca sonne')
+        self.assertEqual(len(offsets), len(folded))
+        self.assertEqual(offsets[-1], 7)
+
+    def test_matcher_finds_overlapping_phrases(self):
+        """Test the automaton reports every phrase, including ones inside others"""
+        matcher = PhraseMatcher(['midnight', 'one minute after midnight', 'one'])
+        matches = {(start, end, phrase) for start, end, phrase in
+                   matcher.finditer('it was one minute after midnight')}
+        self.assertEqual(matches, {(7, 10, 'one'), (24, 32, 'midnight'), (7, 32, 'one minute after midnight')})
+
+    def test_find_time_span(self):
+        """Test the quote's own phrase is found with case and Unicode folding"""
+        self.assertEqual(self.span_text('One minute after midnight, he left.', 'one minute after midnight',
+                                        ['midnight']), 'One minute after midnight')
+        self.assertEqual(self.span_text('It was 1:35 p.m. sharp', '1:35 P.M.'), '1:35 p.m.')
+        self.assertEqual(self.span_text('À MINUIT, tout dort', 'à minuit'), 'À MINUIT')
+        self.assertEqual(self.span_text('Half past   two', 'half past two'), None)
+        self.assertEqual(self.span_text('Half past\ntwo', 'half past two'), 'Half past\ntwo')
+
+    def test_whole_words_only(self):
+        """Test a phrase is not matched inside a longer word or time"""
+        self.assertIsNone(self.span_text('Someone knocked', 'one'))
+        self.assertEqual(self.span_text('Someone knocked at one', 'one'), 'one')
+        self.assertIsNone(self.span_text("at 110:15 exactly", "10:15"))
+
+if __name__ == '__main__':
+    unittest.main()
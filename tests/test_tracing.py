@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+import unittest
+import os
+import sys
+import time
+import threading
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from tracing import Tracer
+
+class TestTracer(unittest.TestCase):
+    def test_spans_are_recorded_in_a_ring_buffer(self):
+        """Test spans nest, carry args and only the newest are kept"""
+        tracer = Tracer(capacity=3)
+        with tracer.span('outer'):
+            with tracer.span('inner', command='0x13'):
+                time.sleep(0.01)
+        names = [span[0] for span in tracer.spans()]
+        self.assertEqual(names, ['inner', 'outer'])
+        inner, outer = tracer.spans()
+        self.assertEqual(inner[5], {'command': '0x13'})
+        self.assertGreaterEqual(inner[3], 10000000)
+        self.assertLessEqual(outer[2], inner[2])
+        self.assertGreaterEqual(outer[2] + outer[3], inner[2] + inner[3])
+
+        @tracer.traced('pack')
+        def pack():
+            return 42
+        self.assertEqual(pack(), 42)
+        pack()
+        self.assertEqual([span[0] for span in tracer.spans()], ['outer', 'pack', 'pack'])
+
+    def test_chrome_trace_export(self):
+        """Test the export is a valid trace-event document in microseconds"""
+        tracer = Tracer()
+        with tracer.span('busy wait'):
+            time.sleep(0.002)
+        trace = tracer.to_chrome_trace()
+        complete = [event for event in trace['traceEvents'] if event['ph'] == 'X']
+        metadata = [event for event in trace['traceEvents'] if event['ph'] == 'M']
+        self.assertEqual(complete[0]['name'], 'busy wait')
+        self.assertGreaterEqual(complete[0]['dur'], 2000)
+        self.assertEqual(metadata[0]['args']['name'], 'MainThread')
+        tracer.clear()
+        self.assertEqual(tracer.spans(), [])
+
+    def test_thread_names_are_only_kept_for_buffered_spans(self):
+        """Test threads that come and go, like request handlers, are forgotten with their spans"""
+        tracer = Tracer(capacity=4)
+        finished = threading.Barrier(50)  # All alive at once, so no two share an ident
+        handle = tracer.traced('request')(finished.wait)
+        threads = [threading.Thread(target=handle, name=f'request-{request}') for request in range(50)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        with tracer.span('export'):
+            pass
+        metadata = [event for event in tracer.to_chrome_trace()['traceEvents'] if event['ph'] == 'M']
+        self.assertLessEqual(len(metadata), 4)
+        self.assertIn('MainThread', [event['args']['name'] for event in metadata])
+
+if __name__ == '__main__':
+    unittest.main()
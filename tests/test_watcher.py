@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+import unittest
+import os
+import shutil
+import sys
+import time
+import threading
+from pathlib import Path
+
+# Add the parent directory to the Python path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from watcher import DataWatcher
+
+class WatcherTests:
+    """Shared tests run against each watcher backend"""
+    use_inotify = True
+
+    def setUp(self):
+        self.data_dir = Path(f'test_data_watcher_{self.use_inotify}')
+        self.data_dir.mkdir(exist_ok=True)
+        self.changes = []
+        self.called = threading.Event()
+        self.watcher = DataWatcher(self.data_dir, ['config.json', 'quotes.csv'], self.on_change,
+                                   debounce=0.3, poll_interval=0.1, use_inotify=self.use_inotify).start()
+        time.sleep(0.3)
+
+    def tearDown(self):
+        self.watcher.stop()
+        shutil.rmtree(self.data_dir)
+
+    def on_change(self, names):
+        self.changes.append(names)
+        self.called.set()
+
+    def write(self, name, content):
+        # Write and rename into place, like an editor or our own atomic writes
+        tmp_path = self.data_dir / f'.{name}.tmp'
+        tmp_path.write_text(content)
+        os.replace(tmp_path, self.data_dir / name)
+
+    def test_changes_are_debounced_into_one_callback(self):
+        """Test a burst of writes to watched files produces a single callback"""
+        self.write('config.json', '{}')
+        (self.data_dir / 'quotes.csv').write_text('a')
+        time.sleep(0.05)
+        self.write('config.json', '{"font_size": 30}')
+        self.assertTrue(self.called.wait(5))
+        time.sleep(0.5)
+        self.assertEqual(self.changes, [{'config.json', 'quotes.csv'}])
+
+    def test_unwatched_files_are_ignored(self):
+        """Test files outside the watched set never trigger a callback"""
+        (self.data_dir / 'notes.txt').write_text('x')
+        self.assertFalse(self.called.wait(1))
+
+class TestInotifyWatcher(WatcherTests, unittest.TestCase):
+    use_inotify = True
+
+    def test_backend(self):
+        """Test inotify is used where the platform has it"""
+        expected = 'inotify' if os.path.exists('/proc/sys/fs/inotify') else 'polling'
+        self.assertEqual(self.watcher.backend, expected)
+
+class TestPollingWatcher(WatcherTests, unittest.TestCase):
+    use_inotify = False
+
+if __name__ == '__main__':
+    unittest.main()
@@ -9,10 +9,12 @@ import requests
 import threading
 import time
 import sys
+from unittest import mock
 
 # Add the parent directory to the Python path
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
-from web_server import app, quote_generator, display_manager
+from framebuffer import FrameBuffer
+from web_server import app, quote_generator, display_manager, profiler, apply_data_changes
 
 class TestWebServer(unittest.TestCase):
     @classmethod
@@ -55,6 +57,7 @@ class TestWebServer(unittest.TestCase):
         # Configure the QuoteGenerator to use test directories
         quote_generator.data_dir = cls.data_dir
         quote_generator.images_dir = cls.images_dir
+        profiler.profiles_dir = cls.test_dir / 'images' / 'profiles'
         quote_generator.load_config()
         quote_generator.convert_csv_to_json()
         quote_generator.load_quotes()
@@ -124,6 +127,16 @@ class TestWebServer(unittest.TestCase):
         response = requests.get(f'{self.base_url}/api/config')
         self.assertEqual(response.json(), new_config)
 
+    def test_metrics(self):
+        """Test the Prometheus metrics endpoint"""
+        requests.get(f'{self.base_url}/api/display/current-image')
+        response = requests.get(f'{self.base_url}/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response.headers['Content-Type'].startswith('text/plain'))
+        self.assertIn('quote_clock_render_seconds_count', response.text)
+        self.assertIn('quote_clock_process_resident_memory_bytes', response.text)
+        self.assertIn('cache="response"', response.text)
+
     def test_get_quotes(self):
         """Test getting quotes"""
         response = requests.get(f'{self.base_url}/api/quotes')
@@ -153,7 +166,10 @@ class TestWebServer(unittest.TestCase):
         # Clean up the temporary file
         os.unlink(f.name)
         
-        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.status_code, 202)
+        job = self.wait_for_import(response.json()['job_id'])
+        self.assertEqual(job['state'], 'succeeded')
+        self.assertEqual(job['quotes'], len(new_quotes))
         
         # Verify the quotes were updated
         response = requests.get(f'{self.base_url}/api/quotes')
@@ -166,6 +182,10 @@ class TestWebServer(unittest.TestCase):
         response = requests.post(f'{self.base_url}/api/display/start')
         self.assertEqual(response.status_code, 200)
         
+        # The status reports the utilization of each pipeline stage
+        response = requests.get(f'{self.base_url}/api/display/status')
+        self.assertEqual(set(response.json()['pipeline']), {'render', 'transfer', 'preview'})
+        
         # Test stopping the display
         response = requests.post(f'{self.base_url}/api/display/stop')
         self.assertEqual(response.status_code, 200)
@@ -174,6 +194,34 @@ class TestWebServer(unittest.TestCase):
         response = requests.post(f'{self.base_url}/api/display/update')
         self.assertEqual(response.status_code, 200)
 
+    def test_display_daemon_not_running(self):
+        """Test display routes report a missing daemon instead of driving the panel"""
+        with mock.patch('web_server.daemon_mode', True), \
+                mock.patch('web_server.control_socket', self.test_dir / 'missing.sock'), \
+                mock.patch('web_server.framebuffer', FrameBuffer(self.test_dir / 'missing')):
+            response = requests.post(f'{self.base_url}/api/display/update')
+            self.assertEqual(response.status_code, 503)
+            response = requests.get(f'{self.base_url}/api/display/status')
+            self.assertFalse(response.json()['running'])
+            # The preview falls back to one rendered by the server
+            response = requests.get(f'{self.base_url}/api/display/current-image')
+            self.assertEqual(response.status_code, 200)
+
+    def test_display_daemon_takes_effect_on_restart(self):
+        """Test switching display_daemon on at runtime leaves the running update thread in charge"""
+        import web_server
+        with mock.patch('web_server.daemon_mode', None), \
+                mock.patch('web_server.control_socket', self.test_dir / 'missing.sock'):
+            response = requests.post(f'{self.base_url}/api/display/start')
+            self.assertEqual(response.status_code, 200)
+            response = requests.post(f'{self.base_url}/api/config', json=dict(self.test_config, content_filter='all', display_daemon=True))
+            self.assertEqual(response.status_code, 200)
+            response = requests.get(f'{self.base_url}/api/display/status')
+            self.assertTrue(response.json()['running'])
+            response = requests.post(f'{self.base_url}/api/display/stop')
+            self.assertEqual(response.status_code, 200)
+            self.assertFalse(web_server.should_update)
+
     def test_invalid_config(self):
         """Test handling of invalid configuration"""
         invalid_config = {
@@ -204,7 +252,133 @@ class TestWebServer(unittest.TestCase):
         # Clean up the temporary file
         os.unlink(f.name)
         
-        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.status_code, 202)
+        job = self.wait_for_import(response.json()['job_id'])
+        self.assertEqual(job['state'], 'failed')
+        
+        # Verify the existing quotes were left untouched
+        response = requests.get(f'{self.base_url}/api/quotes')
+        self.assertEqual(len(response.json()), len(self.sample_quotes))
+        self.assertFalse(any((self.data_dir / 'uploads').iterdir()))
+
+    def test_profiling(self):
+        """Test capturing, listing and downloading a profile of a forced update"""
+        response = requests.post(f'{self.base_url}/api/display/update?profile=1')
+        self.assertEqual(response.status_code, 200)
+        
+        response = requests.get(f'{self.base_url}/api/profiling')
+        profiles = response.json()['profiles']
+        self.assertEqual(profiles[0]['label'], 'force_update')
+        
+        response = requests.get(f"{self.base_url}/api/profiling/{profiles[0]['id']}/txt")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('create_image', response.text)
+        response = requests.get(f"{self.base_url}/api/profiling/{profiles[0]['id']}/prof")
+        self.assertEqual(response.status_code, 200)
+        response = requests.get(f'{self.base_url}/api/profiling/missing/prof')
+        self.assertEqual(response.status_code, 404)
+        
+        # Arm and disarm profiling of the next update cycles
+        response = requests.post(f'{self.base_url}/api/profiling', json={'cycles': 3})
+        self.assertEqual(response.json()['pending'], 3)
+        response = requests.post(f'{self.base_url}/api/profiling', json={'cycles': 0})
+        self.assertEqual(response.json()['pending'], 0)
+        response = requests.post(f'{self.base_url}/api/profiling', json={'cycles': -1})
+        self.assertEqual(response.status_code, 400)
+
+    def test_profiled_update_cycle_includes_transfer(self):
+        """Test a profiled update cycle captures the panel transfer, not just the render"""
+        profiler.arm(1)
+        requests.post(f'{self.base_url}/api/display/start')
+        try:
+            deadline = time.time() + 60
+            while not [p for p in profiler.list() if p['label'] == 'update'] and time.time() < deadline:
+                time.sleep(0.1)
+        finally:
+            requests.post(f'{self.base_url}/api/display/stop')
+        profile = [p for p in profiler.list() if p['label'] == 'update'][0]
+        with open(profiler.path(profile['id'], 'txt')) as f:
+            summary = f.read()
+        self.assertIn('show_on_panel', summary)  # The transfer stage's work, not just its hand-off
+        self.assertIn('save_image', summary)
+
+    def test_trace_export(self):
+        """Test a forced update shows up as spans in the Chrome trace export"""
+        requests.post(f'{self.base_url}/api/display/update')
+        response = requests.get(f'{self.base_url}/api/trace')
+        self.assertEqual(response.status_code, 200)
+        names = {event['name'] for event in response.json()['traceEvents']}
+        for name in ('force update', 'quote lookup', 'layout', 'draw', 'png save', 'pack',
+                     'spi plane 0x10', 'spi plane 0x13', 'busy wait'):
+            self.assertIn(name, names)
+
+    def test_in_memory_preview(self):
+        """Test the preview is served from memory when preview_storage is 'memory'"""
+        quote_generator.frame_store.mode = 'memory'
+        try:
+            response = requests.get(f'{self.base_url}/api/display/current-image')
+            self.assertEqual(response.status_code, 200)
+            self.assertTrue(response.content.startswith(b'\x89PNG'))
+            response = requests.get(f'{self.base_url}/api/display/current-image',
+                                    headers={'If-None-Match': response.headers['ETag']})
+            self.assertEqual(response.status_code, 304)
+        finally:
+            quote_generator.frame_store.mode = 'disk'
+
+    def test_config_change_impact(self):
+        """Test saving settings reports and redoes only what the changed fields affect"""
+        response = requests.post(f'{self.base_url}/api/config',
+                                 json=dict(self.test_config, content_filter='all', update_interval=60))
+        self.assertEqual(response.status_code, 200)
+        impact = response.json()['impact']
+        self.assertEqual(impact['changed'], ['update_interval'])
+        self.assertEqual(impact['impacts'], ['scheduler'])
+        self.assertFalse(impact['refresh_preview'])
+        
+        response = requests.post(f'{self.base_url}/api/config',
+                                 json=dict(self.test_config, content_filter='all', update_interval=60, font_size=30))
+        self.assertEqual(response.json()['impact']['impacts'], ['layout'])
+        self.assertTrue(response.json()['impact']['refresh_preview'])
+
+    def test_hot_reload_of_edited_files(self):
+        """Test config and CSV edits on disk are validated and applied"""
+        with open(self.config_json, 'w') as f:
+            json.dump(dict(self.test_config, font_size=30), f)
+        apply_data_changes({'config.json'})
+        self.assertEqual(quote_generator.config['font_size'], 30)
+        
+        # An invalid edit is rejected and the running config kept
+        with open(self.config_json, 'w') as f:
+            json.dump(dict(self.test_config, font_size='huge'), f)
+        with self.assertRaises(ValueError):
+            apply_data_changes({'config.json'})
+        self.assertEqual(quote_generator.config['font_size'], 30)
+        
+        # An earlier upload may have installed litclock_annotated.csv, which takes precedence
+        source = self.data_dir / 'litclock_annotated.csv'
+        if not source.exists():
+            source = self.quotes_csv
+        with open(source, 'a') as f:
+            f.write("\n18:00|6:00 P.M.|A quote added over SSH|Book|Author|sfw")
+        apply_data_changes({source.name})
+        self.assertIn('18:00', quote_generator.quotes)
+
+    def test_unknown_import_job(self):
+        """Test polling a job id that does not exist"""
+        response = requests.get(f'{self.base_url}/api/quotes/jobs/missing')
+        self.assertEqual(response.status_code, 404)
+
+    def wait_for_import(self, job_id, timeout=30):
+        """Poll an import job until it finishes"""
+        deadline = time.time() + timeout
+        while time.time() < deadline:
+            response = requests.get(f'{self.base_url}/api/quotes/jobs/{job_id}')
+            self.assertEqual(response.status_code, 200)
+            job = response.json()
+            if job['state'] in ('succeeded', 'failed'):
+                return job
+            time.sleep(0.1)
+        self.fail(f"Import job {job_id} did not finish")
 
 if __name__ == '__main__':
     unittest.main() 
\ No newline at end of file
@@ -0,0 +1,109 @@
+#!/usr/bin/env python3
+"""
+Locates each quote's time phrase ("midnight", "1:35 P.M.") inside its text.
+
+Run once at ingest: every distinct display_time in the corpus goes into a
+single Aho-Corasick automaton, so each quote is scanned in one pass no
+matter how many phrases there are. Matching is done on case- and
+accent-folded text and the span is mapped back to offsets in the
+original quote, so the renderer can embolden it without searching.
+"""
+import unicodedata
+from collections import deque
+
+
+def fold(text):
+    """
+    Return (folded, offsets): `text` casefolded with accents and other
+    combining marks removed and whitespace made plain spaces, plus the
+    index in `text` each folded character came from.
+    """
+    folded = []
+    offsets = []
+    for index, char in enumerate(text):
+        if char.isspace():
+            folded.append(' ')
+            offsets.append(index)
+            continue
+        for part in unicodedata.normalize('NFKD', char.casefold()):
+            if not unicodedata.combining(part):
+                folded.append(part)
+                offsets.append(index)
+    return ''.join(folded), offsets
+
+
+class PhraseMatcher:
+    """Aho-Corasick automaton over a set of already folded phrases"""
+
+    def __init__(self, phrases):
+        self.phrases = []
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [[]]  # Phrase ids ending at each state
+        for phrase in phrases:
+            self._add(phrase)
+        self._link()
+
+    def _add(self, phrase):
+        if not phrase:
+            return
+        state = 0
+        for char in phrase:
+            next_state = self.goto[state].get(char)
+            if next_state is None:
+                next_state = len(self.goto)
+                self.goto[state][char] = next_state
+                self.goto.append({})
+                self.fail.append(0)
+                self.output.append([])
+            state = next_state
+        self.output[state].append(len(self.phrases))
+        self.phrases.append(phrase)
+
+    def _link(self):
+        """Compute failure links breadth first and merge outputs along them"""
+        pending = deque(self.goto[0].values())
+        while pending:
+            state = pending.popleft()
+            for char, next_state in self.goto[state].items():
+                pending.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.output[next_state] = self.output[next_state] + self.output[self.fail[next_state]]
+
+    def finditer(self, text):
+        """Yield (start, end, phrase) for every occurrence in `text`, in order of end position"""
+        state = 0
+        for index, char in enumerate(text):
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            for phrase_id in self.output[state]:
+                phrase = self.phrases[phrase_id]
+                yield index + 1 - len(phrase), index + 1, phrase
+
+
+def _is_word_char(text, index):
+    return 0 <= index < len(text) and text[index].isalnum()
+
+
+def find_time_span(matcher, quote, display_time):
+    """Return [start, end] of `display_time` in `quote` as whole words, or None"""
+    phrase = fold(display_time.strip())[0]
+    if not phrase:
+        return None
+    folded, offsets = fold(quote)
+    for start, end, match in matcher.finditer(folded):
+        if match != phrase:
+            continue
+        span_start, span_end = offsets[start], offsets[end - 1] + 1
+        # "one" must not match inside "someone", nor "10:15" inside "110:15"
+        if _is_word_char(quote, span_start - 1) and _is_word_char(quote, span_start):
+            continue
+        if _is_word_char(quote, span_end - 1) and _is_word_char(quote, span_end):
+            continue
+        return [span_start, span_end]
+    return None
+
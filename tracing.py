@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Span recorder for update cycles, exported as Chrome trace-event JSON.
+
+Spans are kept in a fixed-size ring buffer with monotonic timestamps, so
+tracing is always on and costs a deque append per span. The export loads
+in chrome://tracing or https://ui.perfetto.dev.
+"""
+import os
+import time
+import functools
+import threading
+from collections import deque
+from contextlib import contextmanager
+
+
+class Tracer:
+    """Records named spans into a ring buffer"""
+
+    def __init__(self, capacity=4096):
+        self.capacity = capacity
+        self._spans = deque(maxlen=capacity)
+
+    @contextmanager
+    def span(self, name, category='cycle', **args):
+        """Record the wall time spent inside the `with` block as span `name`"""
+        start = time.monotonic_ns()
+        try:
+            yield
+        finally:
+            end = time.monotonic_ns()
+            # The thread's name goes with the span: per-request threads come and go, and their
+            # idents are reused, so a map of them would only grow and could name the wrong one
+            thread = threading.current_thread()
+            self._spans.append((name, category, start, end - start, thread.ident, args, thread.name))
+
+    def traced(self, name, category='cycle'):
+        """Decorator recording each call to the function as span `name`"""
+        def decorator(func):
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name, category):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    def spans(self):
+        """Return the recorded spans, oldest first"""
+        return list(self._spans)
+
+    def clear(self):
+        self._spans.clear()
+
+    def to_chrome_trace(self):
+        """Return the buffer as a Chrome trace-event document"""
+        pid = os.getpid()
+        spans = self.spans()
+        threads = {span[4]: span[6] for span in spans}  # Named as at their latest span
+        events = [{'name': 'thread_name', 'ph': 'M', 'pid': pid, 'tid': tid, 'args': {'name': name}}
+                  for tid, name in threads.items()]
+        for name, category, start, duration, tid, args, _ in spans:
+            events.append({
+                'name': name,
+                'cat': category,
+                'ph': 'X',
+                'ts': start / 1000,  # Trace-event timestamps are in microseconds
+                'dur': duration / 1000,
+                'pid': pid,
+                'tid': tid,
+                'args': args,
+            })
+        return {'traceEvents': events, 'displayTimeUnit': 'ms'}
+
+
+TRACER = Tracer()
@@ -29,6 +29,7 @@
 
 
 import logging
+import numpy as np
 import epdconfig
 
 # Display resolution
@@ -156,28 +157,18 @@ class EPD:
 
 
     def getbuffer(self, image):
-        # logger.debug("bufsiz = ",int(self.width/8) * self.height)
-        buf = [0xFF] * (int(self.width / 8) * self.height)
+        # Row-major, most significant bit first; a set bit is white
         image_monocolor = image.convert('1')
         imwidth, imheight = image_monocolor.size
-        pixels = image_monocolor.load()
-        # logger.debug("imwidth = %d, imheight = %d",imwidth,imheight)
+        pixels = np.asarray(image_monocolor)
         if imwidth == self.width and imheight == self.height:
             logger.debug("Horizontal")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    # Set the bits for the column of pixels at the current position.
-                    if pixels[x, y] == 0:
-                        buf[int((x + y * self.width) / 8)] &= ~(0x80 >> (x % 8))
         elif imwidth == self.height and imheight == self.width:
             logger.debug("Vertical")
-            for y in range(imheight):
-                for x in range(imwidth):
-                    newx = y
-                    newy = self.height - x - 1
-                    if pixels[x, y] == 0:
-                        buf[int((newx + newy * self.width) / 8)] &= ~(0x80 >> (y % 8))
-        return buf
+            pixels = pixels.T[::-1]
+        else:
+            return [0xFF] * (int(self.width / 8) * self.height)
+        return np.packbits(pixels, axis=1).ravel().tolist()
 
     def Clear(self):
         self.send_command(0x24)
@@ -203,13 +194,11 @@ class EPD:
         else:
             Width = self.width // 8 +1
         Height = self.height
-        if (blackimage != None):
+        if (blackimage is not None):
             self.send_command(0x24)
             self.send_data2(blackimage)        
-        if (ryimage != None):
-            for j in range(Height):
-                for i in range(Width):
-                    ryimage[i + j * Width] = ~ryimage[i + j * Width]
+        if (ryimage is not None):
+            ryimage = np.bitwise_not(np.asarray(ryimage, dtype=np.uint8)).tolist()
             self.send_command(0x26)
             self.send_data2(ryimage)
 
@@ -221,13 +210,11 @@ class EPD:
         else:
             Width = self.width // 8 +1
         Height = self.height
-        if (blackimage != None):
+        if (blackimage is not None):
             self.send_command(0x24)
             self.send_data2(blackimage)        
-        if (ryimage != None):
-            for j in range(Height):
-                for i in range(Width):
-                    ryimage[i + j * Width] = ~ryimage[i + j * Width]
+        if (ryimage is not None):
+            ryimage = np.bitwise_not(np.asarray(ryimage, dtype=np.uint8)).tolist()
             self.send_command(0x26)
             self.send_data2(ryimage)
 
@@ -26,17 +26,26 @@
 # OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE OR OTHER DEALINGS IN
 # THE SOFTWARE.
 #
+# The platform is detected in-process from /proc/device-tree/model or
+# /proc/cpuinfo the first time a driver touches this module's hardware
+# attributes (epdconfig.RST_PIN, epdconfig.module_init(), ...), not at
+# import, so importing it is fast and has no side effects. Set
+# EPD_PLATFORM=raspberrypi|jetsonnano|sunrisex3|simulator to skip detection;
+# the simulator needs no hardware.
 
 import os
 import logging
-import sys
+import struct
+import threading
 import time
-import subprocess
-
-from ctypes import *
 
 logger = logging.getLogger(__name__)
 
+PLATFORM_ENV = 'EPD_PLATFORM'
+DEVICE_TREE_MODEL = '/proc/device-tree/model'
+CPUINFO = '/proc/cpuinfo'
+SUNRISE_X3_GPIO = '/sys/bus/platform/drivers/gpio-x3'
+
 
 class RaspberryPi:
     # Pin definition
@@ -123,8 +132,9 @@ class RaspberryPi:
                 '/usr/lib',
             ]
             self.DEV_SPI = None
+            from ctypes import CDLL
             for find_dir in find_dirs:
-                val = int(os.popen('getconf LONG_BIT').read())
+                val = struct.calcsize('P') * 8
                 logging.debug("System is %d bit"%val)
                 if val == 64:
                     so_filename = os.path.join(find_dir, 'DEV_Config_64.so')
@@ -301,22 +311,118 @@ class SunriseX3:
         self.GPIO.cleanup([self.RST_PIN, self.DC_PIN, self.CS_PIN, self.BUSY_PIN], self.PWR_PIN)
 
 
-if sys.version_info[0] == 2:
-    process = subprocess.Popen("cat /proc/cpuinfo | grep Raspberry", shell=True, stdout=subprocess.PIPE)
-else:
-    process = subprocess.Popen("cat /proc/cpuinfo | grep Raspberry", shell=True, stdout=subprocess.PIPE, text=True)
-output, _ = process.communicate()
-if sys.version_info[0] == 2:
-    output = output.decode(sys.stdout.encoding)
+class Simulator:
+    """No hardware: SPI writes are counted and dropped, BUSY always reads idle and delays are skipped"""
+    # Pin definition
+    RST_PIN  = 17
+    DC_PIN   = 25
+    CS_PIN   = 8
+    BUSY_PIN = 24
+    PWR_PIN  = 18
 
-if "Raspberry" in output:
-    implementation = RaspberryPi()
-elif os.path.exists('/sys/bus/platform/drivers/gpio-x3'):
-    implementation = SunriseX3()
-else:
-    implementation = JetsonNano()
+    class SpiDev:
+        def __init__(self):
+            self.bytes_written = 0
 
-for func in [x for x in dir(implementation) if not x.startswith('_')]:
-    setattr(sys.modules[__name__], func, getattr(implementation, func))
+        def open(self, bus, device):
+            pass
+
+        def writebytes(self, data):
+            self.bytes_written += len(data)
+
+        def writebytes2(self, data):
+            self.bytes_written += len(data)
+
+        def close(self):
+            pass
+
+    def __init__(self):
+        self.SPI = self.SpiDev()
+        self.pins = {}
+
+    def digital_write(self, pin, value):
+        self.pins[pin] = value
 
-### END OF FILE ###
\ No newline at end of file
+    def digital_read(self, pin):
+        return 0 if pin == self.BUSY_PIN else self.pins.get(pin, 0)
+
+    def delay_ms(self, delaytime):
+        pass
+
+    def spi_writebyte(self, data):
+        self.SPI.writebytes(data)
+
+    def spi_writebyte2(self, data):
+        self.SPI.writebytes2(data)
+
+    def module_init(self, cleanup=False):
+        return 0
+
+    def module_exit(self, cleanup=False):
+        self.pins.clear()
+
+
+PLATFORMS = {
+    'raspberrypi': RaspberryPi,
+    'jetsonnano': JetsonNano,
+    'sunrisex3': SunriseX3,
+    'simulator': Simulator,
+}
+
+implementation = None
+_platform = None
+_lock = threading.Lock()
+
+
+def read_text(path):
+    try:
+        with open(path, 'rb') as f:
+            return f.read().decode('utf-8', 'replace').replace('\x00', '')
+    except OSError:
+        return ''
+
+
+def detect_platform(model_path=DEVICE_TREE_MODEL, cpuinfo_path=CPUINFO, x3_path=SUNRISE_X3_GPIO):
+    """Return the name of the board we run on, from EPD_PLATFORM or the kernel's description"""
+    name = os.environ.get(PLATFORM_ENV)
+    if name:
+        if name not in PLATFORMS:
+            raise ValueError("%s must be one of %s, not %r" % (PLATFORM_ENV, ', '.join(PLATFORMS), name))
+        return name
+    model = read_text(model_path)
+    if 'Raspberry' in model or (not model and 'Raspberry' in read_text(cpuinfo_path)):
+        return 'raspberrypi'
+    if os.path.exists(x3_path):
+        return 'sunrisex3'
+    if 'Jetson' in model:
+        return 'jetsonnano'
+    raise RuntimeError("Unsupported platform %r; set %s=simulator to run without a panel"
+                       % (model or 'unknown', PLATFORM_ENV))
+
+
+def platform_name():
+    """Return the detected platform name, detecting it once"""
+    global _platform
+    if _platform is None:
+        _platform = detect_platform()
+    return _platform
+
+
+def get_implementation():
+    """Return the platform implementation, creating it (and claiming its pins) on first use"""
+    global implementation
+    if implementation is None:
+        with _lock:
+            if implementation is None:
+                implementation = PLATFORMS[platform_name()]()
+    return implementation
+
+
+def __getattr__(name):
+    # Pins, SPI and the functions below come from the platform implementation
+    if name.startswith('_'):
+        raise AttributeError(name)
+    try:
+        return getattr(get_implementation(), name)
+    except AttributeError:
+        raise AttributeError("module %r has no attribute %r" % (__name__, name)) from None
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+"""
+Watches the data directory so config and corpus edits apply without a restart.
+
+inotify is used through libc where available; elsewhere the watched files
+are stat-polled. Bursts of events are debounced and reported as one set of
+changed file names.
+"""
+import os
+import time
+import errno
+import select
+import struct
+import ctypes
+import ctypes.util
+import threading
+from pathlib import Path
+
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_FROM = 0x00000040
+IN_MOVED_TO = 0x00000080
+IN_DELETE = 0x00000200
+IN_NONBLOCK = os.O_NONBLOCK
+IN_CLOEXEC = getattr(os, 'O_CLOEXEC', 0)
+WATCH_MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_DELETE
+EVENT_HEADER = struct.Struct('iIII')
+
+
+def _load_inotify():
+    """Return libc if it provides inotify, otherwise None"""
+    if not hasattr(os, 'O_NONBLOCK') or not os.path.exists('/proc/sys/fs/inotify'):
+        return None
+    try:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1
+        libc.inotify_add_watch
+    except (OSError, AttributeError):
+        return None
+    return libc
+
+
+class DataWatcher:
+    """
+    Calls `on_change(names)` when files named in `names` change in `directory`.
+
+    Changes are collected until no new event has arrived for `debounce`
+    seconds, so an editor's write-rename sequence or a multi-file import
+    produces a single callback.
+    """
+
+    def __init__(self, directory, names, on_change, debounce=1.0, poll_interval=2.0, use_inotify=True):
+        self.directory = Path(directory)
+        self.names = set(names)
+        self.on_change = on_change
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.libc = _load_inotify() if use_inotify else None
+        self.backend = 'inotify' if self.libc else 'polling'
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        if self._thread is None or not self._thread.is_alive():
+            self._stop.clear()
+            self._thread = threading.Thread(target=self._run, name='data-watcher', daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+
+    def _run(self):
+        fd = self._open_inotify() if self.libc else None
+        if fd is None:
+            self.backend = 'polling'
+        print(f"Watching {self.directory} for changes ({self.backend})")
+        pending = set()
+        last_event = 0.0
+        snapshot = self._snapshot() if fd is None else None
+        try:
+            while not self._stop.is_set():
+                if fd is not None:
+                    changed = self._read_events(fd, timeout=min(0.5, self.debounce))
+                else:
+                    self._stop.wait(min(self.poll_interval, self.debounce) if pending else self.poll_interval)
+                    current = self._snapshot()
+                    changed = {name for name in self.names if current.get(name) != snapshot.get(name)}
+                    snapshot = current
+                if changed:
+                    pending |= changed
+                    last_event = time.monotonic()
+                elif pending and time.monotonic() - last_event >= self.debounce:
+                    names, pending = pending, set()
+                    try:
+                        self.on_change(names)
+                    except Exception as e:
+                        print(f"Error applying changes to {', '.join(sorted(names))}: {e}")
+        finally:
+            if fd is not None:
+                os.close(fd)
+
+    def _open_inotify(self):
+        fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if fd < 0:
+            return None
+        if self.libc.inotify_add_watch(fd, os.fsencode(str(self.directory)), WATCH_MASK) < 0:
+            print(f"inotify unavailable for {self.directory}: {os.strerror(ctypes.get_errno())}")
+            os.close(fd)
+            return None
+        return fd
+
+    def _read_events(self, fd, timeout):
+        """Return the watched names touched by inotify events within `timeout` seconds"""
+        readable, _, _ = select.select([fd], [], [], timeout)
+        if not readable:
+            return set()
+        try:
+            data = os.read(fd, 64 * 1024)
+        except OSError as e:
+            if e.errno == errno.EAGAIN:
+                return set()
+            raise
+        changed = set()
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            _, _, _, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = os.fsdecode(data[offset:offset + length].rstrip(b'\0'))
+            offset += length
+            if name in self.names:
+                changed.add(name)
+        return changed
+
+    def _snapshot(self):
+        snapshot = {}
+        for name in self.names:
+            try:
+                stat = (self.directory / name).stat()
+            except OSError:
+                continue
+            snapshot[name] = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+        return snapshot
@@ -1,41 +1,247 @@
 #!/usr/bin/env python3
-from flask import Flask, render_template, request, jsonify, send_file
+from startup import LazyObject, StartupTimer
+startup_timer = StartupTimer()
+
+from flask import Flask, Response, render_template, request, jsonify, send_file
+from werkzeug.serving import make_server
+import io
 import json
 import os
 from pathlib import Path
-from quote_generator import QuoteGenerator
-from display_manager import DisplayManager
+from scheduler import FrameLookahead, next_boundary, sleep_until
+from pipeline import Pipeline, Stage
+from quote_import import ImportJobManager
+from metrics import CACHE_REQUESTS, REGISTRY, SCHEDULER_LATENESS_SECONDS
+from profiling import CycleProfiler
+from tracing import TRACER
+from storage import PREVIEW_STORAGE_MODES, write_json_atomic
+from framebuffer import FrameBuffer
+import control
+import sd_daemon
+from watcher import DataWatcher
+from config_impact import PROFILER, SCHEDULER
+from datetime import datetime
 import threading
+import signal
+import sys
 import time
 
+def create_quote_generator():
+    """Import and build the quote generator (reads config and corpus)"""
+    from quote_generator import QuoteGenerator
+    return QuoteGenerator()
+
+def create_display_manager():
+    """Import and build the configured display backend (claims GPIO)"""
+    from display_backend import DEFAULT_BACKEND, create_backend
+    return create_backend(quote_generator.config.get('display_backend', DEFAULT_BACKEND))
+
+def on_quote_generator_ready():
+    startup_timer.mark('quote generator ready')
+    # Profiling can be switched on from config.json as well as through the API
+    profiler.arm(quote_generator.config.get('profile_cycles', 0))
+
 app = Flask(__name__)
-quote_generator = QuoteGenerator()
-display_manager = DisplayManager()
+profiler = CycleProfiler()
+# Built on first use so that importing this module and binding the port stay fast
+quote_generator = LazyObject(create_quote_generator, on_quote_generator_ready)
+display_manager = LazyObject(create_display_manager, lambda: startup_timer.mark('display manager ready'))
+frame_lookahead = FrameLookahead(quote_generator, display_manager)
+startup_timer.mark('imports done')
+
+# Serializes swaps of config and corpus from the API, import jobs and the file watcher
+reload_lock = threading.Lock()
+
+def refresh_preview():
+    image = quote_generator.create_image()
+    quote_generator.save_image(image)
+
+def reload_quotes():
+    """Swap the corpus on disk into the running server, keeping unaffected frames"""
+    with reload_lock:
+        generation = quote_generator.generation
+        changed = quote_generator.load_quotes()
+        frame_lookahead.retain(generation, changed)
+    if changed:
+        print(f"Reloaded quotes: {len(changed)} minutes changed")
+        refresh_preview()
+    return changed
+
+def apply_config(config):
+    """Swap in a validated config and redo only the work its changes invalidate"""
+    with reload_lock:
+        generation = quote_generator.generation
+        impact = quote_generator.set_config(config)
+        if impact.changed_minutes is not None:
+            # Keep a pre-rendered frame whose minute still selects the same quote
+            frame_lookahead.retain(generation, impact.changed_minutes)
+    if SCHEDULER in impact:
+        reschedule.set()
+    if PROFILER in impact:
+        profiler.arm(config.get('profile_cycles', 0))
+    if impact.refresh_preview:
+        refresh_preview()
+    return impact
+
+def reload_config():
+    """Validate config.json and swap it into the running server if it changed"""
+    with open(quote_generator.data_dir / 'config.json', 'r') as f:
+        config = json.load(f)
+    validate_config(config, partial=True)
+    impact = apply_config(config)
+    if impact:
+        print(f"Reloaded config.json: {', '.join(impact.changed)} changed")
+    return impact
+
+def apply_data_changes(names):
+    """File watcher callback: reload whatever the changed files feed into"""
+    if 'config.json' in names and (quote_generator.data_dir / 'config.json').exists():
+        reload_config()
+    if names & set(CORPUS_SOURCES):
+        # Re-importing an unchanged CSV only hashes it, so this is cheap for our own writes;
+        # under the lock an import job commits with, so the CSV and manifest are seen together
+        with reload_lock:
+            quote_generator.convert_csv_to_json()
+    if names & (set(CORPUS_SOURCES) | {'quotes.json'}):
+        reload_quotes()
+
+def start_watcher():
+    """Watch the data directory so edits made over SSH apply without a restart"""
+    global data_watcher
+    if data_watcher is None:
+        data_watcher = DataWatcher(quote_generator.data_dir, WATCHED_FILES, apply_data_changes).start()
+    return data_watcher
+
+import_jobs = ImportJobManager(on_commit=reload_quotes, commit_lock=reload_lock)
+CORPUS_SOURCES = ('litclock_annotated.csv', 'quotes.csv')
+WATCHED_FILES = ('config.json', 'quotes.json') + CORPUS_SOURCES
+data_watcher = None
 
 # Global variables for the update thread
 update_thread = None
 should_update = False
+reschedule = threading.Event()  # Set when the update interval changes
+display_pipeline = None
+# One panel update at a time, from the update loop or a forced update, and frame listeners
+# (such as the display daemon's framebuffer writer) called by one thread at a time
+panel_lock = threading.Lock()
+panel_updates = 0  # Frames sent to the panel so far
+frame_listeners = []  # Called with (time_key, image, data) for every frame put on the panel
+
+# With display_daemon set in the config, display_daemon.py owns the panel: the display routes
+# go to it over the control socket and the preview is read from the frames it publishes
+framebuffer = FrameBuffer()
+control_socket = control.DEFAULT_CONTROL_SOCKET
+
+daemon_mode = None  # display_daemon as first read; see use_daemon()
+
+def use_daemon():
+    """
+    Whether display_daemon.py owns the panel. Read from the config once: like
+    display_backend a change takes effect on restart, so a running update
+    thread can't be left behind with its routes forwarded to the daemon.
+    """
+    global daemon_mode
+    if daemon_mode is None:
+        daemon_mode = bool(quote_generator.config.get('display_daemon', False))
+    return daemon_mode
+
+watchdog = None
+
+def updates_healthy():
+    """Whether the update thread is alive, if it is meant to be running"""
+    return not should_update or (update_thread is not None and update_thread.is_alive())
+
+def notify_ready(time_key=None, image=None, data=None):
+    """Frame listener: tell systemd the service is up once the first frame is on the panel"""
+    global watchdog
+    try:
+        frame_listeners.remove(notify_ready)
+    except ValueError:
+        return  # Already sent
+    sd_daemon.notify('READY=1')
+    startup_timer.mark('ready')
+    watchdog = sd_daemon.start_watchdog(updates_healthy)
+
+def show_on_panel(data):
+    """Send packed planes to the panel and wait out its refresh; call with panel_lock held"""
+    global panel_updates
+    display_manager.init()
+    display_manager.display(*data)
+    display_manager.sleep()
+    panel_updates += 1
+    startup_timer.mark('first panel update')
+    return panel_updates
+
+def transfer_frame(item):
+    """Pipeline stage: send a frame to the panel and wait out its refresh"""
+    due, frame = item
+    SCHEDULER_LATENESS_SECONDS.observe(max(0.0, (datetime.now() - due).total_seconds()))
+    with panel_lock:
+        update = show_on_panel(frame.data)
+    return update, frame
+
+def frame_shown(time_key, image, data):
+    """Store the frame now on the panel as the preview and tell the frame listeners; call with panel_lock held"""
+    quote_generator.save_image(image)
+    for listener in list(frame_listeners):
+        listener(time_key, image, data)
+
+def save_preview(item):
+    """Pipeline stage: store the frame now on the panel as the preview"""
+    update, frame = item
+    with panel_lock:
+        if update != panel_updates:
+            return  # Another frame has been shown since, and published its own preview
+        frame_shown(frame.time_key, frame.image, frame.data)
+
+def create_display_pipeline():
+    """Render in the update thread, then transfer and save the preview in stages of their own"""
+    return Pipeline([Stage('render'), Stage('transfer', transfer_frame), Stage('preview', save_preview)])
 
 def update_display():
     """Background thread to update the display periodically"""
     global should_update
+    render = display_pipeline.source
+    due = datetime.now()
     while should_update:
         try:
-            # Generate new image
-            image = quote_generator.create_image()
-            quote_generator.save_image(image)
-            
-            # Update display
-            display_manager.init()
-            display_manager.display(image)
-            display_manager.sleep()
+            with profiler.cycle('update') as profiled, TRACER.span('update cycle'):
+                # Use the frame pre-rendered during the previous interval if still valid
+                with render.busy():
+                    frame = frame_lookahead.take(due)
+                
+                if profiled:
+                    # cProfile only sees this thread, so run the stages here to capture the transfer
+                    display_pipeline.join()
+                    save_preview(transfer_frame((due, frame)))
+                else:
+                    # The transfer stage refreshes the panel; this blocks only while it is behind
+                    display_pipeline.submit((due, frame))
+                
+                # Render and pack the next frame while the panel is busy and the clock is idle
+                reschedule.clear()
+                due = next_boundary(datetime.now(), quote_generator.config.get('update_interval', 300))
+                with render.busy():
+                    frame_lookahead.prepare(due)
             
-            # Wait for the configured interval
-            config = quote_generator.config
-            time.sleep(config.get('update_interval', 300))
+            # Wait for the next update boundary, moving it if the interval changes meanwhile
+            while not sleep_until(due, lambda: should_update and not reschedule.is_set()) and should_update:
+                reschedule.clear()
+                new_due = next_boundary(datetime.now(), quote_generator.config.get('update_interval', 300))
+                if new_due != due:
+                    due = new_due
+                    with render.busy():
+                        frame_lookahead.prepare(due)
         except Exception as e:
             print(f"Error in update thread: {e}")
+            frame_lookahead.invalidate()
             time.sleep(60)  # Wait a minute before retrying
+            due = datetime.now()
+
+@app.before_request
+def record_first_request():
+    startup_timer.mark('first request')
 
 @app.route('/')
 def index():
@@ -50,48 +256,72 @@ def get_config():
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+def validate_config(config, partial=False):
+    """Raise ValueError if `config` is not a valid configuration; `partial` allows missing fields"""
+    if not isinstance(config, dict):
+        raise ValueError("Invalid configuration format")
+    
+    required_fields = {
+        'update_interval': int,
+        'display_brightness': int,
+        'font_size': int,
+        'show_book_info': bool,
+        'show_author': bool,
+        'content_filter': str
+    }
+    
+    for field, field_type in required_fields.items():
+        if field not in config:
+            if partial:
+                continue
+            raise ValueError(f"Missing required field: {field}")
+        if not isinstance(config[field], field_type):
+            raise ValueError(f"Invalid type for {field}: expected {field_type.__name__}")
+    
+    if config.get('update_interval', 1) < 1:
+        raise ValueError("Update interval must be positive")
+    if not 0 <= config.get('display_brightness', 100) <= 100:
+        raise ValueError("Display brightness must be between 0 and 100")
+    if config.get('font_size', 1) < 1:
+        raise ValueError("Font size must be positive")
+    if config.get('content_filter', 'all') not in ['sfw', 'nsfw', 'all']:
+        raise ValueError("Content filter must be 'sfw', 'nsfw', or 'all'")
+    profile_cycles = config.get('profile_cycles', 0)
+    if not isinstance(profile_cycles, int) or isinstance(profile_cycles, bool) or profile_cycles < 0:
+        raise ValueError("Profile cycles must be a non-negative integer")
+    if config.get('preview_storage', 'disk') not in PREVIEW_STORAGE_MODES:
+        raise ValueError(f"Preview storage must be one of {', '.join(PREVIEW_STORAGE_MODES)}")
+    from glyph_atlas import TEXT_RENDERERS  # Deferred: pulls in NumPy
+    from dither import DITHER_MODES
+    from layout import TIME_COLORS
+    from display_backend import BACKENDS
+    if config.get('text_renderer', 'freetype') not in TEXT_RENDERERS:
+        raise ValueError(f"Text renderer must be one of {', '.join(TEXT_RENDERERS)}")
+    if config.get('dither_mode', 'threshold') not in DITHER_MODES:
+        raise ValueError(f"Dither mode must be one of {', '.join(DITHER_MODES)}")
+    if config.get('time_color', 'black') not in TIME_COLORS:
+        raise ValueError(f"Time color must be one of {', '.join(TIME_COLORS)}")
+    if config.get('display_backend', 'uc8159') not in BACKENDS:
+        raise ValueError(f"Display backend must be one of {', '.join(BACKENDS)}")
+    for field in ('persist_layouts', 'highlight_time', 'display_daemon'):
+        if not isinstance(config.get(field, False), bool):
+            raise ValueError(f"Invalid type for {field}: expected bool")
+
 @app.route('/api/config', methods=['POST'])
 def update_config():
     """Update configuration"""
     try:
         config = request.get_json()
         
-        # Validate configuration
-        if not isinstance(config, dict):
-            raise ValueError("Invalid configuration format")
+        validate_config(config)
         
-        required_fields = {
-            'update_interval': int,
-            'display_brightness': int,
-            'font_size': int,
-            'show_book_info': bool,
-            'show_author': bool,
-            'content_filter': str
-        }
+        # Save configuration atomically so a power cut cannot leave it truncated
+        write_json_atomic(quote_generator.data_dir / 'config.json', config, kind='config')
         
-        for field, field_type in required_fields.items():
-            if field not in config:
-                raise ValueError(f"Missing required field: {field}")
-            if not isinstance(config[field], field_type):
-                raise ValueError(f"Invalid type for {field}: expected {field_type.__name__}")
+        # Apply only what the changed fields affect
+        impact = apply_config(config)
         
-        if config['update_interval'] < 1:
-            raise ValueError("Update interval must be positive")
-        if not 0 <= config['display_brightness'] <= 100:
-            raise ValueError("Display brightness must be between 0 and 100")
-        if config['font_size'] < 1:
-            raise ValueError("Font size must be positive")
-        if config['content_filter'] not in ['sfw', 'nsfw', 'all']:
-            raise ValueError("Content filter must be 'sfw', 'nsfw', or 'all'")
-        
-        # Save configuration
-        with open(quote_generator.data_dir / 'config.json', 'w') as f:
-            json.dump(config, f, indent=4)
-        
-        # Reload configuration
-        quote_generator.load_config()
-        
-        return jsonify({'status': 'success'})
+        return jsonify({'status': 'success', 'impact': impact.to_dict()})
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
@@ -99,28 +329,14 @@ def update_config():
 def get_quotes():
     """Get current quotes"""
     try:
-        # Filter quotes based on content filter setting
-        content_filter = quote_generator.config.get('content_filter', 'all')
-        
-        if content_filter == 'all':
-            return jsonify(quote_generator.quotes)
-        else:
-            filtered_quotes = {}
-            for time_key, quote_data in quote_generator.quotes.items():
-                rating = quote_data.get('rating', '').lower()
-                if content_filter == 'sfw' and rating == 'sfw':
-                    filtered_quotes[time_key] = quote_data
-                elif content_filter == 'nsfw' and rating == 'nsfw':
-                    filtered_quotes[time_key] = quote_data
-                elif content_filter == 'all':
-                    filtered_quotes[time_key] = quote_data
-            return jsonify(filtered_quotes)
+        # The selection index already applies the content filter setting
+        return jsonify(quote_generator.selection)
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
 @app.route('/api/quotes', methods=['POST'])
 def update_quotes():
-    """Update quotes from uploaded CSV file"""
+    """Start a background import of an uploaded CSV file"""
     try:
         if 'file' not in request.files:
             return jsonify({'status': 'error', 'message': 'No file uploaded'}), 400
@@ -132,61 +348,126 @@ def update_quotes():
         if not file.filename.endswith('.csv'):
             return jsonify({'status': 'error', 'message': 'File must be a CSV'}), 400
         
-        # Save the uploaded file
-        csv_path = quote_generator.data_dir / 'litclock_annotated.csv'
-        file.save(csv_path)
-        
-        # Convert CSV to JSON
-        success = quote_generator.convert_csv_to_json()
-        
-        if not success:
-            return jsonify({'status': 'error', 'message': 'Failed to process the uploaded CSV file'}), 500
-        
-        # Reload quotes
-        quote_generator.load_quotes()
+        # Parsing, validation and the swap of the live corpus happen in the background
+        job = import_jobs.submit(file, file.filename, quote_generator.data_dir)
         
-        # Generate a new image to reflect the changes
-        image = quote_generator.create_image()
-        quote_generator.save_image(image)
-        
-        return jsonify({'status': 'success'})
+        return jsonify({'status': 'accepted', 'job_id': job.id}), 202
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
+@app.route('/api/quotes/jobs', methods=['GET'])
+def list_import_jobs():
+    """List recent quote import jobs"""
+    return jsonify(import_jobs.list())
+
+@app.route('/api/quotes/jobs/<job_id>', methods=['GET'])
+def get_import_job(job_id):
+    """Get the progress of a quote import job"""
+    job = import_jobs.get(job_id)
+    if job is None:
+        return jsonify({'status': 'error', 'message': 'Unknown job'}), 404
+    return jsonify(job.to_dict())
+
+def display_status():
+    """Whether the update thread runs, and the utilization of its pipeline stages"""
+    return {
+        'running': update_thread is not None and update_thread.is_alive() and should_update,
+        'pipeline': display_pipeline.stats() if display_pipeline is not None else {}
+    }
+
+def update_now():
+    """Render the current minute and put it on the panel straight away"""
+    now = datetime.now()
+    image = quote_generator.create_image()
+    data = display_manager.convert_image_to_planes(image, quote_generator.config.get('dither_mode', 'threshold'))
+    with panel_lock:
+        show_on_panel(data)
+        frame_shown(now.strftime('%H:%M'), image, data)
+
+def start_updates():
+    """Start the update thread; returns False if it was already running"""
+    global update_thread, should_update, display_pipeline
+    if update_thread is not None and update_thread.is_alive():
+        return False
+    should_update = True
+    display_pipeline = create_display_pipeline().start()
+    update_thread = threading.Thread(target=update_display)
+    update_thread.daemon = True
+    update_thread.start()
+    return True
+
+def stop_updates():
+    """Stop the update thread once the frames already handed to the pipeline are shown"""
+    global should_update
+    should_update = False
+    if update_thread and update_thread.is_alive():
+        update_thread.join(timeout=5)
+    if display_pipeline is not None:
+        display_pipeline.stop(timeout=5)
+
+def call_daemon(command):
+    """Forward a display command to the display daemon as a JSON response"""
+    try:
+        reply = control.call(command, control_socket)
+    except ConnectionError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 503
+    return jsonify(reply), 500 if reply.get('status') == 'error' else 200
+
 @app.route('/api/display/current-image')
 def get_current_image():
     """Get the current display image"""
     try:
-        image_path = quote_generator.images_dir / 'current_display.png'
-        if not image_path.exists():
+        if use_daemon():
+            # Answer unchanged frames from the framebuffer header, without reading the image
+            etag = framebuffer.etag()
+            if etag is not None and request.if_none_match.contains(etag):
+                CACHE_REQUESTS.inc(cache='response', result='hit')
+                return Response(status=304, headers={'ETag': f'"{etag}"'})
+            frame = framebuffer.read()
+            if frame is not None and frame.png:
+                CACHE_REQUESTS.inc(cache='response', result='miss')
+                return send_file(io.BytesIO(frame.png), mimetype='image/png',
+                                 etag=f'{framebuffer.buffer_id:016x}-{frame.sequence}')
+            # Nothing on the panel yet; fall back to a preview rendered here
+        frame_store = quote_generator.frame_store
+        image_path = quote_generator.preview_path()
+        if not frame_store.exists(image_path):
             # Generate a new image if none exists
             image = quote_generator.create_image()
             quote_generator.save_image(image)
-        return send_file(image_path, mimetype='image/png')
+        if frame_store.mode == 'memory':
+            response = send_file(io.BytesIO(frame_store.read(image_path)), mimetype='image/png',
+                                 etag=frame_store.digest(image_path))
+        else:
+            response = send_file(image_path.resolve(), mimetype='image/png')
+        CACHE_REQUESTS.inc(cache='response', result='hit' if response.status_code == 304 else 'miss')
+        return response
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
 @app.route('/api/display/status', methods=['GET'])
 def get_display_status():
     """Get the current display status"""
-    global update_thread, should_update
-    return jsonify({
-        'running': update_thread is not None and update_thread.is_alive() and should_update,
-        'content_filter': quote_generator.config.get('content_filter', 'all')
-    })
+    if use_daemon():
+        try:
+            status = control.call('status', control_socket)
+        except ConnectionError as e:
+            status = {'running': False, 'pipeline': {}, 'daemon': str(e)}
+    else:
+        status = display_status()
+    status['content_filter'] = quote_generator.config.get('content_filter', 'all')
+    return jsonify(status)
 
 @app.route('/api/display/update', methods=['POST'])
 def force_update():
     """Force an immediate display update"""
+    if use_daemon():
+        return call_daemon('update')
     try:
-        # Generate new image
-        image = quote_generator.create_image()
-        quote_generator.save_image(image)
-        
-        # Update display
-        display_manager.init()
-        display_manager.display(image)
-        display_manager.sleep()
+        # ?profile=1 captures this update, as does an armed profiler
+        capture = profiler.capture('force_update') if request.args.get('profile') else profiler.cycle('force_update')
+        with capture, TRACER.span('force update'):
+            update_now()
         
         return jsonify({'status': 'success'})
     except Exception as e:
@@ -195,13 +476,10 @@ def force_update():
 @app.route('/api/display/start', methods=['POST'])
 def start_display():
     """Start the display update thread"""
-    global update_thread, should_update
+    if use_daemon():
+        return call_daemon('start')
     try:
-        if update_thread is None or not update_thread.is_alive():
-            should_update = True
-            update_thread = threading.Thread(target=update_display)
-            update_thread.daemon = True
-            update_thread.start()
+        if start_updates():
             return jsonify({'status': 'success'})
         return jsonify({'status': 'already running'})
     except Exception as e:
@@ -210,25 +488,106 @@ def start_display():
 @app.route('/api/display/stop', methods=['POST'])
 def stop_display():
     """Stop the display update thread"""
-    global update_thread, should_update
+    if use_daemon():
+        return call_daemon('stop')
     try:
-        should_update = False
-        if update_thread and update_thread.is_alive():
-            update_thread.join(timeout=5)
+        stop_updates()
         return jsonify({'status': 'success'})
     except Exception as e:
         return jsonify({'status': 'error', 'message': str(e)}), 500
 
-def main():
-    # Initialize the display image
+@app.route('/api/profiling', methods=['GET'])
+def get_profiling():
+    """List stored profiles and how many cycles are still to be profiled"""
+    return jsonify({'pending': profiler.pending, 'profiles': profiler.list()})
+
+@app.route('/api/profiling', methods=['POST'])
+def arm_profiling():
+    """Profile the next N update cycles"""
+    data = request.get_json(silent=True) or {}
+    cycles = data.get('cycles', 1)
+    if not isinstance(cycles, int) or isinstance(cycles, bool) or cycles < 0:
+        return jsonify({'status': 'error', 'message': 'cycles must be a non-negative integer'}), 400
+    return jsonify({'status': 'success', 'pending': profiler.arm(cycles)})
+
+@app.route('/api/profiling/<profile_id>/<kind>', methods=['GET'])
+def download_profile(profile_id, kind):
+    """Download a stored profile: kind is 'prof', 'txt' or 'tracemalloc'"""
+    path = profiler.path(profile_id, kind)
+    if path is None:
+        return jsonify({'status': 'error', 'message': 'Unknown profile'}), 404
+    mimetype = 'text/plain' if kind == 'txt' else 'application/octet-stream'
+    return send_file(path.resolve(), mimetype=mimetype, as_attachment=kind != 'txt', download_name=path.name)
+
+@app.route('/api/trace', methods=['GET'])
+def get_trace():
+    """Export recent update cycle spans as Chrome trace-event JSON"""
+    trace = TRACER.to_chrome_trace()
+    if request.args.get('clear'):
+        TRACER.clear()
+    response = jsonify(trace)
+    response.headers['Content-Disposition'] = 'attachment; filename=quote_clock_trace.json'
+    return response
+
+@app.route('/metrics')
+def metrics():
+    """Expose pipeline metrics in the Prometheus text format"""
+    return Response(REGISTRY.render(), mimetype='text/plain; version=0.0.4')
+
+def wait_for_daemon(interval=0.25):
+    """
+    Wait until a running display daemon has published a complete frame. The
+    daemon is asked over the control socket which frame it published, so a
+    framebuffer left in /dev/shm by a daemon that has since died doesn't count.
+    """
+    sd_daemon.notify('STATUS=Waiting for the display daemon\'s first frame')
+    while True:
+        try:
+            frame = control.call('status', control_socket, timeout=5).get('frame')
+            if frame is not None and frame == framebuffer.etag() and framebuffer.read() is not None:
+                return
+        except (OSError, ValueError):
+            pass  # Not running yet, busy, or the frame is being written
+        time.sleep(interval)
+
+def warm_up():
+    """Load the corpus, fonts and preview image in the background"""
     try:
-        image = quote_generator.create_image()
-        quote_generator.save_image(image)
+        # systemd holds the service as starting until the first frame is on the panel
+        waiting = notify_ready in frame_listeners
+        if waiting and not use_daemon():
+            update_now()  # Sends READY=1 through the frame listener
+        else:
+            image = quote_generator.create_image()
+            quote_generator.save_image(image)
+        startup_timer.mark('first frame')
+        start_watcher()
+        if waiting and use_daemon():
+            # The display daemon owns the panel: ready once it has published a frame it showed
+            wait_for_daemon()
+            notify_ready()
     except Exception as e:
         print(f"Error initializing display image: {e}")
+
+def main():
+    # Bind the port before doing any heavy work so clients can connect immediately;
+    # under socket activation systemd has bound it already and passes it in
+    fds = sd_daemon.listen_fds()
+    server = make_server('0.0.0.0', 5001, app, threaded=True, fd=fds[0] if fds else None)
+    startup_timer.mark('port bound')
+    if sd_daemon.notify_socket() is not None:
+        frame_listeners.append(notify_ready)
     
-    # Run the Flask app directly, without using start_display here
-    app.run(host='0.0.0.0', port=5001)
+    # Render the initial display image without holding up the server
+    threading.Thread(target=warm_up, daemon=True).start()
+    
+    # systemd stops the service with SIGTERM: exit normally, so unsaved caches are written at exit
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        # Serve directly, without using start_display here
+        server.serve_forever()
+    finally:
+        stop_updates()  # Python waits for the update thread before running the exit handlers
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()